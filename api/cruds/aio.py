@@ -0,0 +1,29 @@
+import asyncio
+import functools
+from typing import Callable, ParamSpec, TypeVar
+from weakref import WeakKeyDictionary
+
+import anyio
+from anyio import to_thread
+
+from api.myutils.const import DB_THREAD_LIMIT
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# CapacityLimiter はイベントループの中でしか作れないので、ループごとに作る
+# (Mangum はリクエストごとにループを回すことがある)
+_limiters: "WeakKeyDictionary[asyncio.AbstractEventLoop, anyio.CapacityLimiter]" = WeakKeyDictionary()
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = anyio.CapacityLimiter(DB_THREAD_LIMIT)
+    return limiter
+
+
+async def run_sync(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    # pynamodb の同期呼び出しをスレッドで動かし、その間イベントループを止めない
+    return await to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_get_limiter())
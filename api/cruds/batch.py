@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+from typing import Any, Iterable, Iterator, TypeVar
+
+from api.db import DBModelBase
+from api.myutils.const import BATCH_WRITE_SIZE, WRITE_BURST_SECONDS
+
+_T = TypeVar("_T", bound=DBModelBase)
+
+# 書き込みキャパシティは1KBごとに1WCU
+WRITE_UNIT_SIZE = 1024
+
+
+class CapacityThrottle:
+    # テーブルのプロビジョンドキャパシティ (units/秒) を超えないように待つトークンバケット
+    def __init__(self, capacity_units: float, burst_seconds: float = 1.0):
+        self.capacity_units = capacity_units
+        self.max_tokens = capacity_units * burst_seconds
+        self._tokens = self.max_tokens
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.max_tokens,
+                self._tokens + (now - self._updated_at) * self.capacity_units,
+            )
+            self._updated_at = now
+            self._tokens -= units
+            wait = max(0.0, -self._tokens / self.capacity_units)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+write_throttle = CapacityThrottle(
+    DBModelBase.Meta.write_capacity_units, burst_seconds=WRITE_BURST_SECONDS
+)
+
+
+def attribute_size(value: dict[str, Any]) -> int:
+    # DynamoDB が数える値の大きさ (バイト)
+    (attr_type, v), = value.items()
+    if attr_type == "S":
+        return len(v.encode("utf-8"))
+    if attr_type == "N":
+        # 有効数字2桁ごとに1バイト + 1バイト
+        digits = v.lstrip("-").replace(".", "").strip("0")
+        return (len(digits) + 1) // 2 + 1
+    if attr_type == "B":
+        # BinaryAttribute は base64 の文字列のまま入るので、文字列の長さがそのまま大きさになる
+        return len(v)
+    if attr_type in ("BOOL", "NULL"):
+        return 1
+    if attr_type == "L":
+        # 3バイト + 要素ごとに1バイト
+        return 3 + sum(1 + attribute_size(element) for element in v)
+    if attr_type == "M":
+        return 3 + sum(1 + len(name.encode("utf-8")) + attribute_size(element) for name, element in v.items())
+    if attr_type == "SS":
+        return sum(len(element.encode("utf-8")) for element in v)
+    if attr_type == "NS":
+        return sum(attribute_size({"N": element}) for element in v)
+    if attr_type == "BS":
+        return sum(len(element) for element in v)
+    raise ValueError(f"unsupported attribute type: {attr_type}")
+
+
+def item_size(item: dict[str, Any]) -> int:
+    # 生の項目 ({"name": {"S": "..."}} など) の大きさ。属性名の長さ + 値の大きさ
+    return sum(len(name.encode("utf-8")) + attribute_size(value) for name, value in item.items())
+
+
+def estimate_write_units(item: DBModelBase) -> int:
+    return max(1, math.ceil(item_size(item.serialize()) / WRITE_UNIT_SIZE))
+
+
+def _chunks(items: Iterable[_T]) -> Iterator[list[_T]]:
+    # 同じキーが1回の BatchWriteItem に含まれるとエラーになるので、後勝ちでまとめる
+    chunk: dict[tuple[str, str], _T] = {}
+    for item in items:
+        key = (item.record_type, item.id)
+        if key not in chunk and len(chunk) == BATCH_WRITE_SIZE:
+            yield list(chunk.values())
+            chunk = {}
+        chunk[key] = item
+    if len(chunk) > 0:
+        yield list(chunk.values())
+
+
+def batch_save(items: Iterable[_T]) -> int:
+    # 25件ずつ BatchWriteItem で保存する
+    # UnprocessedItems の再送とバックオフは pynamodb の BatchWrite.commit に任せる
+    n_items = 0
+    for chunk in _chunks(items):
+        write_throttle.acquire(sum(estimate_write_units(item) for item in chunk))
+        with type(chunk[0]).batch_write(auto_commit=False) as batch:
+            for item in chunk:
+                batch.save(item)
+        n_items += len(chunk)
+    return n_items
+
+
+def batch_delete(items: Iterable[_T]) -> int:
+    n_items = 0
+    for chunk in _chunks(items):
+        # 削除も項目サイズ分の WCU を消費する
+        write_throttle.acquire(sum(estimate_write_units(item) for item in chunk))
+        with type(chunk[0]).batch_write(auto_commit=False) as batch:
+            for item in chunk:
+                batch.delete(item)
+        n_items += len(chunk)
+    return n_items
@@ -1,6 +1,12 @@
 from api.db import MetaModel
+from api.cruds.aio import run_sync
+from api.myutils.cache import TTLCache
+from api.myutils.const import META_CACHE_SIZE, META_CACHE_TTL
 from api.schemas.meta import Meta, MetaBase
 
+# 時間割の取り込みやページの表示のたびに引かれるので、コンテナ内に保持する
+meta_cache: TTLCache[str, Meta] = TTLCache(maxsize=META_CACHE_SIZE, ttl=META_CACHE_TTL, name="meta")
+
 
 class MetaRepo:
     @classmethod
@@ -8,12 +14,17 @@ class MetaRepo:
         meta = Meta.create(meta_base)
         regist_meta = meta.to_model()
         regist_meta.save()
+        meta_cache.set(meta.school_id, meta, version=regist_meta.timestamp)
         return meta
 
     @classmethod
     def get(cls, school_id: str) -> Meta:
-        meta = Meta.from_model(MetaModel.get("meta", school_id))
-        return meta
+        return meta_cache.get_or_load(school_id, lambda: cls._load(school_id))
+
+    @classmethod
+    def _load(cls, school_id: str) -> tuple[Meta, str]:
+        meta_model = MetaModel.get("meta", school_id)
+        return Meta.from_model(meta_model), meta_model.timestamp
     
     @classmethod
     def list(cls) -> list[Meta]:
@@ -29,6 +40,7 @@ class MetaRepo:
         new_meta = old_meta.update(meta_base)
         regist_meta = new_meta.to_model()
         regist_meta.save()
+        meta_cache.set(school_id, new_meta, version=regist_meta.timestamp)
         return new_meta
 
     @classmethod
@@ -36,4 +48,28 @@ class MetaRepo:
         meta = cls.get(school_id)
         meta_model = meta.to_model()
         meta_model.delete()
-        return meta
\ No newline at end of file
+        meta_cache.invalidate(school_id)
+        return meta
+
+
+class AsyncMetaRepo:
+    # MetaRepo の操作をスレッドに逃がして await できるようにしたもの
+    @classmethod
+    async def create(cls, meta_base: MetaBase) -> Meta:
+        return await run_sync(MetaRepo.create, meta_base)
+
+    @classmethod
+    async def get(cls, school_id: str) -> Meta:
+        return await run_sync(MetaRepo.get, school_id)
+
+    @classmethod
+    async def list(cls) -> list[Meta]:
+        return await run_sync(MetaRepo.list)
+
+    @classmethod
+    async def update(cls, school_id: str, meta_base: MetaBase) -> Meta:
+        return await run_sync(MetaRepo.update, school_id, meta_base)
+
+    @classmethod
+    async def delete(cls, school_id: str) -> Meta:
+        return await run_sync(MetaRepo.delete, school_id)
@@ -0,0 +1,79 @@
+import argparse
+from dataclasses import dataclass
+from typing import Iterator
+
+from pynamodb.exceptions import UpdateError
+
+from api.cruds.batch import estimate_write_units, write_throttle
+from api.db import LEGACY_ATTENDANCE_ATTRIBUTES, MonthlyAttendanceModel
+from api.myutils.const import EXPORT_PAGE_SIZE
+
+# 出勤簿の timeslot_list と日別の配列を packed に書き換える
+# 動いているテーブルに対して実行できるように、1件ずつ条件付きの UpdateItem で書き換える
+#   python -m api.cruds.migrate [--school-id SCHOOL_ID] [--dry-run]
+
+
+@dataclass
+class MigrationResult:
+    migrated: int = 0
+    # 読んでから書くまでに他の更新が入った件数。その更新で packed に書き換わっている
+    skipped: int = 0
+
+
+def iter_legacy_attendance(school_id: str | None = None) -> Iterator[MonthlyAttendanceModel]:
+    # packed を持たない出勤簿。school_id がなければテーブル全体を Scan する
+    condition = MonthlyAttendanceModel.packed.does_not_exist()
+    if school_id is None:
+        return MonthlyAttendanceModel.scan(condition, page_size=EXPORT_PAGE_SIZE)
+    return MonthlyAttendanceModel.school_id_index.query(
+        school_id,
+        MonthlyAttendanceModel.record_type.startswith("attendance#"),
+        filter_condition=condition,
+        page_size=EXPORT_PAGE_SIZE,
+    )
+
+
+def migrate_attendance(monthly_attendance_model: MonthlyAttendanceModel) -> bool:
+    # 読んだときの timestamp のままのときだけ書き換える
+    # 合計は変わらないので、集計 (RollupModel) は更新しない
+    write_throttle.acquire(estimate_write_units(monthly_attendance_model))
+    try:
+        monthly_attendance_model.update(
+            actions=[
+                MonthlyAttendanceModel.packed.set(monthly_attendance_model.attendance_data()),
+                *[attribute.remove() for attribute in LEGACY_ATTENDANCE_ATTRIBUTES],
+            ],
+            condition=(
+                (MonthlyAttendanceModel.timestamp == monthly_attendance_model.timestamp)
+                & MonthlyAttendanceModel.packed.does_not_exist()
+            ),
+        )
+    except UpdateError as e:
+        if e.cause_response_code == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+
+def migrate(school_id: str | None = None, dry_run: bool = False) -> MigrationResult:
+    result = MigrationResult()
+    for monthly_attendance_model in iter_legacy_attendance(school_id):
+        if dry_run or migrate_attendance(monthly_attendance_model):
+            result.migrated += 1
+        else:
+            result.skipped += 1
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--school-id")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    result = migrate(args.school_id, dry_run=args.dry_run)
+    print(f"migrated: {result.migrated}, skipped: {result.skipped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+
+from api.cruds.aio import run_sync
+from api.cruds.meta import AsyncMetaRepo
+from api.cruds.rollup import school_month_key
+from api.db import MonthlyAttendanceModel, RollupModel
+from api.myutils.const import REPORT_CONCURRENCY
+from api.schemas.meta import Meta
+from api.schemas.report import PayrollReport, SchoolPayrollTotals
+from api.schemas.rollup import PayrollRollup, PayrollTotals
+
+# 集計のない塾を出勤簿から数えるときに読む属性。合計と、分数を数えるための packed (移行前なら日別の配列)
+TOTAL_ATTRIBUTES = [
+    "cls", "record_type", "id",
+    "monthly_gross_salary", "extra_payment", "monthly_tax_amount", "monthly_trans_fee",
+    "packed", "daily_lecture_amount", "daily_office_amount",
+]
+
+
+class ReportRepo:
+    @classmethod
+    def school_month_rollups(cls, metas: list[Meta], year: int, month: int) -> dict[str, PayrollTotals]:
+        # school_id -> 塾の月の集計 (rollup#school#YYYY-MM)。BatchGetItem でまとめて読む
+        # 100件を超える分の分割と UnprocessedKeys の再送は pynamodb の batch_get に任せる
+        keys = [school_month_key(year, month, meta.school_id) for meta in metas]
+        return {
+            rollup_model.id: PayrollRollup.from_model(rollup_model)
+            for rollup_model in RollupModel.batch_get(keys)
+        }
+
+    @classmethod
+    def school_month_totals(cls, school_id: str, year: int, month: int) -> PayrollTotals:
+        # 集計は書き込みのたびに作られるので、集計を入れる前に書いたきりの塾にはない
+        # その塾は出勤簿を school_id_index から合計の属性だけ読み、ページごとに足していく
+        totals = PayrollTotals()
+        for monthly_attendance_model in MonthlyAttendanceModel.school_id_index.query(
+            school_id,
+            MonthlyAttendanceModel.record_type == f"attendance#{year}-{month:02}",
+            attributes_to_get=TOTAL_ATTRIBUTES,
+        ):
+            totals += PayrollTotals.from_attendance_model(monthly_attendance_model)  # type: ignore
+        return totals
+
+
+class AsyncReportRepo:
+    @classmethod
+    async def payroll(cls, year: int, month: int) -> PayrollReport:
+        # 塾の一覧の Query と集計の BatchGetItem で作り、集計のない塾だけ出勤簿を Query する
+        # 塾ごとの Query は並列に投げ、同時に投げる数は REPORT_CONCURRENCY (と run_sync のスレッド数) まで
+        metas = await AsyncMetaRepo.list()
+        rollups = await run_sync(ReportRepo.school_month_rollups, metas, year, month)
+        schools = [
+            SchoolPayrollTotals.create(meta.school_id, meta.school_name, rollups[meta.school_id])
+            for meta in metas
+            if meta.school_id in rollups
+        ]
+        semaphore = asyncio.Semaphore(REPORT_CONCURRENCY)
+
+        async def school_month_totals(meta: Meta) -> None:
+            async with semaphore:
+                totals = await run_sync(ReportRepo.school_month_totals, meta.school_id, year, month)
+            # 終わった塾から順に集める (イベントループの中なのでロックはいらない)
+            schools.append(SchoolPayrollTotals.create(meta.school_id, meta.school_name, totals))
+
+        # 1つでも失敗したら、残りは取り消して例外を返す
+        async with asyncio.TaskGroup() as task_group:
+            for meta in metas:
+                if meta.school_id not in rollups:
+                    task_group.create_task(school_month_totals(meta))
+
+        schools.sort(key=lambda school_totals: school_totals.school_id)
+        total = sum(schools, PayrollTotals())
+        return PayrollReport(year=year, month=month, schools=schools, total=total)
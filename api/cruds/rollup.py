@@ -0,0 +1,242 @@
+import datetime
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from pynamodb.exceptions import PynamoDBException, TransactWriteError
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+from pynamodb.transactions import TransactWrite
+
+from api.cruds.aio import run_sync
+from api.cruds.batch import batch_delete, batch_save, estimate_write_units, write_throttle
+from api.db import DBModelBase, MonthlyAttendanceModel, RollupModel
+from api.myutils.const import TRANSACT_CONFLICT_BACKOFF, TRANSACT_CONFLICT_RETRIES, TRANSACT_WRITE_SIZE
+from api.schemas.rollup import PayrollRollup, PayrollTotals
+
+RollupKey = tuple[str, str]
+
+
+def teacher_year_key(year: int, teacher_id: str) -> RollupKey:
+    return f"rollup#teacher#{year}", teacher_id
+
+
+def school_month_key(year: int, month: int, school_id: str) -> RollupKey:
+    return f"rollup#school#{year}-{month:02}", school_id
+
+
+@dataclass
+class AttendanceWrite:
+    # 出勤簿1件の書き込み
+    # old だけなら削除、new だけなら新規作成、両方あれば上書き (actions があれば UpdateItem)
+    old: MonthlyAttendanceModel | None
+    new: MonthlyAttendanceModel | None
+    actions: list[Action] | None = None
+
+    @property
+    def key(self) -> tuple[str, str]:
+        model = self.new if self.new is not None else self.old
+        return model.record_type, model.id  # type: ignore
+
+    def condition(self) -> Condition:
+        # 読んでから書くまでに他の書き込みが入っていたら失敗させる
+        if self.old is None:
+            return MonthlyAttendanceModel.record_type.does_not_exist()
+        return MonthlyAttendanceModel.timestamp == self.old.timestamp
+
+    def deltas(self) -> Iterator[tuple[RollupKey, str, int, int | None, PayrollTotals]]:
+        # (集計の項目のキー, school_id, 年, 月, 増減)
+        for model, sign in [(self.old, -1), (self.new, 1)]:
+            if model is None:
+                continue
+            totals = PayrollTotals.from_attendance_model(model)
+            if sign < 0:
+                totals = -totals
+            year, month = int(model.year), int(model.month)
+            yield teacher_year_key(year, model.id), model.school_id, year, None, totals
+            yield school_month_key(year, month, model.school_id), model.school_id, year, month, totals
+
+
+@dataclass
+class _Transaction:
+    writes: list[AttendanceWrite] = field(default_factory=list)
+    rollups: dict[RollupKey, tuple[str, int, int | None, PayrollTotals]] = field(default_factory=dict)
+
+    def n_items(self) -> int:
+        return len(self.writes) + len(self.rollups)
+
+    def fits(self, write: AttendanceWrite) -> bool:
+        # 1回のトランザクションに同じ項目は2回入れられない
+        if any(w.key == write.key for w in self.writes):
+            return False
+        new_keys = {key for key, *_ in write.deltas()} - set(self.rollups)
+        return self.n_items() + 1 + len(new_keys) <= TRANSACT_WRITE_SIZE
+
+    def add(self, write: AttendanceWrite) -> None:
+        self.writes.append(write)
+        self.accumulate(write)
+
+    def accumulate(self, write: AttendanceWrite) -> None:
+        for key, school_id, year, month, totals in write.deltas():
+            if key in self.rollups:
+                school_id, year, month, old_totals = self.rollups[key]
+                totals = old_totals + totals
+            self.rollups[key] = (school_id, year, month, totals)
+
+
+def _rollup_actions(school_id: str, year: int, month: int | None, totals: PayrollTotals) -> list[Action]:
+    # 集計の項目がなければ UpdateItem で作られる。合計は ADD で足し引きする
+    actions: list[Action] = [
+        RollupModel.school_id.set(school_id),
+        RollupModel.cls.set(RollupModel),  # type: ignore
+        RollupModel.timestamp.set(datetime.datetime.now().isoformat()),
+        RollupModel.year.set(year),
+    ]
+    if month is not None:
+        actions.append(RollupModel.month.set(month))
+    for name in PayrollTotals.model_fields:
+        actions.append(getattr(RollupModel, name).add(getattr(totals, name)))
+    return actions
+
+
+def write_attendance(writes: Iterable[AttendanceWrite]) -> None:
+    # 出勤簿の書き込みと集計の更新を TransactWriteItems でまとめて行う
+    # 100項目を超える場合は複数のトランザクションに分ける (それぞれの中では不可分)
+    transaction = _Transaction()
+    for write in writes:
+        if not transaction.fits(write):
+            _commit(transaction)
+            transaction = _Transaction()
+        transaction.add(write)
+    if len(transaction.writes) > 0:
+        _commit(transaction)
+
+
+def _commit(transaction: _Transaction) -> None:
+    # 学校の月の集計の項目は同じ学校の書き込みがすべて更新するので、同時に書くと TransactionConflict になる
+    # トランザクションはすべて取り消されているので、少し待ってから同じ内容で送り直す
+    for attempt in range(TRANSACT_CONFLICT_RETRIES + 1):
+        try:
+            _transact_write(transaction)
+            return
+        except TransactWriteError as e:
+            if not is_transaction_conflict(e) or attempt == TRANSACT_CONFLICT_RETRIES:
+                raise
+        time.sleep(random.uniform(0, TRANSACT_CONFLICT_BACKOFF * 2 ** attempt))
+
+
+def _transact_write(transaction: _Transaction) -> None:
+    # トランザクションは通常の書き込みの2倍の WCU を使う
+    write_throttle.acquire(2 * sum(
+        estimate_write_units(write.new if write.new is not None else write.old)  # type: ignore
+        for write in transaction.writes
+    ) + 2 * len(transaction.rollups))
+
+    with TransactWrite(connection=DBModelBase._get_connection().connection) as t:
+        for write in transaction.writes:
+            if write.actions is not None:
+                t.update(write.old, actions=write.actions, condition=write.condition())  # type: ignore
+            elif write.new is None:
+                t.delete(write.old, condition=write.condition())  # type: ignore
+            else:
+                t.save(write.new, condition=write.condition())
+        for (record_type, id), (school_id, year, month, totals) in transaction.rollups.items():
+            if totals.is_zero():
+                continue
+            t.update(
+                RollupModel(record_type, id),
+                actions=_rollup_actions(school_id, year, month, totals),
+            )
+
+
+def _cancellation_codes(e: TransactWriteError) -> set[str]:
+    return {reason.code for reason in e.cancellation_reasons if reason is not None}
+
+
+def is_transaction_conflict(e: TransactWriteError) -> bool:
+    # 他のトランザクションと項目が重なって取り消されただけで、条件は満たしている
+    codes = _cancellation_codes(e)
+    return "TransactionConflict" in codes and "ConditionalCheckFailed" not in codes
+
+
+def is_write_conflict(e: PynamoDBException) -> bool:
+    # 条件付き書き込みが、他の書き込みと競合して失敗したかどうか
+    # TransactionConflict は送り直しても通らなかったときだけここに来る
+    if isinstance(e, TransactWriteError):
+        return len(_cancellation_codes(e) & {"ConditionalCheckFailed", "TransactionConflict"}) > 0
+    return e.cause_response_code == "ConditionalCheckFailedException"
+
+
+class RollupRepo:
+    @classmethod
+    def get_teacher_year(cls, teacher_id: str, year: int) -> PayrollRollup:
+        return PayrollRollup.from_model(RollupModel.get(*teacher_year_key(year, teacher_id)))
+
+    @classmethod
+    def list_teacher_years(cls, school_id: str, year: int) -> list[PayrollRollup]:
+        record_type, _ = teacher_year_key(year, "")
+        return [
+            PayrollRollup.from_model(rollup_model)  # type: ignore
+            for rollup_model in RollupModel.school_id_index.query(
+                school_id, RollupModel.record_type == record_type
+            )
+        ]
+
+    @classmethod
+    def list_school_months(cls, school_id: str, year: int) -> list[PayrollRollup]:
+        # 1回の Query で1年分の月の合計を読む
+        return [
+            PayrollRollup.from_model(rollup_model)  # type: ignore
+            for rollup_model in RollupModel.school_id_index.query(
+                school_id, RollupModel.record_type.startswith(f"rollup#school#{year}-")
+            )
+        ]
+
+    @classmethod
+    def rebuild(cls, school_id: str, year: int) -> list[PayrollRollup]:
+        # 既存のデータから集計を作り直す。集計を入れる前のデータの移行用
+        # 作り直している間の書き込みは反映されないことがあるので、書き込みのない時間に行う
+        transaction = _Transaction()
+        for monthly_attendance_model in MonthlyAttendanceModel.school_id_index.query(
+            school_id, MonthlyAttendanceModel.record_type.startswith(f"attendance#{year}-")
+        ):
+            transaction.accumulate(AttendanceWrite(None, monthly_attendance_model))  # type: ignore
+
+        old_rollup_models = [
+            rollup_model
+            for prefix in [f"rollup#teacher#{year}", f"rollup#school#{year}-"]
+            for rollup_model in RollupModel.school_id_index.query(
+                school_id, RollupModel.record_type.startswith(prefix)
+            )
+        ]
+        batch_delete(old_rollup_models)  # type: ignore
+
+        timestamp = datetime.datetime.now().isoformat()
+        rollup_models = [
+            RollupModel(
+                record_type, id, school_id=school_id, timestamp=timestamp, year=year, month=month,
+                **totals.model_dump(),
+            )
+            for (record_type, id), (_, _, month, totals) in transaction.rollups.items()
+        ]
+        batch_save(rollup_models)
+        return [PayrollRollup.from_model(rollup_model) for rollup_model in rollup_models]
+
+
+class AsyncRollupRepo:
+    @classmethod
+    async def get_teacher_year(cls, teacher_id: str, year: int) -> PayrollRollup:
+        return await run_sync(RollupRepo.get_teacher_year, teacher_id, year)
+
+    @classmethod
+    async def list_teacher_years(cls, school_id: str, year: int) -> list[PayrollRollup]:
+        return await run_sync(RollupRepo.list_teacher_years, school_id, year)
+
+    @classmethod
+    async def list_school_months(cls, school_id: str, year: int) -> list[PayrollRollup]:
+        return await run_sync(RollupRepo.list_school_months, school_id, year)
+
+    @classmethod
+    async def rebuild(cls, school_id: str, year: int) -> list[PayrollRollup]:
+        return await run_sync(RollupRepo.rebuild, school_id, year)
@@ -1,5 +1,39 @@
+from typing import Any, Iterable
+from pydantic import ValidationError
+from pynamodb.exceptions import PynamoDBException
+
 from api.db import TeacherModel
-from api.schemas.person import Teacher, TeacherBase
+from api.cruds.aio import run_sync
+from api.cruds.batch import batch_save
+from api.myutils.cache import TTLCache
+from api.myutils.const import (
+    BATCH_WRITE_SIZE,
+    ROSTER_CACHE_SIZE,
+    ROSTER_CACHE_TTL,
+    SUB_CACHE_SIZE,
+    SUB_CACHE_TTL,
+    TEACHER_CACHE_SIZE,
+    TEACHER_CACHE_TTL,
+)
+from api.schemas.person import (
+    Teacher,
+    TeacherBase,
+    TeacherImportAccepted,
+    TeacherImportRejected,
+    TeacherImportReport,
+)
+
+# ログインのたびに引かれるので、解決済みの sub をコンテナ内に保持する
+sub_cache: TTLCache[str, Teacher] = TTLCache(maxsize=SUB_CACHE_SIZE, ttl=SUB_CACHE_TTL, name="sub")
+# id -> 講師 と school_id -> 講師一覧。書き込んだときはこのコンテナの分だけ入れ替える
+teacher_cache: TTLCache[str, Teacher] = TTLCache(
+    maxsize=TEACHER_CACHE_SIZE, ttl=TEACHER_CACHE_TTL, name="teacher"
+)
+# 講師一覧は条件付き GET 用に各講師の timestamp も持つ
+roster_cache: TTLCache[str, list[tuple[Teacher, str]]] = TTLCache(
+    maxsize=ROSTER_CACHE_SIZE, ttl=ROSTER_CACHE_TTL, name="roster"
+)
+
 
 class TeacherRepo:
     @classmethod
@@ -7,32 +41,148 @@ class TeacherRepo:
         teacher = Teacher.create(teacher_base)
         regist_teacher = teacher.to_model()
         regist_teacher.save()
+        cls._written(regist_teacher)
         return teacher
     
+    @classmethod
+    def create_list(cls, teacher_base_list: list[TeacherBase]) -> list[Teacher]:
+        teacher_list = [Teacher.create(teacher_base) for teacher_base in teacher_base_list]
+        teacher_models = [teacher.to_model() for teacher in teacher_list]
+        batch_save(teacher_models)
+        cls._written(*teacher_models)
+        return teacher_list
+
+    @classmethod
+    def import_records(
+        cls, school_id: str, records: Iterable[tuple[int, dict[str, str]]]
+    ) -> TeacherImportReport:
+        # 1行ずつ検証し、正しい行だけを BATCH_WRITE_SIZE 件ずつ書き込む
+        # 不正な行があっても残りの行の取り込みは続ける
+        report = TeacherImportReport()
+        teacher_ids: set[str] = set()
+        pending: list[tuple[int, Teacher]] = []
+        for line, record in records:
+            display_name = record.get("display_name")
+            if any("\ufffd" in value for value in record.values()):
+                report.rejected.append(TeacherImportRejected(
+                    line=line, display_name=display_name, errors=["could not decode row"]
+                ))
+                continue
+
+            try:
+                teacher = Teacher.create(TeacherBase(**{**record, "school_id": school_id}))
+            except ValidationError as e:
+                report.rejected.append(TeacherImportRejected(
+                    line=line,
+                    display_name=display_name,
+                    errors=[f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()],
+                ))
+                continue
+
+            if teacher.id in teacher_ids:
+                report.rejected.append(TeacherImportRejected(
+                    line=line, display_name=display_name, errors=["duplicate display_name"]
+                ))
+                continue
+            teacher_ids.add(teacher.id)
+
+            pending.append((line, teacher))
+            if len(pending) == BATCH_WRITE_SIZE:
+                cls._flush_import(pending, report)
+                pending = []
+        cls._flush_import(pending, report)
+        return report
+
+    @classmethod
+    def _flush_import(cls, pending: list[tuple[int, Teacher]], report: TeacherImportReport) -> None:
+        teacher_models = [teacher.to_model() for _, teacher in pending]
+        try:
+            batch_save(teacher_models)
+        except PynamoDBException as e:
+            report.rejected.extend(
+                TeacherImportRejected(line=line, display_name=teacher.display_name, errors=[f"write failed: {e.msg}"])
+                for line, teacher in pending
+            )
+            return
+        cls._written(*teacher_models)
+        report.accepted.extend(
+            TeacherImportAccepted(line=line, teacher=teacher) for line, teacher in pending
+        )
+
     @classmethod
     def regist(cls, teacher: Teacher) -> Teacher:
         regist_teacher = teacher.to_model()
         regist_teacher.save()
+        cls._written(regist_teacher)
         return teacher
 
     @classmethod
-    def list(cls, school_id: str) -> list[Teacher]:
-        teachers = [
-            Teacher.from_model(teacher_model) for teacher_model 
-            in TeacherModel.query("teacher", filter_condition = (TeacherModel.school_id==school_id))
-        ]
-        return teachers
+    def list_page(
+        cls,
+        school_id: str,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+        consistent_read: bool = False,
+    ) -> tuple[list[Teacher], dict[str, Any] | None]:
+        # 普段は school_id_index で塾の講師だけを読む
+        # GSI は強い整合性の読み込みができないので、その場合は "teacher" パーティションを絞り込む
+        if consistent_read:
+            teacher_model_list = TeacherModel.query(
+                "teacher",
+                filter_condition=(TeacherModel.school_id==school_id),
+                consistent_read=True,
+                limit=limit,
+                last_evaluated_key=last_evaluated_key,
+            )
+        else:
+            teacher_model_list = TeacherModel.school_id_index.query(
+                school_id,
+                TeacherModel.record_type == "teacher",
+                limit=limit,
+                last_evaluated_key=last_evaluated_key,
+            )
+        teachers = Teacher.from_models(teacher_model_list)
+        return teachers, teacher_model_list.last_evaluated_key
+
+    @classmethod
+    def list_versioned(cls, school_id: str) -> list[tuple[Teacher, str]]:
+        # (講師, timestamp) の一覧
+        return list(roster_cache.get_or_load(school_id, lambda: cls._load_roster(school_id)))
+
+    @classmethod
+    def _load_roster(cls, school_id: str) -> tuple[list[tuple[Teacher, str]], str | None]:
+        teacher_models = list(TeacherModel.school_id_index.query(school_id, TeacherModel.record_type == "teacher"))
+        timestamps = [teacher_model.timestamp for teacher_model in teacher_models]
+        roster = list(zip(Teacher.from_models(teacher_models), timestamps))
+        return roster, max((timestamp for _, timestamp in roster), default=None)
+
+    @classmethod
+    def list(cls, school_id: str, consistent_read: bool = False) -> list[Teacher]:
+        # 強い整合性が必要なときはキャッシュを使わない
+        if consistent_read:
+            return cls.list_page(school_id, consistent_read=True)[0]
+        return [teacher for teacher, _ in cls.list_versioned(school_id)]
 
     @classmethod
     def get(cls, id: str) -> Teacher:
-        teacher = Teacher.from_model(TeacherModel.get("teacher", id))
-        return teacher
+        return teacher_cache.get_or_load(id, lambda: cls._load(id))
+
+    @classmethod
+    def get_versioned(cls, id: str) -> tuple[Teacher, str]:
+        # (講師, timestamp)
+        return teacher_cache.get_or_load_entry(id, lambda: cls._load(id))  # type: ignore
+
+    @classmethod
+    def _load(cls, id: str) -> tuple[Teacher, str]:
+        teacher_model = TeacherModel.get("teacher", id)
+        return Teacher.from_model(teacher_model), teacher_model.timestamp
     
     @classmethod
     def get_from_sub(cls, sub: str) -> Teacher:
-        try :
-            teacher_model = TeacherModel.query("teacher", filter_condition = (TeacherModel.sub==sub)).next()
-        except StopIteration:
+        # 読んでいる間に update, delete されたら、読んだ講師はキャッシュに入れない
+        try:
+            return sub_cache.get_or_load(sub, lambda: cls._load_from_sub(sub))
+        except TeacherModel.DoesNotExist:
             return Teacher(
                 id="",
                 display_name="Guest",
@@ -46,15 +196,27 @@ class TeacherRepo:
                 sub=sub,
             )
 
-        teacher = Teacher.from_model(teacher_model)
-        return teacher
+    @classmethod
+    def _load_from_sub(cls, sub: str) -> tuple[Teacher, str]:
+        # 見つからなければ DoesNotExist にして、ゲストはキャッシュしない
+        try:
+            teacher_model = next(TeacherModel.sub_index.query(
+                sub, TeacherModel.record_type == "teacher", limit=1
+            ))
+        except StopIteration:
+            raise TeacherModel.DoesNotExist()
+        return Teacher.from_model(teacher_model), teacher_model.timestamp
 
     @classmethod
     def update(cls, id, teacher_base: TeacherBase) -> Teacher:
-        old_teacher = cls.get(id)
+        # 古い sub と塾の分も消すので、キャッシュではなくテーブルから読む
+        old_teacher = cls._load(id)[0]
         new_teacher = old_teacher.update(teacher_base)
         regist_teacher = new_teacher.to_model()
         regist_teacher.save()
+        cls._invalidate_sub(old_teacher.sub)
+        roster_cache.invalidate(old_teacher.school_id)
+        cls._written(regist_teacher)
         return new_teacher
 
     @classmethod
@@ -62,5 +224,78 @@ class TeacherRepo:
         teacher_model = TeacherModel.get("teacher", id)
         teacher = Teacher.from_model(teacher_model)
         teacher_model.delete()
+        cls._invalidate_sub(teacher.sub)
+        teacher_cache.invalidate(teacher.id)
+        roster_cache.invalidate(teacher.school_id)
         return teacher
-    
\ No newline at end of file
+
+    @classmethod
+    def _written(cls, *teacher_models: TeacherModel) -> None:
+        # 書き込んだ講師を入れ、その塾の一覧と sub は次に読むときに読み直す
+        for teacher_model in teacher_models:
+            teacher_cache.set(teacher_model.id, Teacher.from_model(teacher_model), version=teacher_model.timestamp)
+            roster_cache.invalidate(teacher_model.school_id)
+            cls._invalidate_sub(teacher_model.sub)
+
+    @classmethod
+    def _invalidate_sub(cls, *subs: str | None) -> None:
+        for sub in subs:
+            if sub is not None:
+                sub_cache.invalidate(sub)
+
+
+class AsyncTeacherRepo:
+    # TeacherRepo の操作をスレッドに逃がして await できるようにしたもの
+    @classmethod
+    async def create(cls, teacher_base: TeacherBase) -> Teacher:
+        return await run_sync(TeacherRepo.create, teacher_base)
+
+    @classmethod
+    async def create_list(cls, teacher_base_list: list[TeacherBase]) -> list[Teacher]:
+        return await run_sync(TeacherRepo.create_list, teacher_base_list)
+
+    @classmethod
+    async def import_records(
+        cls, school_id: str, records: Iterable[tuple[int, dict[str, str]]]
+    ) -> TeacherImportReport:
+        return await run_sync(TeacherRepo.import_records, school_id, records)
+
+    @classmethod
+    async def list_page(
+        cls,
+        school_id: str,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+        consistent_read: bool = False,
+    ) -> tuple[list[Teacher], dict[str, Any] | None]:
+        return await run_sync(
+            TeacherRepo.list_page, school_id, limit, last_evaluated_key, consistent_read=consistent_read
+        )
+
+    @classmethod
+    async def list_versioned(cls, school_id: str) -> list[tuple[Teacher, str]]:
+        return await run_sync(TeacherRepo.list_versioned, school_id)
+
+    @classmethod
+    async def list(cls, school_id: str, consistent_read: bool = False) -> list[Teacher]:
+        return await run_sync(TeacherRepo.list, school_id, consistent_read=consistent_read)
+
+    @classmethod
+    async def get(cls, id: str) -> Teacher:
+        return await run_sync(TeacherRepo.get, id)
+
+    @classmethod
+    async def get_versioned(cls, id: str) -> tuple[Teacher, str]:
+        return await run_sync(TeacherRepo.get_versioned, id)
+
+    @classmethod
+    async def get_from_sub(cls, sub: str) -> Teacher:
+        return await run_sync(TeacherRepo.get_from_sub, sub)
+
+    @classmethod
+    async def update(cls, id: str, teacher_base: TeacherBase) -> Teacher:
+        return await run_sync(TeacherRepo.update, id, teacher_base)
+
+    @classmethod
+    async def delete(cls, id: str) -> Teacher:
+        return await run_sync(TeacherRepo.delete, id)
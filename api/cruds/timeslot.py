@@ -1,95 +1,459 @@
 import datetime
-from typing import Optional
-import pandas as pd
-from pydantic import BaseModel, field_validator
-from functools import singledispatch
-from api.myutils.const import GENSEN_PATH
+from functools import partial
+from typing import Any, Callable, Iterator
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+from pynamodb.indexes import Index
+from pynamodb.pagination import PageIterator, ResultIterator
 
-from api.schemas.timeslot import MonthlyAttendance, MonthlyAttendanceBeforeCalculate, UpdateAttendanceReq
-from api.db import MonthlyAttendanceModel
+from api.schemas.timeslot import (
+    MonthlyAttendance,
+    MonthlyAttendanceBeforeCalculate,
+    MonthlyAttendanceSummary,
+    PatchAttendanceReq,
+    UpdateAttendanceReq,
+)
+from api.db import LEGACY_ATTENDANCE_ATTRIBUTES, DBModelBase, MonthlyAttendanceModel
+from api.cruds.aio import run_sync
+from api.cruds.rollup import AttendanceWrite, write_attendance
+from api.myutils.const import EXPORT_PAGE_SIZE
 
 
 class MonthlyAttendanceRepo:
     @classmethod
     def create(cls, monthly_attendance_before: MonthlyAttendanceBeforeCalculate) -> MonthlyAttendance:
-        gensen = pd.read_csv(GENSEN_PATH)
-        monthly_attendance = monthly_attendance_before.calc_salary(gensen)
-        monthly_attendance.to_model().save()
+        monthly_attendance = monthly_attendance_before.calc_salary()
+        monthly_attendance_model = monthly_attendance.to_model()
+        old_models = cls._get_models([monthly_attendance_model])
+        write_attendance([
+            AttendanceWrite(old_models.get(cls._key(monthly_attendance_model)), monthly_attendance_model)
+        ])
         return monthly_attendance
 
     @classmethod
     def create_list(
         cls, monthly_attendance_before_list: list[MonthlyAttendanceBeforeCalculate]
     ) -> list[MonthlyAttendance]:
-        gensen = pd.read_csv(GENSEN_PATH)
-        monthly_attendance_list = [
-            monthly_attendance_before.calc_salary(gensen)
-            for monthly_attendance_before in monthly_attendance_before_list
-        ]
-        for monthly_attendance in monthly_attendance_list:
-            monthly_attendance.to_model().save()
+        # numpy を使うので、一括作成のときだけ読み込む
+        from api.myutils.payroll import calc_salary_batch
+
+        monthly_attendance_list = calc_salary_batch(monthly_attendance_before_list)
+        # 上書きする出勤簿の分を集計から引くので、先に今の項目をまとめて読む
+        monthly_attendance_models = [monthly_attendance.to_model() for monthly_attendance in monthly_attendance_list]
+        old_models = cls._get_models(monthly_attendance_models)
+        write_attendance(
+            AttendanceWrite(old_models.get(cls._key(monthly_attendance_model)), monthly_attendance_model)
+            for monthly_attendance_model in monthly_attendance_models
+        )
         return monthly_attendance_list
 
+    @classmethod
+    def _key(cls, monthly_attendance_model: MonthlyAttendanceModel) -> tuple[str, str]:
+        return monthly_attendance_model.record_type, monthly_attendance_model.id
+
+    @classmethod
+    def _get_models(
+        cls, monthly_attendance_models: list[MonthlyAttendanceModel]
+    ) -> dict[tuple[str, str], MonthlyAttendanceModel]:
+        keys = list(dict.fromkeys(cls._key(model) for model in monthly_attendance_models))
+        return {
+            cls._key(model): model
+            for model in MonthlyAttendanceModel.batch_get(keys)
+        }
+
     @classmethod
     def get(cls, id: str, year: int, month: int) -> MonthlyAttendance:
         record_type = f"attendance#{year}-{month:02}"
         monthly_attendance_model = MonthlyAttendanceModel.get(record_type, id)
         return MonthlyAttendance.from_model(monthly_attendance_model)
 
+    @classmethod
+    def get_versioned(cls, id: str, year: int, month: int) -> tuple[str, Callable[[], MonthlyAttendance]]:
+        # (timestamp, MonthlyAttendance を作る関数)
+        # 条件付き GET で変わっていなければ、MonthlyAttendance を作らずに済む
+        record_type = f"attendance#{year}-{month:02}"
+        monthly_attendance_model = MonthlyAttendanceModel.get(record_type, id)
+        return monthly_attendance_model.timestamp, partial(MonthlyAttendance.from_model, monthly_attendance_model)
+
+    @classmethod
+    def list_versions(
+        cls, school_id: str, start_year: int, start_month: int, end_year: int, end_month: int, summary: bool = True
+    ) -> list[tuple[str, str]]:
+        # 条件付き GET 用。キーと timestamp だけを読み、(キー, timestamp) を返す
+        # summary は本文を読むインデックスに合わせる (概要のインデックスは小さいので、本文が概要のときは安く済む)
+        versions = []
+        for items in cls.iter_between_items(
+            school_id, start_year, start_month, end_year, end_month,
+            summary=summary, attributes_to_get=["record_type", "id", "timestamp"],
+        ):
+            versions += [
+                (f'{item["record_type"]["S"]}#{item["id"]["S"]}', item["timestamp"]["S"]) for item in items
+            ]
+        return versions
+
     @classmethod
     def list_monthly(
         cls, school_id: str, year: int, month: int | None = None
     ) -> list[MonthlyAttendance]:
-        if month == None:
-            record_type = f"attendance#{year}"
-        else:
-            record_type = f"attendance#{year}-{month:02}"
-        monthly_attendance_model_list = MonthlyAttendanceModel.school_id_index.query(
-            school_id, MonthlyAttendanceModel.record_type == record_type
+        return cls.list_monthly_page(school_id, year, month)[0]
+
+    @classmethod
+    def list_monthly_page(
+        cls,
+        school_id: str,
+        year: int,
+        month: int | None = None,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendance], dict[str, Any] | None]:
+        return cls._page(
+            cls._query_monthly(school_id, year, month, limit=limit, last_evaluated_key=last_evaluated_key)
+        )
+
+    @classmethod
+    def list_monthly_summary_page(
+        cls,
+        school_id: str,
+        year: int,
+        month: int | None = None,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendanceSummary], dict[str, Any] | None]:
+        return cls._summary_page(
+            cls._query_monthly(
+                school_id, year, month, summary=True, limit=limit, last_evaluated_key=last_evaluated_key
+            )
         )
-        return [
-            MonthlyAttendance.from_model(monthly_attendance_model)
-            for monthly_attendance_model in monthly_attendance_model_list
-        ]
+
+    @classmethod
+    def iter_monthly(
+        cls, school_id: str, year: int, month: int | None = None, summary: bool = False
+    ) -> Iterator[MonthlyAttendance | MonthlyAttendanceSummary]:
+        # 1ページずつ読みながら返すので、メモリには1ページ分しか載らない
+        from_model = MonthlyAttendanceSummary.from_model if summary else MonthlyAttendance.from_model
+        for monthly_attendance_model in cls._query_monthly(
+            school_id, year, month, summary=summary, page_size=EXPORT_PAGE_SIZE
+        ):
+            yield from_model(monthly_attendance_model)
 
     @classmethod
     def list_between(
         cls, school_id: str, start_year: int, start_month: int, end_year: int, end_month: int
     ) -> list[MonthlyAttendance]:
-        monthly_attendance_model_list = MonthlyAttendanceModel.school_id_index.query(
-            school_id,
-            MonthlyAttendanceModel.record_type.between(
-                f"attendance#{start_year}-{start_month:02}",
-                f"attendance#{end_year}-{end_month:02}",
+        return cls.list_between_page(school_id, start_year, start_month, end_year, end_month)[0]
+
+    @classmethod
+    def list_between_page(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendance], dict[str, Any] | None]:
+        return cls._page(
+            cls._query_between(
+                school_id, start_year, start_month, end_year, end_month,
+                limit=limit, last_evaluated_key=last_evaluated_key,
+            )
+        )
+
+    @classmethod
+    def list_between_summary_page(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendanceSummary], dict[str, Any] | None]:
+        return cls._summary_page(
+            cls._query_between(
+                school_id, start_year, start_month, end_year, end_month,
+                summary=True, limit=limit, last_evaluated_key=last_evaluated_key,
+            )
+        )
+
+    @classmethod
+    def iter_between(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        summary: bool = False,
+    ) -> Iterator[MonthlyAttendance | MonthlyAttendanceSummary]:
+        from_model = MonthlyAttendanceSummary.from_model if summary else MonthlyAttendance.from_model
+        for monthly_attendance_model in cls._query_between(
+            school_id, start_year, start_month, end_year, end_month,
+            summary=summary, page_size=EXPORT_PAGE_SIZE,
+        ):
+            yield from_model(monthly_attendance_model)
+
+    @classmethod
+    def iter_between_items(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        summary: bool = False,
+        attributes_to_get: list[str] | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        # 書き出し用。モデルを作らずに、Query の1ページ分の生の項目 ({"N": "1"} など) を返す
+        pages = PageIterator(
+            DBModelBase._get_connection().query,
+            (school_id,),
+            dict(
+                range_key_condition=cls._between_condition(start_year, start_month, end_year, end_month),
+                index_name=cls._index(summary).Meta.index_name,
+                limit=EXPORT_PAGE_SIZE,
+                attributes_to_get=attributes_to_get,
             ),
         )
-        return [
-            MonthlyAttendance.from_model(monthly_attendance_model)
-            for monthly_attendance_model in monthly_attendance_model_list
-        ]
+        for page in pages:
+            yield page["Items"]
+
+    @classmethod
+    def _index(cls, summary: bool) -> Index:
+        # 概要だけでよいときは、合計と講師名だけを射影したインデックスを読む
+        # (インデックスの項目が小さいので、消費する RCU も小さい)
+        if summary:
+            return MonthlyAttendanceModel.school_summary_index
+        return MonthlyAttendanceModel.school_id_index
+
+    @classmethod
+    def _query_monthly(
+        cls, school_id: str, year: int, month: int | None = None, summary: bool = False, **kwargs: Any
+    ) -> ResultIterator[MonthlyAttendanceModel]:
+        # month がなければ、その年の全ての月
+        if month == None:
+            range_key_condition = MonthlyAttendanceModel.record_type.startswith(f"attendance#{year}-")
+        else:
+            range_key_condition = MonthlyAttendanceModel.record_type == f"attendance#{year}-{month:02}"
+        return cls._index(summary).query(school_id, range_key_condition, **kwargs)
+
+    @classmethod
+    def _query_between(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        summary: bool = False,
+        **kwargs: Any,
+    ) -> ResultIterator[MonthlyAttendanceModel]:
+        # 年月の昇順で返る
+        return cls._index(summary).query(
+            school_id,
+            cls._between_condition(start_year, start_month, end_year, end_month),
+            **kwargs,
+        )
+
+    @classmethod
+    def _between_condition(cls, start_year: int, start_month: int, end_year: int, end_month: int) -> Condition:
+        return MonthlyAttendanceModel.record_type.between(
+            f"attendance#{start_year}-{start_month:02}",
+            f"attendance#{end_year}-{end_month:02}",
+        )
+
+    @classmethod
+    def _page(
+        cls, monthly_attendance_model_list: ResultIterator[MonthlyAttendanceModel]
+    ) -> tuple[list[MonthlyAttendance], dict[str, Any] | None]:
+        # limit 件読んだところで止まり、続きがあれば last_evaluated_key が残る
+        monthly_attendance_list = MonthlyAttendance.from_models(monthly_attendance_model_list)
+        return monthly_attendance_list, monthly_attendance_model_list.last_evaluated_key
+
+    @classmethod
+    def _summary_page(
+        cls, monthly_attendance_model_list: ResultIterator[MonthlyAttendanceModel]
+    ) -> tuple[list[MonthlyAttendanceSummary], dict[str, Any] | None]:
+        monthly_attendance_summary_list = MonthlyAttendanceSummary.from_models(monthly_attendance_model_list)
+        return monthly_attendance_summary_list, monthly_attendance_model_list.last_evaluated_key
 
     @classmethod
     def update(
         cls, id: str, year: int, month: int, req: UpdateAttendanceReq
     ) -> MonthlyAttendance:
-        gensen = pd.read_csv(GENSEN_PATH)
-        monthly_attendance_before = MonthlyAttendanceBeforeCalculate.from_monthly_attendance(cls.get(id, year, month))
-        monthly_attendance = monthly_attendance_before.update(req).calc_salary(gensen)
-        monthly_attendance.to_model().save()
+        record_type = f"attendance#{year}-{month:02}"
+        old_model = MonthlyAttendanceModel.get(record_type, id)
+        monthly_attendance_before = MonthlyAttendanceBeforeCalculate.from_monthly_attendance(
+            MonthlyAttendance.from_model(old_model)
+        )
+        monthly_attendance = monthly_attendance_before.update(req).calc_salary()
+        write_attendance([AttendanceWrite(old_model, monthly_attendance.to_model())])
+        return monthly_attendance
+
+    @classmethod
+    def patch(
+        cls, id: str, year: int, month: int, req: PatchAttendanceReq
+    ) -> MonthlyAttendance:
+        # 計算し直すのは変わった日だけで、書き込みは packed と月の合計などの UpdateItem にする (講師の情報は送らない)
+        # packed はコマの一覧と日別の値をまとめた1つのバイナリなので、要素ごとではなく丸ごと SET する
+        # 読んでから書くまでに他の更新が入っていたら TransactWriteError (ConditionalCheckFailed) になる
+        record_type = f"attendance#{year}-{month:02}"
+        monthly_attendance_model = MonthlyAttendanceModel.get(record_type, id)
+        monthly_attendance = MonthlyAttendance.from_model(monthly_attendance_model).patch(req)
+
+        actions: list[Action] = [MonthlyAttendanceModel.packed.set(monthly_attendance.attendance_data())]
+        if monthly_attendance_model.packed is None:
+            # 移行前の項目は、ここで packed に書き換える
+            actions += [attribute.remove() for attribute in LEGACY_ATTENDANCE_ATTRIBUTES]
+        actions += [
+            MonthlyAttendanceModel.monthly_gross_salary.set(monthly_attendance.monthly_gross_salary),
+            MonthlyAttendanceModel.monthly_tax_amount.set(monthly_attendance.monthly_tax_amount),
+            MonthlyAttendanceModel.monthly_trans_fee.set(monthly_attendance.monthly_trans_fee),
+            MonthlyAttendanceModel.extra_payment.set(monthly_attendance.extra_payment),
+            MonthlyAttendanceModel.remark.set(monthly_attendance.remark),
+            MonthlyAttendanceModel.timestamp.set(datetime.datetime.now().isoformat()),
+        ]
+        write_attendance([
+            AttendanceWrite(monthly_attendance_model, monthly_attendance.to_model(), actions=actions)
+        ])
         return monthly_attendance
 
     @classmethod
     def delete(cls, id: str, year: int, month: int) -> MonthlyAttendance:
         record_type = f"attendance#{year}-{month:02}"
         monthly_attendance_model = MonthlyAttendanceModel.get(record_type, id)
-        monthly_attendance_model.delete()
+        write_attendance([AttendanceWrite(monthly_attendance_model, None)])
         return MonthlyAttendance.from_model(monthly_attendance_model)
 
     @classmethod
     def delete_list(
         cls, school_id: str, year: int, month: int
     ) -> list[MonthlyAttendance]:
-        monthly_attendance_list = cls.list_monthly(school_id, year, month)
-        for monthly_attendance in monthly_attendance_list:
-            monthly_attendance.to_model().delete()
-        return monthly_attendance_list
+        monthly_attendance_models = list(cls._query_monthly(school_id, year, month))
+        write_attendance(AttendanceWrite(model, None) for model in monthly_attendance_models)
+        return MonthlyAttendance.from_models(monthly_attendance_models)
+
+
+class AsyncMonthlyAttendanceRepo:
+    # MonthlyAttendanceRepo の操作をスレッドに逃がして await できるようにしたもの
+    @classmethod
+    async def create(cls, monthly_attendance_before: MonthlyAttendanceBeforeCalculate) -> MonthlyAttendance:
+        return await run_sync(MonthlyAttendanceRepo.create, monthly_attendance_before)
+
+    @classmethod
+    async def create_list(
+        cls, monthly_attendance_before_list: list[MonthlyAttendanceBeforeCalculate]
+    ) -> list[MonthlyAttendance]:
+        return await run_sync(MonthlyAttendanceRepo.create_list, monthly_attendance_before_list)
+
+    @classmethod
+    async def get(cls, id: str, year: int, month: int) -> MonthlyAttendance:
+        return await run_sync(MonthlyAttendanceRepo.get, id, year, month)
+
+    @classmethod
+    async def get_versioned(cls, id: str, year: int, month: int) -> tuple[str, Callable[[], MonthlyAttendance]]:
+        return await run_sync(MonthlyAttendanceRepo.get_versioned, id, year, month)
+
+    @classmethod
+    async def list_versions(
+        cls, school_id: str, start_year: int, start_month: int, end_year: int, end_month: int, summary: bool = True
+    ) -> list[tuple[str, str]]:
+        return await run_sync(
+            MonthlyAttendanceRepo.list_versions, school_id, start_year, start_month, end_year, end_month, summary
+        )
+
+    @classmethod
+    async def list_monthly(
+        cls, school_id: str, year: int, month: int | None = None
+    ) -> list[MonthlyAttendance]:
+        return await run_sync(MonthlyAttendanceRepo.list_monthly, school_id, year, month)
+
+    @classmethod
+    async def list_monthly_page(
+        cls,
+        school_id: str,
+        year: int,
+        month: int | None = None,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendance], dict[str, Any] | None]:
+        return await run_sync(
+            MonthlyAttendanceRepo.list_monthly_page, school_id, year, month, limit, last_evaluated_key
+        )
+
+    @classmethod
+    async def list_monthly_summary_page(
+        cls,
+        school_id: str,
+        year: int,
+        month: int | None = None,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendanceSummary], dict[str, Any] | None]:
+        return await run_sync(
+            MonthlyAttendanceRepo.list_monthly_summary_page, school_id, year, month, limit, last_evaluated_key
+        )
+
+    @classmethod
+    async def list_between(
+        cls, school_id: str, start_year: int, start_month: int, end_year: int, end_month: int
+    ) -> list[MonthlyAttendance]:
+        return await run_sync(
+            MonthlyAttendanceRepo.list_between, school_id, start_year, start_month, end_year, end_month
+        )
+
+    @classmethod
+    async def list_between_page(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendance], dict[str, Any] | None]:
+        return await run_sync(
+            MonthlyAttendanceRepo.list_between_page,
+            school_id, start_year, start_month, end_year, end_month, limit, last_evaluated_key,
+        )
+
+    @classmethod
+    async def list_between_summary_page(
+        cls,
+        school_id: str,
+        start_year: int,
+        start_month: int,
+        end_year: int,
+        end_month: int,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, Any] | None = None,
+    ) -> tuple[list[MonthlyAttendanceSummary], dict[str, Any] | None]:
+        return await run_sync(
+            MonthlyAttendanceRepo.list_between_summary_page,
+            school_id, start_year, start_month, end_year, end_month, limit, last_evaluated_key,
+        )
+
+    @classmethod
+    async def update(
+        cls, id: str, year: int, month: int, req: UpdateAttendanceReq
+    ) -> MonthlyAttendance:
+        return await run_sync(MonthlyAttendanceRepo.update, id, year, month, req)
+
+    @classmethod
+    async def patch(
+        cls, id: str, year: int, month: int, req: PatchAttendanceReq
+    ) -> MonthlyAttendance:
+        return await run_sync(MonthlyAttendanceRepo.patch, id, year, month, req)
+
+    @classmethod
+    async def delete(cls, id: str, year: int, month: int) -> MonthlyAttendance:
+        return await run_sync(MonthlyAttendanceRepo.delete, id, year, month)
+
+    @classmethod
+    async def delete_list(
+        cls, school_id: str, year: int, month: int
+    ) -> list[MonthlyAttendance]:
+        return await run_sync(MonthlyAttendanceRepo.delete_list, school_id, year, month)
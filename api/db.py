@@ -1,7 +1,8 @@
-import datetime
 from pynamodb.models import Model
-from pynamodb.indexes import LocalSecondaryIndex, GlobalSecondaryIndex, AllProjection, IncludeProjection
-from pynamodb.attributes import UnicodeAttribute, NumberAttribute, UTCDateTimeAttribute, UnicodeSetAttribute, BooleanAttribute, MapAttribute, ListAttribute, DiscriminatorAttribute
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection, IncludeProjection
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, MapAttribute, ListAttribute, DiscriminatorAttribute, BinaryAttribute
+
+from api.myutils.attendance_codec import AttendanceData, PackedTimeslot, minute_of_day, pack, unpack
 
 
 class SchoolIndex(GlobalSecondaryIndex):
@@ -15,15 +16,39 @@ class SchoolIndex(GlobalSecondaryIndex):
     record_type = UnicodeAttribute(range_key=True)
 
 
-class SubIndex(LocalSecondaryIndex):
+# sub -> 講師 の検索用
+# LSI は既存のテーブルに追加できないので GSI にしている
+# sub を持つ出勤簿も載るので、講師の情報だけを射影する
+class SubIndex(GlobalSecondaryIndex):
     class Meta:
         index_name = 'sub_index'
         read_capacity_units = 25
         write_capacity_units = 25
-        projection = AllProjection()
+        projection = IncludeProjection([
+            "cls", "timestamp", "school_id",
+            "display_name", "given_name", "family_name",
+            "lecture_hourly_pay", "office_hourly_pay", "trans_fee", "fixed_salary", "teacher_type",
+        ])
+
+    sub = UnicodeAttribute(hash_key=True)
+    record_type = UnicodeAttribute(range_key=True)
+
+# 給与一覧の概要表示用
+# 月ごとの合計と講師名だけを射影し、日別の配列やコマの一覧は読まない
+class SchoolSummaryIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = 'school_summary_index'
+        read_capacity_units = 25
+        write_capacity_units = 25
+        projection = IncludeProjection([
+            "cls", "timestamp", "year", "month",
+            "monthly_gross_salary", "monthly_tax_amount", "monthly_trans_fee", "extra_payment", "remark",
+            "display_name", "given_name", "family_name", "teacher_type",
+        ])
+
+    school_id = UnicodeAttribute(hash_key=True)
+    record_type = UnicodeAttribute(range_key=True)
 
-    record_type = UnicodeAttribute(hash_key=True)
-    sub = UnicodeAttribute(range_key=True)
 
 class DBModelBase(Model):
     class Meta:
@@ -39,6 +64,7 @@ class DBModelBase(Model):
     cls = DiscriminatorAttribute()
     school_id_index = SchoolIndex()
     sub_index = SubIndex()
+    school_summary_index = SchoolSummaryIndex()
     timestamp = UnicodeAttribute()
 
     
@@ -68,18 +94,31 @@ class TimeslotMap(MapAttribute):
     timeslot_type = UnicodeAttribute()
 
 
+# コマの一覧と日別の配列をまとめたバイナリ (形式は api/myutils/attendance_codec.py)
+# BinaryAttribute は base64 の文字列をさらに botocore が base64 にして送るので、
+# テーブルには base64 の文字列が入り 4/3 倍の大きさになる。ここではバイト列のまま渡す
+class PackedAttendanceAttribute(BinaryAttribute):
+    def serialize(self, value: AttendanceData) -> bytes:  # type: ignore
+        return pack(value)
+
+    def deserialize(self, value: bytes) -> AttendanceData:  # type: ignore
+        return unpack(value)
+
+
 # record_type = "attendance#2023-07"
 # id = teacher_id
 class MonthlyAttendanceModel(DBModelBase, discriminator="timeslot"):
     year = NumberAttribute()
     month = NumberAttribute()
-    timeslot_list = ListAttribute(of=TimeslotMap)
+    packed = PackedAttendanceAttribute(null=True)
 
-    daily_lecture_amount = ListAttribute(of=NumberAttribute)
-    daily_office_amount = ListAttribute(of=NumberAttribute)
-    daily_latenight_amount = ListAttribute(of=NumberAttribute)
-    daily_over_eight_hour_amount = ListAttribute(of=NumberAttribute)
-    daily_attendance = ListAttribute(of=BooleanAttribute)
+    # 移行前の項目だけが持つ。新しく書く項目は packed だけを持つ
+    timeslot_list = ListAttribute(of=TimeslotMap, null=True)
+    daily_lecture_amount = ListAttribute(of=NumberAttribute, null=True)
+    daily_office_amount = ListAttribute(of=NumberAttribute, null=True)
+    daily_latenight_amount = ListAttribute(of=NumberAttribute, null=True)
+    daily_over_eight_hour_amount = ListAttribute(of=NumberAttribute, null=True)
+    daily_attendance = ListAttribute(of=BooleanAttribute, null=True)
 
     monthly_gross_salary = NumberAttribute()
     monthly_tax_amount = NumberAttribute()
@@ -97,6 +136,38 @@ class MonthlyAttendanceModel(DBModelBase, discriminator="timeslot"):
     teacher_type = UnicodeAttribute()
     sub = UnicodeAttribute(null=True)
 
+    def attendance_data(self) -> AttendanceData:
+        if self.packed is not None:
+            return self.packed
+        return AttendanceData(
+            timeslot_list=[
+                PackedTimeslot(
+                    day=int(timeslot.day),
+                    start_minute=minute_of_day(timeslot.start_time),
+                    end_minute=minute_of_day(timeslot.end_time),
+                    timeslot_number=int(timeslot.timeslot_number),
+                    timeslot_type=timeslot.timeslot_type,
+                )
+                for timeslot in self.timeslot_list or []
+            ],
+            daily_lecture_amount=[int(v) for v in self.daily_lecture_amount or [0] * 31],
+            daily_officework_amount=[int(v) for v in self.daily_office_amount or [0] * 31],
+            daily_latenight_amount=[int(v) for v in self.daily_latenight_amount or [0] * 31],
+            daily_over_eight_hour_amount=[int(v) for v in self.daily_over_eight_hour_amount or [0] * 31],
+            daily_attendance=list(self.daily_attendance or [False] * 31),
+        )
+
+
+# packed に書き換えたときに消す、移行前の属性
+LEGACY_ATTENDANCE_ATTRIBUTES = [
+    MonthlyAttendanceModel.timeslot_list,
+    MonthlyAttendanceModel.daily_lecture_amount,
+    MonthlyAttendanceModel.daily_office_amount,
+    MonthlyAttendanceModel.daily_latenight_amount,
+    MonthlyAttendanceModel.daily_over_eight_hour_amount,
+    MonthlyAttendanceModel.daily_attendance,
+]
+
 
 # record_type = "teacher"
 # id = UID
@@ -118,3 +189,19 @@ class TeacherModel(DBModelBase, discriminator="teacher"):
 # 塾ごとのメタ情報。各講義の開始時刻・終了時刻など
 class MetaModel(DBModelBase, discriminator="meta"):
     school_name = UnicodeAttribute()
+
+
+# record_type = "rollup#teacher#2023" / "rollup#school#2023-07"
+# id = teacher_id / school_id
+# 講師ごとの年間の合計と、塾ごとの月の合計。出勤簿を書き込むときに同じトランザクションで足し引きする
+class RollupModel(DBModelBase, discriminator="rollup"):
+    year = NumberAttribute()
+    month = NumberAttribute(null=True)
+
+    gross_salary = NumberAttribute(default=0)
+    extra_payment = NumberAttribute(default=0)
+    tax_amount = NumberAttribute(default=0)
+    trans_fee = NumberAttribute(default=0)
+    lecture_amount = NumberAttribute(default=0)
+    officework_amount = NumberAttribute(default=0)
+    headcount = NumberAttribute(default=0)
@@ -1,12 +1,16 @@
 from fastapi import FastAPI
 from mangum import Mangum
-from starlette.middleware.cors import CORSMiddleware
 
-from api.routers import root, teacher, timeslot, meta
+from api.routers import root, teacher, timeslot, meta, rollup, report
+from api.myutils.stream import NDJSON_MEDIA_TYPE
+from api.myutils.telemetry import TelemetryMiddleware
 
 
 app = FastAPI()
 
+# リクエストごとのレイテンシと DynamoDB の消費キャパシティを EMF で出す
+app.add_middleware(TelemetryMiddleware)
+
 # app.add_middleware(
 #     CORSMiddleware,
 #     allow_origins=["*"],
@@ -19,5 +23,9 @@ app.include_router(root.router)
 app.include_router(teacher.router)
 app.include_router(timeslot.router)
 app.include_router(meta.router)
+app.include_router(rollup.router)
+app.include_router(report.router)
 
-lambda_handler = Mangum(app)
+# Mangum はレスポンスを最後までまとめてから返す
+# NDJSON は base64 にせずテキストのまま返す
+lambda_handler = Mangum(app, text_mime_types=[NDJSON_MEDIA_TYPE])
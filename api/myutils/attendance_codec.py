@@ -0,0 +1,98 @@
+import struct
+from dataclasses import dataclass
+from functools import lru_cache
+
+# 出勤簿のコマの一覧と日別の配列を、固定長のバイナリにまとめる
+#   ヘッダ: version (1バイト), コマの数 (2バイト)
+#   日別: 授業・事務・深夜・8時間超の分数 (31日 x 4種類 x 2バイト), 出勤した日のビットマップ (4バイト)
+#   コマ: 日 (1), 開始・終了の0時からの分数 (2, 2), コマ番号 (1), 種類 (1) をコマの数だけ
+PACKED_VERSION = 1
+DAYS = 31
+TIMESLOT_TYPES = ["lecture", "office_work", "other"]
+TIMESLOT_TYPE_CODE = {timeslot_type: i for i, timeslot_type in enumerate(TIMESLOT_TYPES)}
+
+_HEADER = struct.Struct("<BH")
+_DAILY = struct.Struct(f"<{4 * DAYS}HI")
+_TIMESLOT = struct.Struct("<BHHBB")
+
+
+@dataclass
+class PackedTimeslot:
+    day: int
+    start_minute: int
+    end_minute: int
+    timeslot_number: int
+    timeslot_type: str
+
+
+@dataclass
+class AttendanceData:
+    timeslot_list: list[PackedTimeslot]
+    daily_lecture_amount: list[int]
+    daily_officework_amount: list[int]
+    daily_latenight_amount: list[int]
+    daily_over_eight_hour_amount: list[int]
+    daily_attendance: list[bool]
+
+
+def pack(data: AttendanceData) -> bytes:
+    attendance_bits = 0
+    for i, attended in enumerate(data.daily_attendance):
+        if attended:
+            attendance_bits |= 1 << i
+    try:
+        chunks = [
+            _HEADER.pack(PACKED_VERSION, len(data.timeslot_list)),
+            _DAILY.pack(
+                *data.daily_lecture_amount,
+                *data.daily_officework_amount,
+                *data.daily_latenight_amount,
+                *data.daily_over_eight_hour_amount,
+                attendance_bits,
+            ),
+        ]
+        for timeslot in data.timeslot_list:
+            chunks.append(_TIMESLOT.pack(
+                timeslot.day,
+                timeslot.start_minute,
+                timeslot.end_minute,
+                timeslot.timeslot_number,
+                TIMESLOT_TYPE_CODE[timeslot.timeslot_type],
+            ))
+    except struct.error as e:
+        raise ValueError(f"attendance can not be packed: {e}")
+    return b"".join(chunks)
+
+
+def unpack(packed: bytes) -> AttendanceData:
+    version, n_timeslots = _HEADER.unpack_from(packed)
+    if version != PACKED_VERSION:
+        raise ValueError(f"unknown packed attendance version: {version}")
+    daily = _DAILY.unpack_from(packed, _HEADER.size)
+    attendance_bits = daily[-1]
+    offset = _HEADER.size + _DAILY.size
+    timeslot_list = [
+        PackedTimeslot(day, start_minute, end_minute, timeslot_number, TIMESLOT_TYPES[timeslot_type])
+        for day, start_minute, end_minute, timeslot_number, timeslot_type
+        in _TIMESLOT.iter_unpack(packed[offset:offset + n_timeslots * _TIMESLOT.size])
+    ]
+    return AttendanceData(
+        timeslot_list=timeslot_list,
+        daily_lecture_amount=list(daily[0:DAYS]),
+        daily_officework_amount=list(daily[DAYS:2 * DAYS]),
+        daily_latenight_amount=list(daily[2 * DAYS:3 * DAYS]),
+        daily_over_eight_hour_amount=list(daily[3 * DAYS:4 * DAYS]),
+        daily_attendance=[bool(attendance_bits >> i & 1) for i in range(DAYS)],
+    )
+
+
+@lru_cache(maxsize=2048)
+def minute_of_day(time_str: str) -> int:
+    # "HH:MM" -> 0時からの分数。取りうる値は限られるので、移行前の項目を読むときのために覚えておく
+    hour, minute = time_str.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+@lru_cache(maxsize=2048)
+def time_str(minute: int) -> str:
+    return f"{minute // 60:02}:{minute % 60:02}"
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+    ttl: float
+
+
+# 名前つきのキャッシュ。/cache/stats で件数を返し、テストでは全部消す
+CACHES: dict[str, "TTLCache"] = {}
+
+
+class TTLCache(Generic[K, V]):
+    # ウォームなコンテナで使い回すための、件数上限と有効期限つきのキャッシュ
+    # 他のコンテナでの更新は検知できないので、古さは ttl 秒までに抑える
+    def __init__(self, maxsize: int, ttl: float, name: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # (期限, 項目の timestamp, 値)
+        self._data: OrderedDict[K, tuple[float, str | None, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        # invalidate のたびに増やし、その前に読み始めた値を入れないようにする
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if name is not None:
+            CACHES[name] = self
+
+    def get(self, key: K) -> V | None:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: K) -> tuple[V, str | None] | None:
+        # (値, 項目の timestamp)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, version, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, version
+
+    def set(self, key: K, value: V, version: str | None = None, generation: int | None = None) -> bool:
+        # version は項目の timestamp。今入っているものより古い値では上書きしない
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            entry = self._data.get(key)
+            if version is not None and entry is not None and entry[1] is not None and version < entry[1]:
+                return False
+            self._data[key] = (time.monotonic() + self.ttl, version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def get_or_load(self, key: K, load: Callable[[], tuple[V, str | None]]) -> V:
+        return self.get_or_load_entry(key, load)[0]
+
+    def get_or_load_entry(self, key: K, load: Callable[[], tuple[V, str | None]]) -> tuple[V, str | None]:
+        # load は (値, 項目の timestamp) を返す
+        # 読んでいる間に invalidate されたら、読んだ値は返すがキャッシュには入れない
+        entry = self.get_entry(key)
+        if entry is not None:
+            return entry
+        generation = self._generation
+        value, version = load()
+        self.set(key, value, version=version, generation=generation)
+        return value, version
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._data),
+            maxsize=self.maxsize,
+            ttl=self.ttl,
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def cache_stats() -> dict[str, CacheStats]:
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def clear_caches() -> None:
+    for cache in CACHES.values():
+        cache.clear()
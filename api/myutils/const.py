@@ -27,15 +27,95 @@ LECTURE_TIMES_TO_NUMBER = {
 NUMBER_TO_LECTURE_TIMES = {v: k for k, v in LECTURE_TIMES_TO_NUMBER.items()}
 
 GENSEN_PATH = "api/data/gensen-r5.csv"
+GENSEN_GLOB = "api/data/gensen-*.csv"
+
+# BatchWriteItem の上限
+BATCH_WRITE_SIZE = 25
+# TransactWriteItems の上限
+TRANSACT_WRITE_SIZE = 100
+# 同じ集計の項目を同時に更新して TransactionConflict になったときに送り直す回数と、最初の待ち時間 [秒]
+# 待ち時間は送り直すたびに2倍にし、その範囲でランダムに待つ
+TRANSACT_CONFLICT_RETRIES = 4
+TRANSACT_CONFLICT_BACKOFF = 0.05
+# 何秒分の書き込みキャパシティをまとめて使ってよいか
+WRITE_BURST_SECONDS = 10
+
+# 文字コード判定に使うCSVの先頭バイト数
+CSV_DETECT_SIZE = 64 * 1024
+
+# sub -> 講師 のキャッシュ
+SUB_CACHE_SIZE = 1024
+SUB_CACHE_TTL = 60 # 秒
+# 塾のメタ情報・講師・塾ごとの講師一覧のキャッシュ
+# 他のコンテナでの更新はこの秒数まで見えない
+META_CACHE_SIZE = 256
+META_CACHE_TTL = 300 # 秒
+TEACHER_CACHE_SIZE = 4096
+TEACHER_CACHE_TTL = 60 # 秒
+ROSTER_CACHE_SIZE = 256
+ROSTER_CACHE_TTL = 60 # 秒
+
+# JSON のレスポンスをこのバイト数以上なら圧縮する
+JSON_COMPRESS_MIN_SIZE = 1024
+# 圧縮率より速さを優先する
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# 一覧APIの1ページあたりの最大件数
+PAGE_SIZE_MAX = 1000
+# ページングのカーソルを返すレスポンスヘッダ
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# NDJSON で書き出すときに1回の Query で読む件数
+EXPORT_PAGE_SIZE = 100
+# Parquet で書き出すときの1行グループの行数
+EXPORT_ROW_GROUP_SIZE = 10000
+
+# DynamoDB への同期呼び出しを同時に何本までスレッドで動かすか
+# pynamodb (botocore) の接続プールの既定値に合わせる
+DB_THREAD_LIMIT = 10
+# 全塾のレポートで、集計のない塾の出勤簿を同時に Query する数。読み込みキャパシティ (25RCU) を使い切らないようにする
+REPORT_CONCURRENCY = 8
+
+# 復号した xlsx をメモリに置く上限。超えたら一時ファイルに書き出す
+XLSX_SPOOL_SIZE = 16 * 1024 * 1024
+
+# CloudWatch の Embedded Metric Format で出すメトリクスの名前空間
+METRICS_NAMESPACE = "FastJuku"
+# レスポンスに Server-Timing (db, calc, serialize) を付ける
+SERVER_TIMING = True
+
+# 給与明細を作るプロセス数と、書き出し待ちにしておく明細の数
+PAYSLIP_WORKERS = 4
+PAYSLIP_PENDING = 8
 
 class Payslip:
+    TEMPLATE_PATH = "api/data/payslip_template.xlsx"
+
     YEAR_CELL = "F2"
     MONTH_CELL = "H2"
 
     SCHOOL_NAME = "E5"
     FULL_NAME = "H5"
 
+    # テンプレートの合計額 (M2) は時給を決め打ちした式なので、計算済みの総支給額 + 追加で上書きする
+    GROSS_SALARY = "M2"
+    TAX_AMOUNT = "P2"
+    EXTRA_PAYMENT = "M6"
+    TRANS_FEE = "P41"
+    # 授業・事務の金額の合計。テンプレートの式 (1000円, 909円の決め打ち) を上書きする
+    LECTURE_TOTAL = "K41"
+    OFFICEWORK_TOTAL = "L41"
+
+    # (9 + 日) 行目に書く日ごとの分数の列。テンプレートの式 (コマ数からの見積もり) を上書きする
+    DAILY_LECTURE_COL = "K"
+    DAILY_OFFICEWORK_COL = "L"
+    DAILY_LATENIGHT_COL = "M"
+    DAILY_OVER_EIGHT_HOUR_COL = "N"
+
+    # (9 + 日, 3 + コマ番号) のセルに授業の分数を書く
     TIMESLOT_START_ROW = "9"
     TIMESLOT_START_COL = "3"
+    # 授業の欄は D-J 列の7コマ分
+    MAX_TIMESLOT_NUMBER = 7
 
     
\ No newline at end of file
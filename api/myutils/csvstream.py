@@ -0,0 +1,61 @@
+import codecs
+import csv
+import io
+from typing import BinaryIO, Iterator
+
+from api.myutils.const import CSV_DETECT_SIZE
+
+# chardet の判定結果を、より広い文字集合のコーデックに読み替える
+ENCODING_ALIASES = {
+    "shift_jis": "cp932",
+    "ascii": "utf-8",
+}
+DEFAULT_ENCODING = "cp932"
+
+
+def detect_encoding(head: bytes) -> str:
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # 先頭だけなので、末尾で切れたマルチバイト文字は許容する
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    # UTF-8 でなかったときだけ chardet を読み込む
+    import chardet
+
+    # 短いデータだと chardet が日本語と判定できないことがあるので、
+    # その場合は Excel の既定である cp932 として読めるかを先に試す
+    result = chardet.detect(head)
+    encoding = (result["encoding"] or "").lower()
+    if result["language"] != "Japanese":
+        try:
+            codecs.getincrementaldecoder(DEFAULT_ENCODING)().decode(head, final=False)
+            return DEFAULT_ENCODING
+        except UnicodeDecodeError:
+            pass
+    if encoding == "":
+        return DEFAULT_ENCODING
+    return ENCODING_ALIASES.get(encoding, encoding)
+
+
+def iter_csv_records(file: BinaryIO) -> Iterator[tuple[int, dict[str, str]]]:
+    # アップロードされたCSVを少しずつ読みながら (行番号, {列名: 値}) を返す
+    # 空のセルは含めない
+    head = file.read(CSV_DETECT_SIZE)
+    file.seek(0)
+    encoding = detect_encoding(head)
+
+    text = io.TextIOWrapper(file, encoding=encoding, errors="replace", newline="")  # type: ignore
+    try:
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, {
+                key.strip(): value.strip()
+                for key, value in record.items()
+                if key is not None and isinstance(value, str) and value.strip() != ""
+            }
+    finally:
+        text.detach()
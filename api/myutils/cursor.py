@@ -0,0 +1,53 @@
+import base64
+import json
+from typing import Any
+
+from fastapi import HTTPException, Response
+
+from api.myutils.const import NEXT_CURSOR_HEADER
+
+# DynamoDB の LastEvaluatedKey をそのままクライアントに渡さないよう、
+# 不透明な文字列にして受け渡す
+# 他の塾のキーから読み始められないよう、school_id も一緒に埋め込んでおく
+# テーブルとインデックスのどちらを読んだかで LastEvaluatedKey の形が違うので、読み方 (mode) も埋め込む
+
+
+def encode_cursor(school_id: str, last_evaluated_key: dict[str, Any] | None, mode: str = "") -> str | None:
+    if last_evaluated_key is None:
+        return None
+    data = json.dumps(
+        {"s": school_id, "m": mode, "k": last_evaluated_key}, separators=(",", ":"), sort_keys=True
+    )
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(school_id: str, cursor: str | None, mode: str = "") -> dict[str, Any] | None:
+    if cursor is None:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("invalid cursor")
+    if not isinstance(data, dict) or not isinstance(data.get("k"), dict):
+        raise ValueError("invalid cursor")
+    if data.get("s") != school_id:
+        raise ValueError("cursor does not belong to this school")
+    if data.get("m", "") != mode:
+        raise ValueError("cursor was issued for a different read mode")
+    return data["k"]
+
+
+def parse_cursor(school_id: str, cursor: str | None, mode: str = "") -> dict[str, Any] | None:
+    try:
+        return decode_cursor(school_id, cursor, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def set_next_cursor(
+    response: Response, school_id: str, last_evaluated_key: dict[str, Any] | None, mode: str = ""
+) -> None:
+    # 続きがあるときだけヘッダに次のカーソルを載せる
+    cursor = encode_cursor(school_id, last_evaluated_key, mode)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,74 @@
+import datetime
+import hashlib
+from dataclasses import dataclass
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Mapping
+
+from fastapi import Response
+
+# 変わっていなくても毎回問い合わせてもらう
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass
+class Validators:
+    etag: str
+    last_modified: str | None  # HTTP-date
+
+
+def http_date(timestamp: str) -> str:
+    # timestamp は to_model() の datetime.now().isoformat()。タイムゾーンがなければその環境のローカル時刻
+    return format_datetime(datetime.datetime.fromisoformat(timestamp).astimezone(datetime.timezone.utc), usegmt=True)
+
+
+def make_validators(versions: Iterable[tuple[str, str]], variant: str = "") -> Validators:
+    # versions は (キー, timestamp)。削除や追加でも変わるように、最大値だけでなく全部をハッシュする
+    # variant にはクエリなど、同じ項目から違う表現を返す条件を入れる
+    # 同じ内容でも圧縮などで表現が変わるので弱い ETag にする
+    digest = hashlib.blake2b(variant.encode("utf-8"), digest_size=12)
+    latest: str | None = None
+    for key, timestamp in sorted(versions):
+        digest.update(f"\0{key}\0{timestamp}".encode("utf-8"))
+        if latest is None or timestamp > latest:
+            latest = timestamp
+    return Validators(
+        etag=f'W/"{digest.hexdigest()}"',
+        last_modified=None if latest is None else http_date(latest),
+    )
+
+
+def _opaque_tag(etag: str) -> str:
+    # If-None-Match は弱い比較なので W/ を外して比べる
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(headers: Mapping[str, str], validators: Validators) -> bool:
+    # If-None-Match があれば If-Modified-Since は見ない (RFC 9110 13.2.2)
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = _opaque_tag(validators.etag)
+        return any(_opaque_tag(tag) == etag for tag in if_none_match.split(","))
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None or validators.last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(validators.last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def set_validators(response: Response, validators: Validators) -> None:
+    response.headers["ETag"] = validators.etag
+    if validators.last_modified is not None:
+        response.headers["Last-Modified"] = validators.last_modified
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(validators: Validators) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, validators)
+    return response
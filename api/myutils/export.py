@@ -0,0 +1,186 @@
+import codecs
+import csv
+import io
+from typing import Any, Iterable, Iterator, Literal
+
+from api.myutils.attendance_codec import time_str, unpack
+from api.myutils.const import EXPORT_ROW_GROUP_SIZE
+from api.myutils.stream import ChunkWriter
+
+ExportFormat = Literal["csv", "parquet", "arrow"]
+ExportRows = Literal["monthly", "timeslot"]
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# (列名, 型)。型は pyarrow の型名
+MONTHLY_COLUMNS: list[tuple[str, str]] = [
+    ("year", "int16"),
+    ("month", "int8"),
+    ("teacher_id", "string"),
+    ("display_name", "string"),
+    ("family_name", "string"),
+    ("given_name", "string"),
+    ("teacher_type", "string"),
+    ("monthly_gross_salary", "int64"),
+    ("monthly_tax_amount", "int64"),
+    ("monthly_trans_fee", "int64"),
+    ("extra_payment", "int64"),
+    ("remark", "string"),
+]
+TIMESLOT_COLUMNS: list[tuple[str, str]] = [
+    ("year", "int16"),
+    ("month", "int8"),
+    ("teacher_id", "string"),
+    ("display_name", "string"),
+    ("day", "int8"),
+    ("timeslot_number", "int8"),
+    ("timeslot_type", "string"),
+    ("start_time", "string"),
+    ("end_time", "string"),
+]
+# timeslot のときに読む属性。移行前の項目は timeslot_list、移行後の項目は packed を持つ
+TIMESLOT_ATTRIBUTES = ["id", "year", "month", "display_name", "packed", "timeslot_list"]
+
+
+def _value(attribute: dict[str, Any] | None) -> Any:
+    # DynamoDB の生の値 ({"N": "1"} など) を Python の値にする
+    if attribute is None or "NULL" in attribute:
+        return None
+    if "N" in attribute:
+        number = attribute["N"]
+        return int(number) if number.lstrip("-").isdigit() else int(float(number))
+    if "S" in attribute:
+        return attribute["S"]
+    if "BOOL" in attribute:
+        return attribute["BOOL"]
+    raise ValueError(f"unsupported attribute: {attribute}")
+
+
+def monthly_rows(items: list[dict[str, Any]]) -> list[tuple[Any, ...]]:
+    # 1件 = 講師1人の1か月分
+    return [
+        (
+            _value(item["year"]),
+            _value(item["month"]),
+            _value(item["id"]),
+            _value(item.get("display_name")),
+            _value(item.get("family_name")),
+            _value(item.get("given_name")),
+            _value(item.get("teacher_type")),
+            _value(item.get("monthly_gross_salary")),
+            _value(item.get("monthly_tax_amount")),
+            _value(item.get("monthly_trans_fee")),
+            _value(item.get("extra_payment")),
+            _value(item.get("remark")),
+        )
+        for item in items
+    ]
+
+
+def timeslot_rows(items: list[dict[str, Any]]) -> list[tuple[Any, ...]]:
+    # 1件 = 1コマ
+    rows = []
+    for item in items:
+        year = _value(item["year"])
+        month = _value(item["month"])
+        teacher_id = _value(item["id"])
+        display_name = _value(item.get("display_name"))
+        if "packed" in item:
+            for packed_timeslot in unpack(item["packed"]["B"]).timeslot_list:
+                rows.append((
+                    year,
+                    month,
+                    teacher_id,
+                    display_name,
+                    packed_timeslot.day,
+                    packed_timeslot.timeslot_number,
+                    packed_timeslot.timeslot_type,
+                    time_str(packed_timeslot.start_minute),
+                    time_str(packed_timeslot.end_minute),
+                ))
+            continue
+        for timeslot in item.get("timeslot_list", {}).get("L", []):
+            timeslot = timeslot["M"]
+            rows.append((
+                year,
+                month,
+                teacher_id,
+                display_name,
+                _value(timeslot["day"]),
+                _value(timeslot["timeslot_number"]),
+                _value(timeslot["timeslot_type"]),
+                _value(timeslot["start_time"]),
+                _value(timeslot["end_time"]),
+            ))
+    return rows
+
+
+def csv_chunks(pages: Iterable[list[tuple[Any, ...]]], columns: list[tuple[str, str]]) -> Iterator[bytes]:
+    # Excel で開いても文字化けしないように BOM を付ける
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerow([name for name, _ in columns])
+    yield codecs.BOM_UTF8 + buffer.getvalue().encode("utf-8")
+    for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def arrow_chunks(
+    pages: Iterable[list[tuple[Any, ...]]],
+    columns: list[tuple[str, str]],
+    format: Literal["parquet", "arrow"],
+) -> Iterator[bytes]:
+    # pyarrow は読み込みが重いので、Parquet / Arrow で書き出すときだけ読み込む (コールドスタート対策)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns])
+    sink = ChunkWriter()
+
+    def to_batch(rows: list[tuple[Any, ...]]) -> "pa.RecordBatch":
+        return pa.RecordBatch.from_arrays(
+            [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)],
+            schema=schema,
+        )
+
+    if format == "arrow":
+        with pa.ipc.new_stream(sink, schema) as writer:
+            for rows in pages:
+                writer.write_batch(to_batch(rows))
+                yield sink.pop()
+        yield sink.pop()
+        return
+
+    # Parquet は行グループが小さすぎると読むのが遅くなるので、ページをまとめてから書く
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        buffered: list[tuple[Any, ...]] = []
+        for rows in pages:
+            buffered += rows
+            if len(buffered) >= EXPORT_ROW_GROUP_SIZE:
+                writer.write_batch(to_batch(buffered))
+                buffered = []
+                yield sink.pop()
+        if len(buffered) > 0:
+            writer.write_batch(to_batch(buffered))
+    yield sink.pop()
+
+
+def export_chunks(
+    pages: Iterable[list[dict[str, Any]]], rows: ExportRows, format: ExportFormat
+) -> Iterator[bytes]:
+    # pages は DynamoDB の Query の1ページ分の生の項目
+    if rows == "timeslot":
+        columns, to_rows = TIMESLOT_COLUMNS, timeslot_rows
+    else:
+        columns, to_rows = MONTHLY_COLUMNS, monthly_rows
+    row_pages = (to_rows(items) for items in pages)
+    if format == "csv":
+        return csv_chunks(row_pages, columns)
+    return arrow_chunks(row_pages, columns, format)
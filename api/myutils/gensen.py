@@ -0,0 +1,97 @@
+import csv
+import re
+from functools import lru_cache
+from glob import glob
+from pathlib import Path
+
+import numpy as np
+
+from api.myutils.const import GENSEN_GLOB
+
+# gensen-r5.csv -> 令和5年 -> 2023年
+GENSEN_FILE_PATTERN = re.compile(r"gensen-r(\d+)\.csv$")
+REIWA_OFFSET = 2018
+
+
+class GensenTable:
+    # 源泉徴収税額表を min 昇順の配列に変換したもの
+    # columns[dependents] は扶養親族等の数ごとの列 (-1 は乙欄)
+    # 値が 1 未満なら税率, 1 以上なら税額
+    def __init__(self, lower: np.ndarray, upper: np.ndarray, columns: dict[int, np.ndarray]):
+        order = np.argsort(lower, kind="stable")
+        self.lower = np.ascontiguousarray(lower[order], dtype=np.float64)
+        self.upper = np.ascontiguousarray(upper[order], dtype=np.float64)
+        self.columns = {
+            dependents: np.ascontiguousarray(values[order], dtype=np.float64)
+            for dependents, values in columns.items()
+        }
+
+    @classmethod
+    def from_csv(cls, path: str | Path) -> "GensenTable":
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = [[float(v) for v in row] for row in reader if row]
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), len(header))
+        min_idx = header.index("min")
+        max_idx = header.index("max")
+        columns = {
+            int(name): data[:, i]
+            for i, name in enumerate(header)
+            if i not in (min_idx, max_idx)
+        }
+        return cls(data[:, min_idx], data[:, max_idx], columns)
+
+    @property
+    def dependents(self) -> list[int]:
+        return sorted(self.columns.keys())
+
+    def _column(self, dependents: int) -> np.ndarray:
+        if dependents not in self.columns:
+            raise ValueError(f"dependents must be one of {self.dependents}, but {dependents}")
+        return self.columns[dependents]
+
+    def lookup(self, amount: float, dependents: int = -1) -> float:
+        column = self._column(dependents)
+        idx = int(np.searchsorted(self.lower, amount, side="right")) - 1
+        if idx < 0 or not (amount < self.upper[idx]):
+            raise ValueError(f"amount {amount} is out of range of gensen table")
+        v = float(column[idx])
+        if v < 1:
+            return v * amount
+        return v
+
+    def lookup_batch(self, amounts: np.ndarray, dependents: int = -1) -> np.ndarray:
+        column = self._column(dependents)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        idx = np.searchsorted(self.lower, amounts, side="right") - 1
+        valid = idx >= 0
+        idx = np.where(valid, idx, 0)
+        valid &= amounts < self.upper[idx]
+        if not np.all(valid):
+            bad = amounts[~valid][0]
+            raise ValueError(f"amount {bad} is out of range of gensen table")
+        v = column[idx]
+        return np.where(v < 1, v * amounts, v)
+
+
+@lru_cache(maxsize=None)
+def load_gensen_tables() -> dict[int, GensenTable]:
+    tables: dict[int, GensenTable] = {}
+    for path in glob(GENSEN_GLOB):
+        m = GENSEN_FILE_PATTERN.search(path)
+        if m is None:
+            continue
+        tables[REIWA_OFFSET + int(m.group(1))] = GensenTable.from_csv(path)
+    if len(tables) == 0:
+        raise FileNotFoundError(f"gensen table not found: {GENSEN_GLOB}")
+    return tables
+
+
+def get_gensen_table(year: int) -> GensenTable:
+    # 給与の支払年に適用される最新の税額表を使う。該当がなければ最も古い表
+    tables = load_gensen_tables()
+    candidates = [y for y in tables if y <= year]
+    if len(candidates) == 0:
+        return tables[min(tables)]
+    return tables[max(candidates)]
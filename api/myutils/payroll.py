@@ -0,0 +1,213 @@
+import calendar
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+
+from api.myutils.const import PREPARE_TIME
+from api.myutils.gensen import GensenTable, get_gensen_table
+from api.myutils.telemetry import timed
+from api.schemas.timeslot import MonthlyAttendance, MonthlyAttendanceBeforeCalculate
+
+DAYS = 31
+MINUTES_PER_DAY = 24 * 60
+
+LECTURE = 0
+OFFICE_WORK = 1
+TIMESLOT_TYPE_CODE = {"lecture": LECTURE, "office_work": OFFICE_WORK}
+
+
+@dataclass
+class PayrollResult:
+    # daily_* は (講師数, 31) の配列, monthly_* は (講師数,) の配列
+    daily_lecture_amount: np.ndarray
+    daily_officework_amount: np.ndarray
+    daily_latenight_amount: np.ndarray
+    daily_over_eight_hour_amount: np.ndarray
+    daily_attendance: np.ndarray
+
+    monthly_gross_salary: np.ndarray
+    monthly_tax_amount: np.ndarray
+    monthly_trans_fee: np.ndarray
+
+
+def calc_payroll(
+    teacher_idx: np.ndarray,
+    day: np.ndarray,
+    start_min: np.ndarray,
+    end_min: np.ndarray,
+    timeslot_type: np.ndarray,
+    lecture_hourly_pay: np.ndarray,
+    office_hourly_pay: np.ndarray,
+    fixed_salary: np.ndarray,
+    trans_fee: np.ndarray,
+    extra_payment: np.ndarray,
+    gensen: GensenTable,
+) -> PayrollResult:
+    # 1コマ1行のフラットな配列から、全講師分の給与を一度に計算する
+    # start_min, end_min はその日の0時からの分数 (日付をまたぐ場合は1440以上)
+    # 計算内容は MonthlyAttendanceBeforeCalculate.calc_salary と同じ
+    n_teachers = len(lecture_hourly_pay)
+    size = n_teachers * DAYS
+    teacher_idx = np.asarray(teacher_idx, dtype=np.int64)
+    start_min = np.asarray(start_min, dtype=np.int64)
+    end_min = np.asarray(end_min, dtype=np.int64)
+    timeslot_type = np.asarray(timeslot_type, dtype=np.int64)
+    key = teacher_idx * DAYS + (np.asarray(day, dtype=np.int64) - 1)
+
+    is_lecture = timeslot_type == LECTURE
+    is_officework = timeslot_type == OFFICE_WORK
+    # timedelta.seconds と同じく1日未満に丸める
+    duration = (end_min - start_min) % MINUTES_PER_DAY
+
+    lecture_amount = np.bincount(
+        key, weights=np.where(is_lecture, duration, 0), minlength=size
+    ).astype(np.int64)
+    officework_amount = np.bincount(
+        key, weights=np.where(is_officework, duration, 0), minlength=size
+    ).astype(np.int64)
+    n_lectures = np.bincount(key[is_lecture], minlength=size)
+    attendance = np.bincount(key, minlength=size) > 0
+
+    # 準備時間
+    prepare_after_end = np.where(n_lectures > 0, (n_lectures + 1) * PREPARE_TIME, 0)
+    prepare_before_end = np.where(n_lectures > 0, (n_lectures - 1) * PREPARE_TIME, 0)
+    officework_amount += prepare_after_end + prepare_before_end
+
+    # 深夜勤務手当
+    last_end = np.zeros(size, dtype=np.int64)
+    np.maximum.at(last_end, key, end_min)
+    end_time = last_end + prepare_after_end
+    end_hour = (end_time // 60) % 24
+    latenight_boundary = np.where(end_hour < 12, 10 * 60, 22 * 60)
+    latenight_amount = np.where(
+        attendance & (end_time > latenight_boundary),
+        (end_time - latenight_boundary) % MINUTES_PER_DAY,
+        0,
+    )
+
+    # 8時間超勤務手当
+    over_eight_hour_amount = np.where(
+        attendance, np.maximum(0, lecture_amount + officework_amount - 8 * 60), 0
+    )
+
+    shape = (n_teachers, DAYS)
+    lecture_amount = lecture_amount.reshape(shape)
+    officework_amount = officework_amount.reshape(shape)
+    latenight_amount = latenight_amount.reshape(shape)
+    over_eight_hour_amount = over_eight_hour_amount.reshape(shape)
+    attendance = attendance.reshape(shape)
+
+    lecture_pay = np.asarray(lecture_hourly_pay, dtype=np.float64)[:, None]
+    office_pay = np.asarray(office_hourly_pay, dtype=np.float64)[:, None]
+    daily_salary = lecture_pay * lecture_amount / 60 + office_pay * officework_amount / 60
+    daily_salary = daily_salary + 0.25 * office_pay * latenight_amount / 60
+    daily_salary = daily_salary + 0.25 * office_pay * over_eight_hour_amount / 60
+    daily_salary = np.where(attendance, daily_salary, 0.0)
+
+    monthly_gross_amount = np.sum(daily_salary, axis=1) + np.asarray(fixed_salary, dtype=np.float64)
+    monthly_trans_fee = np.sum(attendance, axis=1) * np.asarray(trans_fee, dtype=np.float64)
+    monthly_gross_extra = monthly_gross_amount + np.asarray(extra_payment, dtype=np.float64)
+    monthly_tax_amount = gensen.lookup_batch(monthly_gross_extra, dependents=-1)
+
+    return PayrollResult(
+        daily_lecture_amount=lecture_amount,
+        daily_officework_amount=officework_amount,
+        daily_latenight_amount=latenight_amount,
+        daily_over_eight_hour_amount=over_eight_hour_amount,
+        daily_attendance=attendance,
+        monthly_gross_salary=monthly_gross_amount.astype(np.int64),
+        monthly_tax_amount=monthly_tax_amount.astype(np.int64),
+        monthly_trans_fee=monthly_trans_fee.astype(np.int64),
+    )
+
+
+def _minute_of_day(time: datetime.datetime, day_ordinal: int) -> int:
+    return (time.toordinal() - day_ordinal) * MINUTES_PER_DAY + time.hour * 60 + time.minute
+
+
+@timed("calc")
+def calc_salary_batch(
+    monthly_attendance_before_list: list[MonthlyAttendanceBeforeCalculate],
+    gensen: GensenTable | None = None,
+) -> list[MonthlyAttendance]:
+    # calc_salary を講師ごとに呼ぶ代わりに、まとめて calc_payroll で計算する
+    # 年ごとに税額表が異なるので、年単位でまとめて計算する
+    year2indices: dict[int, list[int]] = {}
+    for i, monthly_attendance_before in enumerate(monthly_attendance_before_list):
+        year2indices.setdefault(monthly_attendance_before.year, []).append(i)
+
+    ret: list[MonthlyAttendance | None] = [None] * len(monthly_attendance_before_list)
+    for year, indices in year2indices.items():
+        before_list = [monthly_attendance_before_list[i] for i in indices]
+        result = _calc_salary_batch(before_list, gensen or get_gensen_table(year))
+        for i, monthly_attendance in zip(indices, result):
+            ret[i] = monthly_attendance
+    return ret  # type: ignore
+
+
+def _calc_salary_batch(
+    monthly_attendance_before_list: list[MonthlyAttendanceBeforeCalculate],
+    gensen: GensenTable,
+) -> list[MonthlyAttendance]:
+    teacher_idx: list[int] = []
+    day: list[int] = []
+    start_min: list[int] = []
+    end_min: list[int] = []
+    timeslot_type: list[int] = []
+    for i, monthly_attendance_before in enumerate(monthly_attendance_before_list):
+        year = monthly_attendance_before.year
+        month = monthly_attendance_before.month
+        n_days = calendar.monthrange(year, month)[1]
+        first_ordinal = datetime.date(year, month, 1).toordinal()
+        for timeslot in monthly_attendance_before.timeslot_list:
+            if timeslot.timeslot_type not in TIMESLOT_TYPE_CODE:
+                raise ValueError(f"timeslot_type must be lecture or office_work, but {timeslot.timeslot_type}")
+            if timeslot.day < 1 or timeslot.day > n_days:
+                raise ValueError(f"day must be in range 1-{n_days}, but {timeslot.day}")
+            day_ordinal = first_ordinal + timeslot.day - 1
+            teacher_idx.append(i)
+            day.append(timeslot.day)
+            start_min.append(_minute_of_day(timeslot.start_time, day_ordinal))
+            end_min.append(_minute_of_day(timeslot.end_time, day_ordinal))
+            timeslot_type.append(TIMESLOT_TYPE_CODE[timeslot.timeslot_type])
+
+    teachers = [monthly_attendance_before.teacher for monthly_attendance_before in monthly_attendance_before_list]
+    result = calc_payroll(
+        teacher_idx=np.array(teacher_idx, dtype=np.int64),
+        day=np.array(day, dtype=np.int64),
+        start_min=np.array(start_min, dtype=np.int64),
+        end_min=np.array(end_min, dtype=np.int64),
+        timeslot_type=np.array(timeslot_type, dtype=np.int64),
+        lecture_hourly_pay=np.array([teacher.lecture_hourly_pay for teacher in teachers], dtype=np.float64),
+        office_hourly_pay=np.array([teacher.office_hourly_pay for teacher in teachers], dtype=np.float64),
+        fixed_salary=np.array([teacher.fixed_salary for teacher in teachers], dtype=np.float64),
+        trans_fee=np.array([teacher.trans_fee for teacher in teachers], dtype=np.float64),
+        extra_payment=np.array(
+            [monthly_attendance_before.extra_payment for monthly_attendance_before in monthly_attendance_before_list],
+            dtype=np.float64,
+        ),
+        gensen=gensen,
+    )
+
+    return [
+        MonthlyAttendance(
+            year=monthly_attendance_before.year,
+            month=monthly_attendance_before.month,
+            teacher=monthly_attendance_before.teacher,
+            timeslot_list=monthly_attendance_before.timeslot_list,
+
+            daily_lecture_amount=result.daily_lecture_amount[i].tolist(),
+            daily_officework_amount=result.daily_officework_amount[i].tolist(),
+            daily_latenight_amount=result.daily_latenight_amount[i].tolist(),
+            daily_over_eight_hour_amount=result.daily_over_eight_hour_amount[i].tolist(),
+            daily_attendance=result.daily_attendance[i].tolist(),
+
+            monthly_gross_salary=int(result.monthly_gross_salary[i]),
+            monthly_tax_amount=int(result.monthly_tax_amount[i]),
+            monthly_trans_fee=int(result.monthly_trans_fee[i]),
+            extra_payment=monthly_attendance_before.extra_payment,
+            remark=monthly_attendance_before.remark,
+        )
+        for i, monthly_attendance_before in enumerate(monthly_attendance_before_list)
+    ]
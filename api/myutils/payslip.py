@@ -0,0 +1,202 @@
+"""給与明細 (payslip_template.xlsx) の一括作成
+
+    python -m api.myutils.payslip --school-id <school_id> --year 2023 --month 1 --out payslips.zip
+"""
+import argparse
+import io
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+from api.myutils.const import PAYSLIP_PENDING, PAYSLIP_WORKERS, Payslip
+from api.myutils.stream import ChunkWriter
+from api.schemas.timeslot import MonthlyAttendance
+
+if TYPE_CHECKING:
+    from openpyxl.workbook.workbook import Workbook
+    from openpyxl.worksheet.worksheet import Worksheet
+
+ZIP_MEDIA_TYPE = "application/zip"
+
+
+def payslip_values(school_name: str, monthly_attendance: MonthlyAttendance) -> dict[str, Any]:
+    # テンプレートに書き込む {セル: 値}
+    # 金額と分数は出勤簿に保存した計算結果を書き、テンプレートの見積もりの式は使わない
+    teacher = monthly_attendance.teacher
+    values: dict[str, Any] = {
+        Payslip.YEAR_CELL: monthly_attendance.year,
+        Payslip.MONTH_CELL: monthly_attendance.month,
+        Payslip.SCHOOL_NAME: school_name,
+        Payslip.FULL_NAME: f"{teacher.family_name} {teacher.given_name}",
+        Payslip.GROSS_SALARY: monthly_attendance.monthly_gross_salary + monthly_attendance.extra_payment,
+        Payslip.TAX_AMOUNT: monthly_attendance.monthly_tax_amount,
+        Payslip.EXTRA_PAYMENT: monthly_attendance.extra_payment,
+        Payslip.TRANS_FEE: monthly_attendance.monthly_trans_fee,
+        Payslip.LECTURE_TOTAL: int(teacher.lecture_hourly_pay * sum(monthly_attendance.daily_lecture_amount) / 60),
+        Payslip.OFFICEWORK_TOTAL: int(
+            teacher.office_hourly_pay * sum(monthly_attendance.daily_officework_amount) / 60
+        ),
+    }
+
+    # 日ごとの授業・事務・深夜・8時間超過の分数。働いていない日は空欄にする
+    start_row = int(Payslip.TIMESLOT_START_ROW)
+    for col, daily_amount in [
+        (Payslip.DAILY_LECTURE_COL, monthly_attendance.daily_lecture_amount),
+        (Payslip.DAILY_OFFICEWORK_COL, monthly_attendance.daily_officework_amount),
+        (Payslip.DAILY_LATENIGHT_COL, monthly_attendance.daily_latenight_amount),
+        (Payslip.DAILY_OVER_EIGHT_HOUR_COL, monthly_attendance.daily_over_eight_hour_amount),
+    ]:
+        for day, minutes in enumerate(daily_amount, start=1):
+            values[f"{col}{start_row + day}"] = minutes if minutes > 0 else None
+
+    # 授業の分数。同じ日の同じコマが複数あれば足す
+    from openpyxl.utils import get_column_letter
+
+    start_col = int(Payslip.TIMESLOT_START_COL)
+    for timeslot in monthly_attendance.timeslot_list:
+        if timeslot.timeslot_type != "lecture":
+            continue
+        if timeslot.timeslot_number > Payslip.MAX_TIMESLOT_NUMBER:
+            continue
+        cell = f"{get_column_letter(start_col + timeslot.timeslot_number)}{start_row + timeslot.day}"
+        minutes = (timeslot.end_time - timeslot.start_time).seconds // 60
+        values[cell] = values.get(cell, 0) + minutes
+    return values
+
+
+def payslip_filename(monthly_attendance: MonthlyAttendance) -> str:
+    display_name = re.sub(r'[\\/:*?"<>|]', "_", monthly_attendance.teacher.display_name)
+    return f"{monthly_attendance.year}-{monthly_attendance.month:02}_{display_name}.xlsx"
+
+
+class PayslipRenderer:
+    # テンプレートは一度だけ読み込み、書き込んだセルを保存後に元に戻して使い回す
+    def __init__(self, template_path: str = Payslip.TEMPLATE_PATH):
+        import openpyxl
+
+        self.wb: "Workbook" = openpyxl.load_workbook(template_path)
+        self.ws: "Worksheet" = self.wb.active  # type: ignore
+
+        # 見本として入っている授業の分数を消しておく
+        start_row = int(Payslip.TIMESLOT_START_ROW)
+        start_col = int(Payslip.TIMESLOT_START_COL)
+        for row in self.ws.iter_rows(
+            min_row=start_row + 1,
+            max_row=start_row + 31,
+            min_col=start_col + 1,
+            max_col=start_col + Payslip.MAX_TIMESLOT_NUMBER,
+        ):
+            for cell in row:
+                cell.value = None
+
+    def render(self, school_name: str, monthly_attendance: MonthlyAttendance) -> bytes:
+        values = payslip_values(school_name, monthly_attendance)
+        original = {cell: self.ws[cell].value for cell in values}
+        buffer = io.BytesIO()
+        try:
+            for cell, value in values.items():
+                self.ws[cell].value = value
+            self.wb.save(buffer)
+        finally:
+            for cell, value in original.items():
+                self.ws[cell].value = value
+        return buffer.getvalue()
+
+
+# プロセスプールの各プロセスで使うテンプレート
+_worker_renderer: PayslipRenderer | None = None
+
+
+def _init_worker(template_path: str) -> None:
+    global _worker_renderer
+    _worker_renderer = PayslipRenderer(template_path)
+
+
+def _render_in_worker(school_name: str, monthly_attendance: MonthlyAttendance) -> bytes:
+    return _worker_renderer.render(school_name, monthly_attendance)  # type: ignore
+
+
+@lru_cache(maxsize=None)
+def _get_executor(workers: int, template_path: str) -> ProcessPoolExecutor | None:
+    # プロセスプールはリクエストごとに作らず、最初に使うときに作って使い回す
+    # (プロセスの起動とテンプレートの読み込みは最初の1回だけになる)
+    try:
+        return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(template_path,))
+    except OSError:
+        # Lambda には /dev/shm がなくプロセスプールを作れないので、同じプロセスで作る
+        return None
+
+
+def render_payslips(
+    school_name: str,
+    monthly_attendance_list: Iterable[MonthlyAttendance],
+    workers: int = PAYSLIP_WORKERS,
+    template_path: str = Payslip.TEMPLATE_PATH,
+) -> Iterator[tuple[str, bytes]]:
+    # (ファイル名, xlsx) を入力の順に返す
+    # 手元に置く明細は PAYSLIP_PENDING 件までにして、全員分をメモリに載せない
+    executor = _get_executor(workers, template_path) if workers > 1 else None
+
+    if executor is None:
+        renderer = PayslipRenderer(template_path)
+        for monthly_attendance in monthly_attendance_list:
+            yield payslip_filename(monthly_attendance), renderer.render(school_name, monthly_attendance)
+        return
+
+    pending: deque[tuple[str, Future[bytes]]] = deque()
+    try:
+        for monthly_attendance in monthly_attendance_list:
+            future = executor.submit(_render_in_worker, school_name, monthly_attendance)
+            pending.append((payslip_filename(monthly_attendance), future))
+            if len(pending) >= PAYSLIP_PENDING:
+                filename, future = pending.popleft()
+                yield filename, future.result()
+        while len(pending) > 0:
+            filename, future = pending.popleft()
+            yield filename, future.result()
+    except BrokenProcessPool:
+        # プロセスが落ちたプールは使えないので、次のリクエストでは作り直す
+        _get_executor.cache_clear()
+        raise
+    finally:
+        # 途中で切断されたときは、まだ始まっていない分だけ取り消す。プールは閉じない
+        for _, future in pending:
+            future.cancel()
+
+
+def zip_stream(files: Iterable[tuple[str, bytes]]) -> Iterator[bytes]:
+    # xlsx はすでに圧縮されているので、ZIP では圧縮しない
+    writer = ChunkWriter()
+    with zipfile.ZipFile(writer, "w", compression=zipfile.ZIP_STORED) as zf:  # type: ignore
+        for filename, data in files:
+            zf.writestr(filename, data)
+            yield writer.pop()
+    yield writer.pop()
+
+
+def main() -> None:
+    from api.cruds.meta import MetaRepo
+    from api.cruds.timeslot import MonthlyAttendanceRepo
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--school-id", required=True)
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--month", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--workers", type=int, default=PAYSLIP_WORKERS)
+    args = parser.parse_args()
+
+    meta = MetaRepo.get(args.school_id)
+    monthly_attendance_list = MonthlyAttendanceRepo.list_monthly(args.school_id, args.year, args.month)
+    with open(args.out, "wb") as f:
+        for chunk in zip_stream(render_payslips(meta.school_name, monthly_attendance_list, workers=args.workers)):
+            f.write(chunk)
+    print(f"{len(monthly_attendance_list)} payslips -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import gzip
+import importlib.util
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from api.myutils.const import BROTLI_QUALITY, GZIP_LEVEL, JSON_COMPRESS_MIN_SIZE
+from api.myutils.telemetry import stage
+
+JSON_MEDIA_TYPE = "application/json"
+
+# FastAPI の既定の経路 (response_model での検証 -> dict -> json.dumps) を通さずに、
+# pydantic-core で直接 JSON のバイト列にして返す
+# response_model はドキュメント (OpenAPI) のためにデコレータに残しておく
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    # TypeAdapter は作るのが重いので、型ごとに1つだけ作る
+    return TypeAdapter(tp)
+
+
+@lru_cache(maxsize=1)
+def brotli_available() -> bool:
+    # brotli は依存に入れていないので、入っている環境でだけ使う
+    return importlib.util.find_spec("brotli") is not None
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    # Accept-Encoding の q 値がいちばん大きいものを選ぶ。同じなら br を優先する
+    if not accept_encoding:
+        return None
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                continue
+        qualities[coding.strip().lower()] = q
+
+    candidates = ["br", "gzip"] if brotli_available() else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = qualities.get(coding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def json_response(
+    request: Request, content: Any, tp: Any, response: Response | None = None, status_code: int = 200
+) -> Response:
+    # content は tp の値 (検証済みのモデル)。検証し直さずにそのまま JSON にする
+    # response には FastAPI が渡す Response (ETag やカーソルのヘッダを付けたもの) を渡す
+    headers = {}
+    if response is not None:
+        headers.update((key, value) for key, value in response.headers.items() if key != "content-length")
+    headers["Vary"] = "Accept-Encoding"
+    with stage("serialize"):
+        body = type_adapter(tp).dump_json(content)
+        if len(body) >= JSON_COMPRESS_MIN_SIZE:
+            encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+            if encoding is not None:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
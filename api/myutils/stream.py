@@ -0,0 +1,39 @@
+from typing import Iterable, Iterator
+
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_lines(models: Iterable[BaseModel]) -> Iterator[bytes]:
+    # 1件ごとに1行の JSON にして返す
+    # StreamingResponse に渡すと、読んだそばから送り出される
+    for model in models:
+        yield model.model_dump_json().encode("utf-8") + b"\n"
+
+
+class ChunkWriter:
+    # ZipFile や pyarrow の書き込み先。書かれた分を pop で取り出して、そのまま送る
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
@@ -0,0 +1,210 @@
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, ParamSpec, TypeVar
+
+from pynamodb.connection.base import Connection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.myutils.const import METRICS_NAMESPACE, SERVER_TIMING
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# 読み込みの操作。これ以外は書き込みのキャパシティとして数える
+READ_OPERATIONS = {"GetItem", "BatchGetItem", "Query", "Scan", "TransactGetItems"}
+
+
+class RequestMetrics:
+    # 1リクエストの計測値。run_sync のスレッドからも書き込むのでロックを取る
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self.read_capacity = 0.0
+        self.write_capacity = 0.0
+        self.operations: dict[str, int] = {}
+        # 段階 (calc, serialize など) ごとの合計時間 [秒]
+        self.stages: dict[str, float] = {}
+
+    def add_db_call(self, operation: str, seconds: float, capacity: float) -> None:
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+            if operation in READ_OPERATIONS:
+                self.read_capacity += capacity
+            else:
+                self.write_capacity += capacity
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_metrics: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+# 入れ子になった同じ段階を二重に数えないように、今計測中の段階を持つ
+_active_stages: ContextVar[frozenset[str]] = ContextVar("active_stages", default=frozenset())
+
+
+def current_metrics() -> RequestMetrics | None:
+    return _metrics.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    # リクエストの外や、同じ段階の中で呼ばれたときは何もしない
+    metrics = _metrics.get()
+    active = _active_stages.get()
+    if metrics is None or name in active:
+        yield
+        return
+    token = _active_stages.set(active | {name})
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_stage(name, time.perf_counter() - t0)
+        _active_stages.reset(token)
+
+
+def timed(name: str) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def consumed_capacity(data: dict | None) -> float:
+    # pynamodb は ReturnConsumedCapacity=TOTAL を付けて呼ぶ
+    # バッチやトランザクションではテーブルごとのリストが返る
+    if not data or "ConsumedCapacity" not in data:
+        return 0.0
+    capacity = data["ConsumedCapacity"]
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return sum(float(c.get("CapacityUnits", 0.0)) for c in capacity)
+
+
+def install_dynamodb_hook() -> None:
+    # pynamodb のすべての操作は Connection.dispatch を通るので、そこで回数と消費キャパシティを数える
+    # (pynamodb のシグナルは blinker が必要で、消費キャパシティも渡されない)
+    if getattr(Connection.dispatch, "_telemetry", False):
+        return
+    dispatch = Connection.dispatch
+
+    @functools.wraps(dispatch)
+    def dispatch_with_metrics(self: Connection, operation_name: str, operation_kwargs: dict, *args: Any, **kwargs: Any):
+        metrics = _metrics.get()
+        if metrics is None:
+            return dispatch(self, operation_name, operation_kwargs, *args, **kwargs)
+        t0 = time.perf_counter()
+        data = None
+        try:
+            data = dispatch(self, operation_name, operation_kwargs, *args, **kwargs)
+            return data
+        finally:
+            metrics.add_db_call(operation_name, time.perf_counter() - t0, consumed_capacity(data))
+
+    dispatch_with_metrics._telemetry = True  # type: ignore[attr-defined]
+    Connection.dispatch = dispatch_with_metrics  # type: ignore[method-assign]
+
+
+def server_timing(metrics: RequestMetrics, total_seconds: float) -> str:
+    # db は各スレッドの呼び出し時間の合計なので、並列に呼ぶと total を超えることがある
+    entries = [f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.db_calls} calls"']
+    entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(metrics.stages.items())]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def route_name(scope: Scope) -> str:
+    # メトリクスの次元が増えすぎないように、実際のパスではなくルートのパスを使う
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{scope['method']} {path}"
+
+
+def emf_record(
+    scope: Scope, status: int, metrics: RequestMetrics, total_seconds: float, namespace: str = METRICS_NAMESPACE
+) -> dict[str, Any]:
+    # CloudWatch Embedded Metric Format。ローカルではただの JSON として読める
+    record: dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [["route"]],
+                "Metrics": [
+                    {"Name": "latency", "Unit": "Milliseconds"},
+                    {"Name": "db_calls", "Unit": "Count"},
+                    {"Name": "db_time", "Unit": "Milliseconds"},
+                    {"Name": "read_capacity", "Unit": "Count"},
+                    {"Name": "write_capacity", "Unit": "Count"},
+                ],
+            }],
+        },
+        "route": route_name(scope),
+        "path": scope["path"],
+        "status": status,
+        "latency": round(total_seconds * 1000, 3),
+        "db_calls": metrics.db_calls,
+        "db_time": round(metrics.db_seconds * 1000, 3),
+        "read_capacity": metrics.read_capacity,
+        "write_capacity": metrics.write_capacity,
+        "operations": metrics.operations,
+        "stages": {name: round(seconds * 1000, 3) for name, seconds in metrics.stages.items()},
+    }
+    # Mangum で動いているときは Lambda のリクエスト ID を付ける
+    context = scope.get("aws.context")
+    if context is not None:
+        record["request_id"] = getattr(context, "aws_request_id", None)
+    return record
+
+
+def emit(record: dict[str, Any]) -> None:
+    # Lambda の logging は行頭に時刻などを付けて EMF として読めなくなるので、標準出力に直接書く
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    sys.stdout.flush()
+
+
+class TelemetryMiddleware:
+    # リクエストごとにルート・レイテンシ・DynamoDB の呼び出し回数と消費キャパシティを1行で出す
+    def __init__(self, app: ASGIApp, server_timing: bool = SERVER_TIMING, namespace: str = METRICS_NAMESPACE):
+        self.app = app
+        self.server_timing = server_timing
+        self.namespace = namespace
+        install_dynamodb_hook()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    # ストリーミングのレスポンスでは、ここまでにかかった分だけになる
+                    value = server_timing(metrics, time.perf_counter() - t0)
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _metrics.reset(token)
+            emit(emf_record(scope, status, metrics, time.perf_counter() - t0, self.namespace))
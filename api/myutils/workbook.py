@@ -0,0 +1,89 @@
+import datetime
+import tempfile
+from typing import IO, TYPE_CHECKING, Any, Iterator
+
+from api.myutils.const import CellBlock, XLSX_SPOOL_SIZE
+
+if TYPE_CHECKING:
+    from openpyxl.workbook.workbook import Workbook
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+# OLE 複合ファイルの先頭。暗号化された xlsx はこの形式で保存される
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+def decrypt_if_needed(file: IO[bytes], password: str | None = None) -> IO[bytes]:
+    # 暗号化されていれば msoffcrypto で復号したファイルを、そうでなければそのまま返す
+    head = file.read(len(OLE_SIGNATURE))
+    file.seek(0)
+    if head != OLE_SIGNATURE:
+        return file
+
+    import msoffcrypto
+    from msoffcrypto.exceptions import DecryptionError, FileFormatError, InvalidKeyError, ParseError
+
+    if password is None:
+        raise ValueError("workbook is encrypted, but password is not given")
+    decrypted = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE)
+    try:
+        office_file = msoffcrypto.OfficeFile(file)
+        office_file.load_key(password=password)
+        office_file.decrypt(decrypted)
+    except InvalidKeyError:
+        decrypted.close()
+        raise ValueError("password is incorrect")
+    except (DecryptionError, FileFormatError, ParseError) as e:
+        decrypted.close()
+        raise ValueError(f"unsupported encrypted file: {e}")
+    decrypted.seek(0)
+    return decrypted  # type: ignore
+
+
+def open_workbook(file: IO[bytes], password: str | None = None) -> "Workbook":
+    # 行を読みながら捨てていけるよう read_only で開く
+    from zipfile import BadZipFile
+
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        return openpyxl.load_workbook(decrypt_if_needed(file, password), read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f"could not open workbook: {e}")
+
+
+def select_month_sheets(wb: "Workbook", month: int, sheet_name: str | None = None) -> list["ReadOnlyWorksheet"]:
+    # シート名の指定がなければ「{month}月」で始まるシートを使う
+    if sheet_name is not None:
+        if sheet_name not in wb.sheetnames:
+            raise ValueError(f"sheet not found: {sheet_name}")
+        return [wb[sheet_name]]  # type: ignore
+    worksheets = [ws for ws in wb.worksheets if ws.title.startswith(f"{month}月")]
+    if len(worksheets) == 0:
+        raise ValueError(f"sheet for {month}月 not found: {wb.sheetnames}")
+    return worksheets  # type: ignore
+
+
+def iter_block_rows(ws: "ReadOnlyWorksheet") -> Iterator[list[tuple[Any, ...]]]:
+    # 時間割は BLOCK_SIZE 行ごとのブロックが縦に並んでいるので、1ブロック行ずつ返す
+    # 日付のセルは datetime で読まれるので date に直す
+    block_row: list[tuple[Any, ...]] = []
+    for row in ws.iter_rows(max_row=CellBlock.MAX_BLOCKS_ROW * CellBlock.BLOCK_SIZE, values_only=True):
+        block_row.append(tuple(
+            value.date() if isinstance(value, datetime.datetime) else value for value in row
+        ))
+        if len(block_row) == CellBlock.BLOCK_SIZE:
+            yield block_row
+            block_row = []
+    # 空のシートや短いシートで列数が揃わないときのために、足りない行は空行で埋める
+    if len(block_row) > 0:
+        width = len(block_row[0])
+        yield block_row + [(None,) * width] * (CellBlock.BLOCK_SIZE - len(block_row))
+
+
+def iter_workbook_blocks(
+    wb: "Workbook", month: int, sheet_name: str | None = None
+) -> Iterator[list[tuple[Any, ...]]]:
+    # 開くのと読むのを分けておき、復号している間に講師の一覧を読めるようにする。閉じるのは呼び出し側
+    for ws in select_month_sheets(wb, month, sheet_name):
+        yield from iter_block_rows(ws)
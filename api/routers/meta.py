@@ -1,30 +1,30 @@
 from fastapi import APIRouter
-from api.cruds.meta import MetaRepo
+from api.cruds.meta import AsyncMetaRepo
 from api.schemas.meta import MetaBase, Meta
 
 router = APIRouter()
 
 @router.post("/metas", response_model=Meta)
 async def create_meta(meta_base: MetaBase) -> Meta:
-    meta = MetaRepo.create(meta_base)
+    meta = await AsyncMetaRepo.create(meta_base)
     return meta
 
 @router.get("/metas/{school_id}", response_model=Meta)
 async def get_meta(school_id: str) -> Meta:
-    meta = MetaRepo.get(school_id)
+    meta = await AsyncMetaRepo.get(school_id)
     return meta
 
 @router.get("/metas", response_model=list[Meta])
 async def list_metas() -> list[Meta]:
-    metas = MetaRepo.list()
+    metas = await AsyncMetaRepo.list()
     return metas
 
 @router.put("/metas/{school_id}", response_model=Meta)
 async def update_meta(school_id: str, meta_base: MetaBase) -> Meta:
-    meta = MetaRepo.update(school_id, meta_base)
+    meta = await AsyncMetaRepo.update(school_id, meta_base)
     return meta
 
 @router.delete("/metas/{school_id}", response_model=Meta)
 async def delete_meta(school_id: str) -> Meta:
-    meta = MetaRepo.delete(school_id)
+    meta = await AsyncMetaRepo.delete(school_id)
     return meta
\ No newline at end of file
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from api.cruds.report import AsyncReportRepo
+from api.schemas.report import PayrollReport
+
+router = APIRouter()
+
+@router.get("/reports/payroll", response_model=PayrollReport)
+async def get_payroll_report(year: int, month: int) -> PayrollReport:
+    # 全ての塾の月の合計 (塾ごとの月の集計をまとめて読み、集計のない塾は出勤簿から数える)
+    return await AsyncReportRepo.payroll(year, month)
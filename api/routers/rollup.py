@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+
+from api.cruds.rollup import AsyncRollupRepo
+from api.db import RollupModel
+from api.schemas.rollup import PayrollRollup
+
+router = APIRouter()
+
+@router.get("/rollup/teacher/{id}", response_model=PayrollRollup)
+async def get_teacher_year_rollup(id: str, year: int) -> PayrollRollup:
+    # 講師の年間の合計 (GetItem 1回)
+    try:
+        return await AsyncRollupRepo.get_teacher_year(id, year)
+    except RollupModel.DoesNotExist:
+        raise HTTPException(status_code=404, detail=f"no attendance in {year}")
+
+@router.get("/rollup/school/{school_id}", response_model=list[PayrollRollup])
+async def list_school_month_rollups(school_id: str, year: int) -> list[PayrollRollup]:
+    # 塾の月ごとの合計 (Query 1回)
+    return await AsyncRollupRepo.list_school_months(school_id, year)
+
+@router.get("/rollup/school/{school_id}/teachers", response_model=list[PayrollRollup])
+async def list_teacher_year_rollups(school_id: str, year: int) -> list[PayrollRollup]:
+    # 塾の講師ごとの年間の合計 (Query 1回)
+    return await AsyncRollupRepo.list_teacher_years(school_id, year)
+
+@router.post("/rollup/school/{school_id}/rebuild", response_model=list[PayrollRollup])
+async def rebuild_rollups(school_id: str, year: int) -> list[PayrollRollup]:
+    # 既存の出勤簿から集計を作り直す
+    return await AsyncRollupRepo.rebuild(school_id, year)
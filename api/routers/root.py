@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Header
+from dataclasses import asdict
+
+from fastapi import APIRouter
 from pydantic import BaseModel
 
+from api.myutils.cache import cache_stats
+
 router = APIRouter()
 
 class RootRequest(BaseModel):
@@ -12,4 +16,9 @@ async def root():
 
 @router.post("/")
 async def post_root(req: RootRequest):
-    return {"message":f"hello, {req.name}"}    
+    return {"message":f"hello, {req.name}"}
+
+# このコンテナ (プロセス) のキャッシュの件数とヒット数
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {name: asdict(stats) for name, stats in cache_stats().items()}
@@ -1,48 +1,70 @@
-from io import BytesIO
-from fastapi import APIRouter, File, UploadFile
-import uuid
-import pandas as pd
+from fastapi import APIRouter, File, Query, Request, Response, UploadFile
 
-from api.schemas.person import Teacher, TeacherBase
-from api.cruds.teacher import TeacherRepo
+from api.schemas.person import Teacher, TeacherBase, TeacherImportReport
+from api.cruds.teacher import AsyncTeacherRepo
+from api.myutils.const import PAGE_SIZE_MAX
+from api.myutils.csvstream import iter_csv_records
+from api.myutils.cursor import parse_cursor, set_next_cursor
+from api.myutils.etag import is_not_modified, make_validators, not_modified, set_validators
+from api.myutils.response import json_response
 
 
 router = APIRouter()
 @router.post("/teachers", response_model=Teacher)
 async def create_teacher(teacher_base: TeacherBase):
-    teacher = TeacherRepo.create(teacher_base)
+    teacher = await AsyncTeacherRepo.create(teacher_base)
     return teacher
 
-@router.post("/teachers/bulk/{school_id}", response_model=list[Teacher])
+@router.post("/teachers/bulk/{school_id}", response_model=TeacherImportReport)
 async def create_teachers_from_csv(school_id: str, file: UploadFile = File(...)):
-    buffer = BytesIO(await file.read())
-    df = pd.read_csv(buffer)
-    df = df.where(df.notna(), None)
-    ret = [TeacherRepo.create(TeacherBase(school_id=school_id, **v))
-           for v in df.to_dict(orient="index").values()]
-    return ret
+    report = await AsyncTeacherRepo.import_records(school_id, iter_csv_records(file.file))
+    return report
 
 @router.get("/teachers/bulk/{school_id}", response_model=list[Teacher])
-async def list_teachers(school_id: str):
-    teachers = TeacherRepo.list(school_id)
-    return teachers
+async def list_teachers(
+    school_id: str,
+    request: Request,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    consistent_read: bool = False,
+):
+    # ページに分けないときはキャッシュした一覧を使い、ETag を付ける
+    if limit is None and cursor is None and not consistent_read:
+        roster = await AsyncTeacherRepo.list_versioned(school_id)
+        validators = make_validators((teacher.id, timestamp) for teacher, timestamp in roster)
+        if is_not_modified(request.headers, validators):
+            return not_modified(validators)
+        set_validators(response, validators)
+        return json_response(request, [teacher for teacher, _ in roster], list[Teacher], response)
+    # consistent_read ではテーブル、そうでなければインデックスを読むので、カーソルを取り違えないようにする
+    mode = "table" if consistent_read else "index"
+    teachers, last_evaluated_key = await AsyncTeacherRepo.list_page(
+        school_id, limit, parse_cursor(school_id, cursor, mode), consistent_read=consistent_read
+    )
+    set_next_cursor(response, school_id, last_evaluated_key, mode)
+    return json_response(request, teachers, list[Teacher], response)
 
 @router.get("/teachers/{id}", response_model=Teacher)
-async def get_teacher(id: str):
-    teacher = TeacherRepo.get(id)
-    return teacher
+async def get_teacher(id: str, request: Request, response: Response):
+    teacher, timestamp = await AsyncTeacherRepo.get_versioned(id)
+    validators = make_validators([(id, timestamp)])
+    if is_not_modified(request.headers, validators):
+        return not_modified(validators)
+    set_validators(response, validators)
+    return json_response(request, teacher, Teacher, response)
 
 @router.get("/teachers/sub/{sub}", response_model=Teacher)
 async def get_teacher_from_sub(sub: str):
-    teacher = TeacherRepo.get_from_sub(sub)
+    teacher = await AsyncTeacherRepo.get_from_sub(sub)
     return teacher
 
 @router.put("/teachers/{id}", response_model=Teacher)
 async def update_teacher(id: str, teacher_base: TeacherBase):
-    teacher = TeacherRepo.update(id, teacher_base)
+    teacher = await AsyncTeacherRepo.update(id, teacher_base)
     return teacher
 
 @router.delete("/teachers/{id}", response_model=Teacher)
 async def delete_teacher(id: str):
-    ret = TeacherRepo.delete(id)
+    ret = await AsyncTeacherRepo.delete(id)
     return ret
@@ -1,33 +1,57 @@
 from types import NoneType
-from typing import Any
-from zoneinfo import ZoneInfo
-from fastapi import APIRouter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Literal
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from unicodedata import normalize
+import asyncio
 import datetime
 import re
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pynamodb.exceptions import TransactWriteError
 
 from api.schemas.person import Teacher
 from api.schemas.timeslot import (
     Meeting,
     MonthlyAttendance,
+    MonthlyAttendanceBeforeCalculate,
+    MonthlyAttendanceSummary,
+    PatchAttendanceReq,
     Timeslot,
     UpdateAttendanceReq,
 )
-from api.cruds.teacher import TeacherRepo
-from api.cruds.timeslot import MonthlyAttendanceRepo
-from api.myutils.const import GENSEN_PATH
+from api.cruds.meta import AsyncMetaRepo
+from api.cruds.rollup import is_write_conflict
+from api.cruds.teacher import AsyncTeacherRepo
+from api.cruds.aio import run_sync
+from api.cruds.timeslot import AsyncMonthlyAttendanceRepo, MonthlyAttendanceRepo
+from api.myutils.const import PAGE_SIZE_MAX
+from api.myutils.cursor import parse_cursor, set_next_cursor
+from api.myutils.etag import Validators, is_not_modified, make_validators, not_modified, set_validators
+from api.myutils.export import (
+    EXPORT_MEDIA_TYPES,
+    TIMESLOT_ATTRIBUTES,
+    ExportFormat,
+    ExportRows,
+    export_chunks,
+)
+from api.myutils.payslip import ZIP_MEDIA_TYPE, render_payslips, zip_stream
+from api.myutils.response import json_response
+from api.myutils.stream import NDJSON_MEDIA_TYPE, ndjson_lines
+from api.myutils.workbook import iter_workbook_blocks, open_workbook
 
 from api.myutils.utilfunc import (
     excel_date_to_datetime,
     str2int_timeslot_num,
-    get_start_end_time,
 )
-from api.myutils.const import CellBlock, LECTURE_TIMES_TO_NUMBER, Payslip, PREPARE_TIME
+from api.myutils.const import CellBlock, LECTURE_TIMES_TO_NUMBER
 
 
 router = APIRouter()
 
+meeting_list_adapter = TypeAdapter(list[Meeting])
+
 
 class CreateAttendanceReq(BaseModel):
     content: list[list[list[Any]]]
@@ -35,176 +59,435 @@ class CreateAttendanceReq(BaseModel):
 
 
 @router.get("/salary/{id}", response_model=MonthlyAttendance)
-async def get_monthly_salary(id: str, year: int, month: int):
-    monthly_attendance = MonthlyAttendanceRepo.get(id, year, month)
-    return monthly_attendance
+async def get_monthly_salary(id: str, year: int, month: int, request: Request, response: Response):
+    timestamp, hydrate = await AsyncMonthlyAttendanceRepo.get_versioned(id, year, month)
+    validators = make_validators([(id, timestamp)])
+    if is_not_modified(request.headers, validators):
+        return not_modified(validators)
+    set_validators(response, validators)
+    return json_response(request, hydrate(), MonthlyAttendance, response)
+
+
+@contextmanager
+def write_conflict_as_409() -> Iterator[None]:
+    # 読んでから書くまでに他の更新が入った (ConditionalCheckFailed) か、
+    # 同じ集計の項目への同時の更新が送り直しても通らなかった (TransactionConflict) とき
+    try:
+        yield
+    except TransactWriteError as e:
+        if is_write_conflict(e):
+            raise HTTPException(status_code=409, detail="attendance was updated concurrently")
+        raise
 
 
 @router.put("/salary/{id}", response_model=MonthlyAttendance)
 async def update_monthly_salary(
     id: str, year: int, month: int, req: UpdateAttendanceReq
 ):
-    monthly_attendance = MonthlyAttendanceRepo.update(id, year, month, req)
+    with write_conflict_as_409():
+        monthly_attendance = await AsyncMonthlyAttendanceRepo.update(id, year, month, req)
     return monthly_attendance
 
 
-@router.get("/salary/bulk/{school_id}", response_model=list[MonthlyAttendance])
-async def get_monthly_salary_list(school_id: str, year: int, month: int | None = None):
-    monthly_attendance_list = MonthlyAttendanceRepo.list_monthly(school_id, year, month)
-    return monthly_attendance_list
+@router.patch("/salary/{id}", response_model=MonthlyAttendance)
+async def patch_monthly_salary(
+    id: str, year: int, month: int, req: PatchAttendanceReq
+):
+    # コマ単位の追加・削除。変わった日だけを計算し直す
+    try:
+        with write_conflict_as_409():
+            monthly_attendance = await AsyncMonthlyAttendanceRepo.patch(id, year, month, req)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return monthly_attendance
+
+
+@router.get(
+    "/salary/bulk/{school_id}",
+    response_model=list[MonthlyAttendance] | list[MonthlyAttendanceSummary],
+)
+async def get_monthly_salary_list(
+    school_id: str,
+    request: Request,
+    response: Response,
+    year: int,
+    month: int | None = None,
+    limit: int | None = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    format: Literal["json", "ndjson"] = "json",
+    view: Literal["full", "summary"] = "full",
+):
+    # view=summary のときは月ごとの合計と講師の情報だけを返す
+    summary = view == "summary"
+    # NDJSON のときは limit, cursor を使わずに全件を流す
+    validators = await list_validators(
+        request, school_id, year, month or 1, year, month or 12,
+        summary=summary, paged=format == "json" and (limit is not None or cursor is not None),
+    )
+    if validators is not None and is_not_modified(request.headers, validators):
+        return not_modified(validators)
+    if format == "ndjson":
+        # NDJSON のときは limit, cursor を使わずに全件を流す
+        streaming_response = StreamingResponse(
+            ndjson_lines(MonthlyAttendanceRepo.iter_monthly(school_id, year, month, summary=summary)),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+        if validators is not None:
+            set_validators(streaming_response, validators)
+        return streaming_response
+    if summary:
+        list_page = AsyncMonthlyAttendanceRepo.list_monthly_summary_page
+    else:
+        list_page = AsyncMonthlyAttendanceRepo.list_monthly_page  # type: ignore
+    monthly_attendance_list, last_evaluated_key = await list_page(
+        school_id, year, month, limit, parse_cursor(school_id, cursor)
+    )
+    set_next_cursor(response, school_id, last_evaluated_key)
+    if validators is not None:
+        set_validators(response, validators)
+    return json_response(request, monthly_attendance_list, salary_list_type(summary), response)
 
 
-@router.get("/salary/bulk/{school_id}/between", response_model=list[MonthlyAttendance])
+@router.get(
+    "/salary/bulk/{school_id}/between",
+    response_model=list[MonthlyAttendance] | list[MonthlyAttendanceSummary],
+)
 async def get_monthly_salary_list_between(
-    school_id: str, start_year: int, start_month: int, end_year: int, end_month: int
+    school_id: str,
+    request: Request,
+    response: Response,
+    start_year: int,
+    start_month: int,
+    end_year: int,
+    end_month: int,
+    limit: int | None = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    format: Literal["json", "ndjson"] = "json",
+    view: Literal["full", "summary"] = "full",
 ):
-    monthly_attendance_list = MonthlyAttendanceRepo.list_between(
-        school_id, start_year, start_month, end_year, end_month
+    summary = view == "summary"
+    validators = await list_validators(
+        request, school_id, start_year, start_month, end_year, end_month,
+        summary=summary, paged=format == "json" and (limit is not None or cursor is not None),
+    )
+    if validators is not None and is_not_modified(request.headers, validators):
+        return not_modified(validators)
+    if format == "ndjson":
+        streaming_response = StreamingResponse(
+            ndjson_lines(
+                MonthlyAttendanceRepo.iter_between(
+                    school_id, start_year, start_month, end_year, end_month, summary=summary
+                )
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+        if validators is not None:
+            set_validators(streaming_response, validators)
+        return streaming_response
+    if summary:
+        list_page = AsyncMonthlyAttendanceRepo.list_between_summary_page
+    else:
+        list_page = AsyncMonthlyAttendanceRepo.list_between_page  # type: ignore
+    monthly_attendance_list, last_evaluated_key = await list_page(
+        school_id, start_year, start_month, end_year, end_month, limit, parse_cursor(school_id, cursor)
+    )
+    set_next_cursor(response, school_id, last_evaluated_key)
+    if validators is not None:
+        set_validators(response, validators)
+    return json_response(request, monthly_attendance_list, salary_list_type(summary), response)
+
+
+def salary_list_type(summary: bool) -> Any:
+    return list[MonthlyAttendanceSummary] if summary else list[MonthlyAttendance]
+
+
+async def list_validators(
+    request: Request,
+    school_id: str,
+    start_year: int,
+    start_month: int,
+    end_year: int,
+    end_month: int,
+    summary: bool,
+    paged: bool,
+) -> Validators | None:
+    # 期間内の全ての出勤簿のキーと timestamp から作る。view などはクエリで区別する
+    # ページごとのリクエスト (limit, cursor) には付けない。全期間を読むと、ページを分ける意味がなくなる
+    if paged:
+        return None
+    # 本文と同じインデックスから読む。インデックスごとに反映が遅れるので、別のものを見ると本文とずれることがある
+    versions = await AsyncMonthlyAttendanceRepo.list_versions(
+        school_id, start_year, start_month, end_year, end_month, summary=summary
+    )
+    return make_validators(versions, variant=request.url.query)
+
+
+@router.get("/salary/bulk/{school_id}/export")
+async def export_monthly_salary_list(
+    school_id: str,
+    start_year: int,
+    start_month: int,
+    end_year: int,
+    end_month: int,
+    format: ExportFormat = "csv",
+    rows: ExportRows = "monthly",
+):
+    # 会計・集計用に、1行 = 講師1人の1か月分 (rows=monthly) または 1コマ (rows=timeslot) の表で返す
+    # monthly は合計だけを射影したインデックスを読む
+    timeslot = rows == "timeslot"
+    pages = MonthlyAttendanceRepo.iter_between_items(
+        school_id, start_year, start_month, end_year, end_month,
+        summary=not timeslot,
+        attributes_to_get=TIMESLOT_ATTRIBUTES if timeslot else None,
+    )
+    filename = f"attendance-{start_year}{start_month:02}-{end_year}{end_month:02}-{rows}.{format}"
+    return StreamingResponse(
+        export_chunks(pages, rows, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    return monthly_attendance_list
+
+
+@router.get("/salary/bulk/{school_id}/payslips")
+async def get_payslips(school_id: str, year: int, month: int):
+    # 講師ごとの給与明細 (xlsx) を ZIP にまとめて返す
+    # 塾の情報と出勤簿は互いに関係ないので、同時に読む
+    meta, monthly_attendance_list = await asyncio.gather(
+        AsyncMetaRepo.get(school_id),
+        AsyncMonthlyAttendanceRepo.list_monthly(school_id, year, month),
+    )
+    return StreamingResponse(
+        zip_stream(render_payslips(meta.school_name, monthly_attendance_list)),
+        media_type=ZIP_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="payslips-{year}-{month:02}.zip"'},
+    )
+
 
 @router.delete("/salary/bulk/{school_id}", response_model=list[MonthlyAttendance])
-async def delete_monthly_salary_list(school_id: str, year: int, month: int):
-    monthly_attendance_list = MonthlyAttendanceRepo.delete_list(school_id, year, month)
-    return monthly_attendance_list
+async def delete_monthly_salary_list(school_id: str, year: int, month: int, request: Request):
+    with write_conflict_as_409():
+        monthly_attendance_list = await AsyncMonthlyAttendanceRepo.delete_list(school_id, year, month)
+    return json_response(request, monthly_attendance_list, list[MonthlyAttendance])
 
 
 @router.post("/salary/bulk/{school_id}", response_model=list[MonthlyAttendance])
 async def create_timeslots_from_class_sheet(
-    school_id: str, timetable_data: CreateAttendanceReq, year: int, month: int
+    school_id: str, timetable_data: CreateAttendanceReq, year: int, month: int, request: Request
 ):
-    teacher_list = TeacherRepo.list(school_id)
-    id2display_name = {teacher.id: teacher.display_name for teacher in teacher_list}
-    display_name2teacher = {teacher.display_name: teacher for teacher in teacher_list}
+    teacher_list = await AsyncTeacherRepo.list(school_id)
+    try:
+        # 時間割の解析は CPU を使うので、xlsx のルートと同じくイベントループの外で行う
+        display_name2timeslot_list = await run_sync(
+            make_timeslots_from_table,
+            teacher_list,
+            timetable_data.content,
+            year,
+            month,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    monthly_attendance_list = await create_monthly_attendance_list(
+        teacher_list, display_name2timeslot_list, timetable_data.meetings, year, month
+    )
+    return json_response(request, monthly_attendance_list, list[MonthlyAttendance])
 
-    display_name2timeslot_list = make_timeslots_from_table(
-        teacher_list,
-        timetable_data.content,
-        year,
-        month,
+
+@router.post("/salary/bulk/{school_id}/xlsx", response_model=list[MonthlyAttendance])
+async def create_timeslots_from_class_workbook(
+    school_id: str,
+    year: int,
+    month: int,
+    request: Request,
+    file: UploadFile = File(...),
+    password: str | None = Form(None),
+    meetings: str = Form("[]"),
+    sheet_name: str | None = Form(None),
+):
+    # 時間割の xlsx をそのまま受け取り、read_only で1ブロック行ずつ読みながらコマを作る
+    # meetings は CreateAttendanceReq.meetings と同じ形の JSON 文字列
+    try:
+        meeting_list = meeting_list_adapter.validate_json(meetings)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    try:
+        # 講師の一覧と、ブックを開く (暗号化されていれば復号する) のは互いに関係ないので、同時に行う
+        teacher_list, wb = await asyncio.gather(
+            AsyncTeacherRepo.list(school_id), run_sync(open_workbook, file.file, password)
+        )
+        try:
+            display_name2timeslot_list = await run_sync(
+                make_timeslots_from_table,
+                teacher_list,
+                iter_workbook_blocks(wb, month, sheet_name=sheet_name),
+                year,
+                month,
+            )
+        finally:
+            wb.close()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        await file.close()
+    monthly_attendance_list = await create_monthly_attendance_list(
+        teacher_list, display_name2timeslot_list, meeting_list, year, month
     )
+    return json_response(request, monthly_attendance_list, list[MonthlyAttendance])
+
+
+async def create_monthly_attendance_list(
+    teacher_list: list[Teacher],
+    display_name2timeslot_list: dict[str, list[Timeslot]],
+    meetings: list[Meeting],
+    year: int,
+    month: int,
+) -> list[MonthlyAttendance]:
+    id2display_name = {teacher.id: teacher.display_name for teacher in teacher_list}
+    display_name2teacher = {teacher.display_name: teacher for teacher in teacher_list}
 
-    for meeting in timetable_data.meetings:
+    for meeting in meetings:
         for teacher_id, timeslot in meeting.make_timeslots():
             display_name = id2display_name[teacher_id]
             display_name2timeslot_list[display_name].append(timeslot)
 
-    monthly_attendance_list = []
-    for display_name, timeslot_list in display_name2timeslot_list.items():
-        teacher = display_name2teacher[display_name]
-        monthly_attendance = MonthlyAttendanceRepo.create(
-            MonthlyAttendance(
+    # POST の2つのルートから呼ばれる。読んでから書くまでに同じ月の出勤簿が作られていたら 409 にする
+    with write_conflict_as_409():
+        monthly_attendance_list = await AsyncMonthlyAttendanceRepo.create_list([
+            MonthlyAttendanceBeforeCalculate(
                 year=year,
                 month=month,
-                teacher=teacher,
+                teacher=display_name2teacher[display_name],
                 timeslot_list=timeslot_list
             )
-        )
-        monthly_attendance_list.append(monthly_attendance)
+            for display_name, timeslot_list in display_name2timeslot_list.items()
+        ])
 
     return monthly_attendance_list
 
 
+# セルに入りうる型。bool や datetime.datetime を弾くため isinstance ではなく type で判定する
+DATE_CELL_TYPES = frozenset([datetime.date, int, NoneType])
+TIMESLOT_NUM_CELL_TYPES = frozenset([str, int, NoneType])
+STR_CELL_TYPES = frozenset([str, NoneType])
+
+# 「事務」だけで分数が書かれていないときは、コマの終わりまで事務とする
+OFFICEWORK_UNTIL_END = -1
+OFFICEWORK_PATTERN = re.compile(r"事務(\d+)")
+
+
 def make_timeslots_from_table(
     teacher_list: list[Teacher],
-    content: list[list[list[Any]]],
+    content: Iterable[list[list[Any]]] | Iterable[list[tuple[Any, ...]]],
     year: int,
     month: int,
 ) -> dict[str, list[Timeslot]]:
 
-    display_name_list = [teacher.display_name for teacher in teacher_list]
     display_name2timeslot_list: dict[str, list[Timeslot]] = {
-        display_name: [] for display_name in display_name_list
+        teacher.display_name: [] for teacher in teacher_list
     }
 
     date = None
-    for block_row in content:
-        date_cell: datetime.date | int | None = block_row[CellBlock.INFO_DATE_IDX][
-            CellBlock.INFO_COL
-        ]
+    for block_idx, block_row in enumerate(content, start=1):
+        info_date_row = block_row[CellBlock.INFO_DATE_IDX]
+        name_row = block_row[CellBlock.BLOCK_NAME_IDX]
+        cell1_row = block_row[CellBlock.BLOCK_CELL1_IDX]
+        cell2_row = block_row[CellBlock.BLOCK_CELL2_IDX]
+
+        date_cell: datetime.date | int | None = info_date_row[CellBlock.INFO_COL]
         timeslot_num_cell: str | int | None = block_row[CellBlock.INFO_TIMESLOTNUM_IDX][
             CellBlock.INFO_COL
         ]
         time_cell: str | None = block_row[CellBlock.INFO_TIME_IDX][CellBlock.INFO_COL]
 
-        if type(date_cell) not in [datetime.date, int, NoneType]:
+        if type(date_cell) not in DATE_CELL_TYPES:
             continue
 
-        if type(timeslot_num_cell) not in [str, int, NoneType]:
-            raise Exception(f"timeslot_num_cell type is {type(timeslot_num_cell)}")
+        if type(timeslot_num_cell) not in TIMESLOT_NUM_CELL_TYPES:
+            raise ValueError(f"block {block_idx}: timeslot_num_cell type is {type(timeslot_num_cell)}")
 
-        if type(time_cell) not in [str, NoneType]:
-            raise Exception(f"time_cell type is {type(time_cell)}")
+        if type(time_cell) not in STR_CELL_TYPES:
+            raise ValueError(f"block {block_idx}: time_cell type is {type(time_cell)}")
 
-        if (timeslot_num_cell == None) | (time_cell == None):
+        if (timeslot_num_cell is None) or (time_cell is None):
             continue
 
         # 日付を更新
-        if date_cell != None:
+        if date_cell is not None:
             date = normalize_date(date_cell)  # type: ignore
 
-        match date:
-            # 更新後の日付がNoneの場合はスキップ
-            case None:
-                continue
-            case datetime.date:
-                if (date.year != year) | (date.month != month):
-                    continue
-
-        timeslot_num = get_timeslot_num(time_cell)  # type: ignore
-        start_time, end_time = normalize_time(date, time_cell)  # type: ignore
-
-        # timeslot_baseを作成
-        timeslot_lecture = Timeslot(
-            day=date.day,  # type: ignore
-            timeslot_number=timeslot_num,
-            timeslot_type="lecture",
-            start_time=start_time,
-            end_time=end_time,
-        )
+        # 更新後の日付がNoneの場合、対象の月でない場合はスキップ
+        if date is None:
+            continue
+        if (date.year != year) or (date.month != month):
+            continue
+
+        try:
+            timeslot_num, start_clock, end_clock = parse_time_cell(time_cell)  # type: ignore
+        except ValueError as e:
+            raise ValueError(f"block {block_idx} ({date}): {e}") from e
+        start_time = datetime.datetime.combine(date, start_clock)
+        end_time = datetime.datetime.combine(date, end_clock)
 
-        for j in range(CellBlock.INFO_COL + 1, len(block_row[0])):
-            display_name: str | None = block_row[CellBlock.BLOCK_NAME_IDX][j]
+        # Timeslot はブロックごとに必要になったときだけ作り、同じコマの講師で使い回す
+        timeslot_lecture: Timeslot | None = None
+        minutes2timeslot_office: dict[int, Timeslot] = {}
 
-            cell1: str | None = block_row[CellBlock.BLOCK_CELL1_IDX][j]
+        for j in range(CellBlock.INFO_COL + 1, len(info_date_row)):
+            display_name: str | None = name_row[j]
 
-            cell2: str | None = block_row[CellBlock.BLOCK_CELL2_IDX][j]
+            cell1: str | None = cell1_row[j]
 
-            if type(display_name) not in [str, NoneType]:
-                raise Exception(f"display_name type is {type(display_name)}")
+            cell2: str | None = cell2_row[j]
 
-            if type(cell1) not in [str, NoneType]:
-                raise Exception(f"cell1 type is {type(cell1)}")
+            if type(display_name) not in STR_CELL_TYPES:
+                raise ValueError(f"block {block_idx}: display_name type is {type(display_name)}")
 
-            if type(cell2) not in [str, NoneType]:
-                raise Exception(f"cell2 type is {type(cell2)}")
+            if type(cell1) not in STR_CELL_TYPES:
+                raise ValueError(f"block {block_idx}: cell1 type is {type(cell1)}")
+
+            if type(cell2) not in STR_CELL_TYPES:
+                raise ValueError(f"block {block_idx}: cell2 type is {type(cell2)}")
 
             # 講師名がNoneであれば無視
-            if display_name == None:
+            if display_name is None:
                 continue
 
             # cellが二つともNoneであれば無視
-            if (cell1 == None) and (cell2 == None):
+            if (cell1 is None) and (cell2 is None):
                 continue
 
             # 講師名がteacher_dictになければ無視
-            if display_name not in display_name_list:
+            timeslot_list = display_name2timeslot_list.get(display_name)
+            if timeslot_list is None:
                 continue
 
-            officework_end_time = get_officework_end_time(
-                start_time, end_time, cell1, cell2
-            )
-            if officework_end_time != None:
-                timeslot_office = Timeslot(
-                    day=date.day,  # type: ignore
-                    timeslot_number=0,
-                    timeslot_type="office_work",
-                    start_time=start_time,
-                    end_time=officework_end_time,  # type: ignore
-                )
-                display_name2timeslot_list[display_name].append(timeslot_office)
+            officework_minutes = get_officework_minutes(cell1, cell2)
+            if officework_minutes is not None:
+                timeslot_office = minutes2timeslot_office.get(officework_minutes)
+                if timeslot_office is None:
+                    if officework_minutes == OFFICEWORK_UNTIL_END:
+                        officework_end_time = end_time
+                    else:
+                        officework_end_time = start_time + datetime.timedelta(minutes=officework_minutes)
+                    timeslot_office = Timeslot(
+                        day=date.day,
+                        timeslot_number=0,
+                        timeslot_type="office_work",
+                        start_time=start_time,
+                        end_time=officework_end_time,
+                    )
+                    minutes2timeslot_office[officework_minutes] = timeslot_office
+                timeslot_list.append(timeslot_office)
             else:
-                display_name2timeslot_list[display_name].append(timeslot_lecture)
+                if timeslot_lecture is None:
+                    timeslot_lecture = Timeslot(
+                        day=date.day,
+                        timeslot_number=timeslot_num,
+                        timeslot_type="lecture",
+                        start_time=start_time,
+                        end_time=end_time,
+                    )
+                timeslot_list.append(timeslot_lecture)
     return display_name2timeslot_list
 
 
@@ -214,24 +497,21 @@ def normalize_timeslot_num(timeslot_num_cell: str | int) -> int:
     elif type(timeslot_num_cell) == int:
         return timeslot_num_cell
     else:
-        raise Exception(f"timeslot_num_cell type is {type(timeslot_num_cell)}")
-
-
-def get_timeslot_num(time_cell: str) -> int:
-    time_cell = normalize("NFKC", time_cell)
-    return LECTURE_TIMES_TO_NUMBER[time_cell]
+        raise ValueError(f"timeslot_num_cell type is {type(timeslot_num_cell)}")
 
 
-def normalize_time(
-    date: datetime.date, time_cell: str
-) -> tuple[datetime.datetime, datetime.datetime]:
+# 時間割で使う時刻の文字列は数種類しかないので、解析結果をキャッシュする
+@lru_cache(maxsize=256)
+def parse_time_cell(time_cell: str) -> tuple[int, datetime.time, datetime.time]:
     time_cell = normalize("NFKC", time_cell)
+    # 時間割にない時刻は 500 ではなく 422 で返せるように ValueError にする
+    timeslot_num = LECTURE_TIMES_TO_NUMBER.get(time_cell)
+    if timeslot_num is None:
+        raise ValueError(f"time cell must be one of {list(LECTURE_TIMES_TO_NUMBER)}, but {time_cell!r}")
     start_time_str, end_time_str = time_cell.split("-")
-    start_time_time = datetime.datetime.strptime(start_time_str, "%H:%M").time()
-    end_time_time = datetime.datetime.strptime(end_time_str, "%H:%M").time()
-    start_time = datetime.datetime.combine(date, start_time_time)
-    end_time = datetime.datetime.combine(date, end_time_time)
-    return start_time, end_time
+    start_time = datetime.datetime.strptime(start_time_str, "%H:%M").time()
+    end_time = datetime.datetime.strptime(end_time_str, "%H:%M").time()
+    return timeslot_num, start_time, end_time
 
 
 def normalize_date(date_cell: datetime.date | int) -> datetime.date:
@@ -243,32 +523,24 @@ def normalize_date(date_cell: datetime.date | int) -> datetime.date:
         raise Exception(f"date_cell type is {type(date_cell)}")
 
 
-# cell1, cell2のどちらかが"事務"を含む場合、その時間を分単位で返す
-def get_officework_end_time(
-    start_time: datetime.datetime,
-    end_time: datetime.datetime,
-    cell1: str | None,
-    cell2: str | None,
-) -> datetime.datetime | None:
-    def is_officework_cell(cell: str | None) -> datetime.datetime | None:
-        if cell == None:
-            return None
-        cell = normalize("NFKC", cell)  # type: ignore
-        # cellが"事務"を含む場合
-        if "事務" in cell:
-            result = re.findall(r"事務(\d+)", cell)
-            if len(result) == 0:
-                return end_time
-            else:
-                td = int(result[0])
-                return start_time + datetime.timedelta(minutes=td)
-        else:
-            return None
-
-    cell1_officework_time = is_officework_cell(cell1)
-    cell2_officework_time = is_officework_cell(cell2)
-
-    if cell1_officework_time != None:
-        return cell1_officework_time
-    else:
-        return cell2_officework_time
+# cell1, cell2のどちらかが"事務"を含む場合、コマの開始からの事務の分数を返す
+# 分数が書かれていなければ OFFICEWORK_UNTIL_END を返す
+def get_officework_minutes(cell1: str | None, cell2: str | None) -> int | None:
+    cell1_officework_minutes = parse_officework_cell(cell1)
+    if cell1_officework_minutes is not None:
+        return cell1_officework_minutes
+    return parse_officework_cell(cell2)
+
+
+@lru_cache(maxsize=4096)
+def parse_officework_cell(cell: str | None) -> int | None:
+    if cell is None:
+        return None
+    cell = normalize("NFKC", cell)
+    # cellが"事務"を含む場合
+    if "事務" not in cell:
+        return None
+    result = OFFICEWORK_PATTERN.findall(cell)
+    if len(result) == 0:
+        return OFFICEWORK_UNTIL_END
+    return int(result[0])
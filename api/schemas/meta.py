@@ -35,7 +35,8 @@ class Meta(MetaBase):
     
     @classmethod
     def from_model(cls, meta_model: MetaModel) -> Self:
-        return cls(
+        # DynamoDB に自分で書き込んだ値なので検証しない
+        return cls.model_construct(
             school_id=meta_model.school_id,
             school_name=meta_model.school_name,
         )
@@ -1,10 +1,9 @@
 import datetime
-from typing import Literal, Self
+from typing import Iterable, Literal
 from hashlib import shake_128
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel
 
 from api.db import MonthlyAttendanceModel, TeacherModel
-from api.myutils.utilfunc import YearMonth
 from api.myutils.const import DIGEST_SIZE
 
 
@@ -70,7 +69,8 @@ class Teacher(TeacherBase):
         if teacher_model.fixed_salary == None:
             teacher_model.fixed_salary = 0.0
 
-        return Teacher(
+        # DynamoDB に自分で書き込んだ値なので検証しない
+        return cls.model_construct(
             id=teacher_model.id,
             display_name=teacher_model.display_name,
             given_name=teacher_model.given_name,
@@ -89,7 +89,7 @@ class Teacher(TeacherBase):
         if monthly_timeslot_list.fixed_salary == None:
             monthly_timeslot_list.fixed_salary = 0.0
 
-        return Teacher(
+        return cls.model_construct(
             id=monthly_timeslot_list.id,
             display_name=monthly_timeslot_list.display_name,
             given_name=monthly_timeslot_list.given_name,
@@ -102,3 +102,25 @@ class Teacher(TeacherBase):
             teacher_type=monthly_timeslot_list.teacher_type,  # type: ignore
             sub=monthly_timeslot_list.sub,
         )
+
+    @classmethod
+    def from_models(cls, teacher_models: Iterable[TeacherModel]) -> list["Teacher"]:
+        # クエリの1ページ分をまとめて変換する
+        from_model = cls.from_model
+        return [from_model(teacher_model) for teacher_model in teacher_models]
+
+
+class TeacherImportAccepted(BaseModel):
+    line: int
+    teacher: Teacher
+
+
+class TeacherImportRejected(BaseModel):
+    line: int
+    display_name: str | None = None
+    errors: list[str]
+
+
+class TeacherImportReport(BaseModel):
+    accepted: list[TeacherImportAccepted] = []
+    rejected: list[TeacherImportRejected] = []
@@ -0,0 +1,23 @@
+from typing import Self
+from pydantic import BaseModel
+
+from api.schemas.rollup import PayrollTotals
+
+
+class SchoolPayrollTotals(PayrollTotals):
+    school_id: str
+    school_name: str
+
+    @classmethod
+    def create(cls, school_id: str, school_name: str, totals: PayrollTotals) -> Self:
+        return cls(
+            school_id=school_id, school_name=school_name, **totals.model_dump(include=set(PayrollTotals.model_fields))
+        )
+
+
+class PayrollReport(BaseModel):
+    # 全ての塾の月の合計
+    year: int
+    month: int
+    schools: list[SchoolPayrollTotals]
+    total: PayrollTotals
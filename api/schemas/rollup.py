@@ -0,0 +1,60 @@
+from typing import Self
+from pydantic import BaseModel
+
+from api.db import MonthlyAttendanceModel, RollupModel
+
+
+class PayrollTotals(BaseModel):
+    # 出勤簿の合計。lecture_amount, officework_amount は分、headcount は出勤簿の件数
+    gross_salary: int = 0
+    extra_payment: int = 0
+    tax_amount: int = 0
+    trans_fee: int = 0
+    lecture_amount: int = 0
+    officework_amount: int = 0
+    headcount: int = 0
+
+    @classmethod
+    def from_attendance_model(cls, monthly_attendance_model: MonthlyAttendanceModel | None) -> Self:
+        if monthly_attendance_model is None:
+            return cls()
+        attendance_data = monthly_attendance_model.attendance_data()
+        return cls(
+            gross_salary=int(monthly_attendance_model.monthly_gross_salary),
+            extra_payment=int(monthly_attendance_model.extra_payment),
+            tax_amount=int(monthly_attendance_model.monthly_tax_amount),
+            trans_fee=int(monthly_attendance_model.monthly_trans_fee),
+            lecture_amount=sum(attendance_data.daily_lecture_amount),
+            officework_amount=sum(attendance_data.daily_officework_amount),
+            headcount=1,
+        )
+
+    def __add__(self, other: "PayrollTotals") -> Self:
+        return type(self)(**{
+            name: getattr(self, name) + getattr(other, name) for name in PayrollTotals.model_fields
+        })
+
+    def __neg__(self) -> Self:
+        return type(self)(**{name: -getattr(self, name) for name in PayrollTotals.model_fields})
+
+    def is_zero(self) -> bool:
+        return all(getattr(self, name) == 0 for name in PayrollTotals.model_fields)
+
+
+class PayrollRollup(PayrollTotals):
+    # 講師ごとの年間の合計 (teacher_id あり, month なし) または塾ごとの月の合計 (month あり)
+    school_id: str
+    year: int
+    month: int | None = None
+    teacher_id: str | None = None
+
+    @classmethod
+    def from_model(cls, rollup_model: RollupModel) -> Self:
+        is_teacher = rollup_model.record_type.startswith("rollup#teacher#")
+        return cls(
+            school_id=rollup_model.school_id,
+            year=int(rollup_model.year),
+            month=None if rollup_model.month is None else int(rollup_model.month),
+            teacher_id=rollup_model.id if is_teacher else None,
+            **{name: int(getattr(rollup_model, name)) for name in PayrollTotals.model_fields},
+        )
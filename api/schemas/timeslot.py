@@ -1,14 +1,16 @@
-from typing import Any, List, Literal, Self
-import numpy as np
-import pandas as pd
-from pydantic import BaseModel, field_validator, model_validator
+from typing import TYPE_CHECKING, Any, Iterable, Literal, Self
+from pydantic import BaseModel, TypeAdapter, field_validator, model_validator
+import calendar
 import datetime
-from zoneinfo import ZoneInfo
+from functools import lru_cache
 from api.db import MonthlyAttendanceModel, TimeslotMap
-from api.schemas.meta import Meta
 from api.schemas.person import Teacher
-from api.myutils.utilfunc import time_str_2_datetime
+from api.myutils.attendance_codec import AttendanceData, PackedTimeslot
 from api.myutils.const import PREPARE_TIME, NUMBER_TO_LECTURE_TIMES
+from api.myutils.telemetry import timed
+
+if TYPE_CHECKING:
+    from api.myutils.gensen import GensenTable
 
 
 class TimeslotJS(BaseModel):
@@ -35,6 +37,12 @@ class TimeslotJS(BaseModel):
         )
 
 
+@lru_cache(maxsize=8192)
+def slot_datetime(year: int, month: int, day: int, minute: int) -> datetime.datetime:
+    # コマの時刻は日と分の組み合わせが限られていて、datetime は変更できないので使い回す
+    return datetime.datetime(year, month, day) + datetime.timedelta(minutes=minute)
+
+
 class Timeslot(BaseModel):
     day:int
     start_time: datetime.datetime
@@ -60,6 +68,46 @@ class Timeslot(BaseModel):
     def end_time_str(self) -> str:
         return self.end_time.strftime("%H:%M")
 
+    def to_packed(self) -> PackedTimeslot:
+        return PackedTimeslot(
+            day=self.day,
+            start_minute=self.start_time.hour * 60 + self.start_time.minute,
+            end_minute=self.end_time.hour * 60 + self.end_time.minute,
+            timeslot_number=self.timeslot_number,
+            timeslot_type=self.timeslot_type,
+        )
+
+    @classmethod
+    def from_packed(cls, year: int, month: int, timeslot: PackedTimeslot) -> "Timeslot":
+        return cls.from_packed_list(year, month, [timeslot])[0]
+
+    @classmethod
+    def from_packed_list(cls, year: int, month: int, timeslot_list: list[PackedTimeslot]) -> list["Timeslot"]:
+        # 1ページで数万コマになるので、1件ずつ作らずに一覧をまとめて pydantic-core で検証する
+        # (1件ずつ model_construct で作るより速い)
+        return _TIMESLOT_LIST_ADAPTER.validate_python([
+            {
+                "day": timeslot.day,
+                "start_time": slot_datetime(year, month, timeslot.day, timeslot.start_minute),
+                "end_time": slot_datetime(year, month, timeslot.day, timeslot.end_minute),
+                "timeslot_number": timeslot.timeslot_number,
+                "timeslot_type": timeslot.timeslot_type,
+            }
+            for timeslot in timeslot_list
+        ])
+
+    def to_map(self) -> TimeslotMap:
+        return TimeslotMap(
+            day=self.day,
+            start_time=self.start_time_str,
+            end_time=self.end_time_str,
+            timeslot_number=self.timeslot_number,
+            timeslot_type=self.timeslot_type,
+        )
+
+
+_TIMESLOT_LIST_ADAPTER = TypeAdapter(list[Timeslot])
+
 
 class UpdateAttendanceReq(BaseModel):
     timeslot_js_list: list[TimeslotJS]
@@ -68,6 +116,47 @@ class UpdateAttendanceReq(BaseModel):
     teacher: Teacher
 
 
+class PatchTimeslot(TimeslotJS):
+    # PATCH で送るコマ。事務などの時間は時間割の枠と関係なく決まるので、開始・終了の時刻 ("HH:MM") で送る
+    # 授業の時刻は timeslot_number から決まるので付けない
+    start_time: str | None = None
+    end_time: str | None = None
+
+    def to_timeslot(self) -> "Timeslot":
+        if self.start_time is None or self.end_time is None:
+            return super().to_timeslot()
+        date = datetime.date(self.year, self.month, self.day)
+        return Timeslot(
+            day=self.day,
+            start_time=datetime.datetime.combine(date, parse_clock(self.start_time)),
+            end_time=datetime.datetime.combine(date, parse_clock(self.end_time)),
+            timeslot_number=self.timeslot_number,
+            timeslot_type=self.timeslot_type,
+        )
+
+    def matches(self, timeslot: "Timeslot") -> bool:
+        # 削除するコマか。時刻を付けたときは時刻も比べ、同じ日の事務を区別する
+        return (
+            timeslot.day == self.day
+            and timeslot.timeslot_number == self.timeslot_number
+            and timeslot.timeslot_type == self.timeslot_type
+            and (self.start_time is None or timeslot.start_time.time() == parse_clock(self.start_time))
+            and (self.end_time is None or timeslot.end_time.time() == parse_clock(self.end_time))
+        )
+
+
+def parse_clock(clock: str) -> datetime.time:
+    return datetime.datetime.strptime(clock, "%H:%M").time()
+
+
+class PatchAttendanceReq(BaseModel):
+    # 1コマ単位の差分。コマの変更は remove と add の組で送る
+    add: list[PatchTimeslot] = []
+    remove: list[PatchTimeslot] = []
+    extra_payment: int | None = None
+    remark: str | None = None
+
+
 class MonthlyAttendanceBeforeCalculate(BaseModel):
     year: int
     month: int
@@ -113,7 +202,14 @@ class MonthlyAttendanceBeforeCalculate(BaseModel):
             remark=monthly_attendance.remark
         )
     
-    def calc_salary(self, gensen: pd.DataFrame) -> "MonthlyAttendance":
+    @timed("calc")
+    def calc_salary(self, gensen: "GensenTable | None" = None) -> "MonthlyAttendance":
+        # numpy と税額表は給与計算のときだけ読み込む (コールドスタート対策)
+        import numpy as np
+        from api.myutils.gensen import get_gensen_table
+
+        if gensen is None:
+            gensen = get_gensen_table(self.year)
         teacher = self.teacher
         timeslot_list = self.timeslot_list
         year = self.year
@@ -144,84 +240,26 @@ class MonthlyAttendanceBeforeCalculate(BaseModel):
             if len(daily_lectures)+len(daily_officeworks) == 0:
                 continue
 
-            lecture_amount_min = sum(
-                [
-                    int((timeslot.end_time - timeslot.start_time).seconds / 60)
-                    for timeslot in daily_lectures
-                ]
-            )
-            officework_amount_min = sum(
-                [
-                    int((timeslot.end_time - timeslot.start_time).seconds / 60)
-                    for timeslot in daily_officeworks
-                ]
-            )
+            (
+                lecture_amount_min,
+                officework_amount_min,
+                latenight_amount_min,
+                over_eight_hour_amount_min,
+            ) = calc_daily_amount(year, month, day + 1, daily_lectures, daily_officeworks)
 
-            # 準備時間
-            if len(daily_lectures) == 0:
-                prepare_amount_min_before_end = 0
-                prepare_amount_min_after_end = 0
-            else:
-                prepare_amount_min_after_end = (
-                    len(daily_lectures) + 1
-                ) * PREPARE_TIME
-                prepare_amount_min_before_end = (
-                    len(daily_lectures) - 1
-                ) * PREPARE_TIME
-            officework_amount_min += prepare_amount_min_after_end + prepare_amount_min_before_end
-
-            daily_salary_day = (
-                teacher.lecture_hourly_pay * lecture_amount_min / 60
-                + teacher.office_hourly_pay * officework_amount_min / 60
+            daily_salary[day] = calc_daily_salary(
+                teacher, lecture_amount_min, officework_amount_min, latenight_amount_min, over_eight_hour_amount_min
             )
 
-            # 深夜勤務手当
-            end_time = max(
-                [timeslot.end_time for timeslot in daily_lectures]
-                + [timeslot.end_time for timeslot in daily_officeworks]
-            ) + datetime.timedelta(minutes=prepare_amount_min_after_end)
-            if end_time.hour < 12:
-                latenight_boundary = datetime.datetime.combine(
-                    datetime.date(year, month, day + 1), datetime.time(10)
-                )
-            else:
-                latenight_boundary = datetime.datetime.combine(
-                    datetime.date(year, month, day + 1), datetime.time(22)
-                )
-            if (end_time > latenight_boundary):
-                latenight_amount_min = int((end_time - latenight_boundary).seconds / 60)
-            else:
-                latenight_amount_min = 0
-            daily_salary_day += (
-                0.25 * teacher.office_hourly_pay * latenight_amount_min / 60
-            )
-
-            # 8時間超勤務手当
-            over_eight_hour_amount_min = max(0, lecture_amount_min + officework_amount_min - 8 * 60)
-            daily_salary_day += (
-                0.25 * teacher.office_hourly_pay * over_eight_hour_amount_min / 60
-            )
-
-
-            daily_salary[day] = daily_salary_day
-
             daily_lecture_amount[day] = lecture_amount_min
             daily_officework_amount[day] = officework_amount_min
             daily_latenight_amount[day] = latenight_amount_min
             daily_over_eight_hour_amount[day] = over_eight_hour_amount_min
             daily_attendance[day] = (len(daily_lectures)+len(daily_officeworks) > 0)
 
-        monthly_gross_amount: float = np.sum(daily_salary) + teacher.fixed_salary # type: ignore
-        monthly_trans_fee: float = np.sum(daily_attendance) * teacher.trans_fee # type: ignore
-                
-        monthly_gross_extra = monthly_gross_amount + self.extra_payment
-        idx = (gensen["min"] <= monthly_gross_extra) & (monthly_gross_extra < gensen["max"])
-        assert np.sum(idx) == 1
-        v: float = gensen[idx]["-1"].values[0]
-        if v < 1:
-            monthly_tax_amount = v * monthly_gross_extra
-        else:
-            monthly_tax_amount = v
+        monthly_gross_amount, monthly_tax_amount, monthly_trans_fee = calc_monthly_amount(
+            teacher, daily_salary, daily_attendance, self.extra_payment, gensen
+        )
 
         return MonthlyAttendance(
             year=self.year,
@@ -243,6 +281,97 @@ class MonthlyAttendanceBeforeCalculate(BaseModel):
         )
 
 
+def calc_daily_amount(
+    year: int, month: int, day: int, daily_lectures: list[Timeslot], daily_officeworks: list[Timeslot]
+) -> tuple[int, int, int, int]:
+    # 1日分の (講義, 事務, 深夜勤務, 8時間超勤務) の分数
+    if len(daily_lectures)+len(daily_officeworks) == 0:
+        return 0, 0, 0, 0
+
+    lecture_amount_min = sum(
+        [
+            int((timeslot.end_time - timeslot.start_time).seconds / 60)
+            for timeslot in daily_lectures
+        ]
+    )
+    officework_amount_min = sum(
+        [
+            int((timeslot.end_time - timeslot.start_time).seconds / 60)
+            for timeslot in daily_officeworks
+        ]
+    )
+
+    # 準備時間
+    if len(daily_lectures) == 0:
+        prepare_amount_min_before_end = 0
+        prepare_amount_min_after_end = 0
+    else:
+        prepare_amount_min_after_end = (
+            len(daily_lectures) + 1
+        ) * PREPARE_TIME
+        prepare_amount_min_before_end = (
+            len(daily_lectures) - 1
+        ) * PREPARE_TIME
+    officework_amount_min += prepare_amount_min_after_end + prepare_amount_min_before_end
+
+    # 深夜勤務手当
+    end_time = max(
+        [timeslot.end_time for timeslot in daily_lectures]
+        + [timeslot.end_time for timeslot in daily_officeworks]
+    ) + datetime.timedelta(minutes=prepare_amount_min_after_end)
+    if end_time.hour < 12:
+        latenight_boundary = datetime.datetime.combine(
+            datetime.date(year, month, day), datetime.time(10)
+        )
+    else:
+        latenight_boundary = datetime.datetime.combine(
+            datetime.date(year, month, day), datetime.time(22)
+        )
+    if (end_time > latenight_boundary):
+        latenight_amount_min = int((end_time - latenight_boundary).seconds / 60)
+    else:
+        latenight_amount_min = 0
+
+    # 8時間超勤務手当
+    over_eight_hour_amount_min = max(0, lecture_amount_min + officework_amount_min - 8 * 60)
+
+    return lecture_amount_min, officework_amount_min, latenight_amount_min, over_eight_hour_amount_min
+
+
+def calc_daily_salary(
+    teacher: Teacher,
+    lecture_amount_min: int,
+    officework_amount_min: int,
+    latenight_amount_min: int,
+    over_eight_hour_amount_min: int,
+) -> float:
+    daily_salary_day = (
+        teacher.lecture_hourly_pay * lecture_amount_min / 60
+        + teacher.office_hourly_pay * officework_amount_min / 60
+    )
+    daily_salary_day += (
+        0.25 * teacher.office_hourly_pay * latenight_amount_min / 60
+    )
+    daily_salary_day += (
+        0.25 * teacher.office_hourly_pay * over_eight_hour_amount_min / 60
+    )
+    return daily_salary_day
+
+
+def calc_monthly_amount(
+    teacher: Teacher, daily_salary: Any, daily_attendance: Any, extra_payment: int, gensen: "GensenTable"
+) -> tuple[float, float, float]:
+    # (総支給額, 源泉徴収税額, 交通費)。daily_salary, daily_attendance は長さ31の numpy 配列
+    import numpy as np
+
+    monthly_gross_amount: float = np.sum(daily_salary) + teacher.fixed_salary # type: ignore
+    monthly_trans_fee: float = np.sum(daily_attendance) * teacher.trans_fee # type: ignore
+            
+    monthly_gross_extra = monthly_gross_amount + extra_payment
+    monthly_tax_amount = gensen.lookup(monthly_gross_extra, dependents=-1)
+    return monthly_gross_amount, monthly_tax_amount, monthly_trans_fee
+
+
 class MonthlyAttendance(MonthlyAttendanceBeforeCalculate):
     daily_lecture_amount: list[int] = [0]*31
     daily_officework_amount: list[int] = [0]*31
@@ -258,27 +387,23 @@ class MonthlyAttendance(MonthlyAttendanceBeforeCalculate):
     def record_type(self) -> str:
         return f"attendance#{self.year}-{self.month:02}"
 
+    def attendance_data(self) -> AttendanceData:
+        return AttendanceData(
+            timeslot_list=[timeslot.to_packed() for timeslot in self.timeslot_list],
+            daily_lecture_amount=self.daily_lecture_amount,
+            daily_officework_amount=self.daily_officework_amount,
+            daily_latenight_amount=self.daily_latenight_amount,
+            daily_over_eight_hour_amount=self.daily_over_eight_hour_amount,
+            daily_attendance=self.daily_attendance,
+        )
+
     def to_model(self) -> MonthlyAttendanceModel:
-        timeslot_list = [TimeslotMap(
-            day=timeslot.day,
-            start_time=timeslot.start_time_str,
-            end_time=timeslot.end_time_str,
-            timeslot_number=timeslot.timeslot_number,
-            timeslot_type=timeslot.timeslot_type,
-        ) for timeslot in self.timeslot_list]
-        
         return MonthlyAttendanceModel(
             record_type=self.record_type,
             timestamp=datetime.datetime.now().isoformat(),
             year=self.year,
             month=self.month,
-            timeslot_list=timeslot_list,
-
-            daily_lecture_amount=self.daily_lecture_amount,
-            daily_office_amount=self.daily_officework_amount,
-            daily_latenight_amount=self.daily_latenight_amount,
-            daily_over_eight_hour_amount=self.daily_over_eight_hour_amount,
-            daily_attendance=self.daily_attendance,
+            packed=self.attendance_data(),
 
             monthly_gross_salary=self.monthly_gross_salary,
             monthly_tax_amount=self.monthly_tax_amount,
@@ -289,42 +414,197 @@ class MonthlyAttendance(MonthlyAttendanceBeforeCalculate):
             **self.teacher.model_dump(),
         )
     
+    def patch(self, req: PatchAttendanceReq, gensen: "GensenTable | None" = None) -> "MonthlyAttendance":
+        # 追加・削除されたコマのある日だけを計算し直し、月の合計は日別の値から出し直す
+        import numpy as np
+        from api.myutils.gensen import get_gensen_table
+
+        if gensen is None:
+            gensen = get_gensen_table(self.year)
+        n_days = calendar.monthrange(self.year, self.month)[1]
+
+        added: list[Timeslot] = []
+        for timeslot_js in req.add:
+            self._check_patch_target(timeslot_js, n_days, add=True)
+            added.append(timeslot_js.to_timeslot())
+
+        removed: list[int] = []
+        for timeslot_js in req.remove:
+            self._check_patch_target(timeslot_js, n_days, add=False)
+            for i, timeslot in enumerate(self.timeslot_list):
+                if i not in removed and timeslot_js.matches(timeslot):
+                    removed.append(i)
+                    break
+            else:
+                raise ValueError(
+                    f"timeslot not found: day={timeslot_js.day}, "
+                    f"timeslot_number={timeslot_js.timeslot_number}, timeslot_type={timeslot_js.timeslot_type}"
+                )
+
+        # コマの変更 (remove と add の組) で並び順が変わらないよう、削除した位置に追加分を入れ、
+        # 余った分だけ削除または末尾に追加する
+        n_replaced = min(len(removed), len(added))
+        timeslot_list = list(self.timeslot_list)
+        for i, timeslot in zip(removed[:n_replaced], added[:n_replaced]):
+            timeslot_list[i] = timeslot
+        removed_rest = set(removed[n_replaced:])
+        timeslot_list = [
+            timeslot for i, timeslot in enumerate(timeslot_list) if i not in removed_rest
+        ] + added[n_replaced:]
+
+        days = sorted(
+            {timeslot.day for timeslot in added} | {self.timeslot_list[i].day for i in removed}
+        )
+        daily_lecture_amount = list(self.daily_lecture_amount)
+        daily_officework_amount = list(self.daily_officework_amount)
+        daily_latenight_amount = list(self.daily_latenight_amount)
+        daily_over_eight_hour_amount = list(self.daily_over_eight_hour_amount)
+        daily_attendance = list(self.daily_attendance)
+        for day in days:
+            daily_lectures = [t for t in timeslot_list if t.day == day and t.timeslot_type == "lecture"]
+            daily_officeworks = [t for t in timeslot_list if t.day == day and t.timeslot_type == "office_work"]
+            (
+                daily_lecture_amount[day-1],
+                daily_officework_amount[day-1],
+                daily_latenight_amount[day-1],
+                daily_over_eight_hour_amount[day-1],
+            ) = calc_daily_amount(self.year, self.month, day, daily_lectures, daily_officeworks)
+            daily_attendance[day-1] = len(daily_lectures)+len(daily_officeworks) > 0
+
+        daily_salary = np.zeros(31)
+        for day in range(31):
+            if daily_attendance[day]:
+                daily_salary[day] = calc_daily_salary(
+                    self.teacher,
+                    daily_lecture_amount[day],
+                    daily_officework_amount[day],
+                    daily_latenight_amount[day],
+                    daily_over_eight_hour_amount[day],
+                )
+        extra_payment = self.extra_payment if req.extra_payment is None else req.extra_payment
+        monthly_gross_amount, monthly_tax_amount, monthly_trans_fee = calc_monthly_amount(
+            self.teacher, daily_salary, np.array(daily_attendance, dtype=float), extra_payment, gensen
+        )
+
+        return self.model_copy(update=dict(
+            timeslot_list=timeslot_list,
+            daily_lecture_amount=daily_lecture_amount,
+            daily_officework_amount=daily_officework_amount,
+            daily_latenight_amount=daily_latenight_amount,
+            daily_over_eight_hour_amount=daily_over_eight_hour_amount,
+            daily_attendance=daily_attendance,
+            monthly_gross_salary=int(monthly_gross_amount),
+            monthly_tax_amount=int(monthly_tax_amount),
+            monthly_trans_fee=int(monthly_trans_fee),
+            extra_payment=extra_payment,
+            remark=self.remark if req.remark is None else req.remark,
+        ))
+
+    def _check_patch_target(self, timeslot_js: PatchTimeslot, n_days: int, add: bool) -> None:
+        if timeslot_js.year != self.year or timeslot_js.month != self.month:
+            raise ValueError(
+                f"timeslot must be in {self.year}-{self.month:02}, but {timeslot_js.year}-{timeslot_js.month:02}"
+            )
+        if timeslot_js.day < 1 or timeslot_js.day > n_days:
+            raise ValueError(f"day must be in range 1-{n_days}, but {timeslot_js.day}")
+        if timeslot_js.timeslot_type == "lecture":
+            if timeslot_js.timeslot_number not in NUMBER_TO_LECTURE_TIMES:
+                raise ValueError(
+                    f"timeslot_number must be one of {sorted(NUMBER_TO_LECTURE_TIMES)}, "
+                    f"but {timeslot_js.timeslot_number}"
+                )
+            if timeslot_js.start_time is not None or timeslot_js.end_time is not None:
+                raise ValueError("lecture timeslot must not have start_time or end_time")
+            return
+        # 事務などは時刻がないと追加できない (削除は時刻を省くと、その日の同じ種類のコマのどれかを消す)
+        if add and (timeslot_js.start_time is None or timeslot_js.end_time is None):
+            raise ValueError(f"{timeslot_js.timeslot_type} timeslot needs start_time and end_time to be added")
+        for clock in [timeslot_js.start_time, timeslot_js.end_time]:
+            if clock is not None:
+                parse_clock(clock)
+        if add and parse_clock(timeslot_js.start_time) >= parse_clock(timeslot_js.end_time):  # type: ignore
+            raise ValueError(
+                f"start_time must be before end_time, but {timeslot_js.start_time}-{timeslot_js.end_time}"
+            )
+
     @classmethod
     def from_model(cls, monthly_attendance_model: MonthlyAttendanceModel) -> "MonthlyAttendance":
         year = int(monthly_attendance_model.year)
         month = int(monthly_attendance_model.month)
-        timeslot_list = [Timeslot(
-            day=int(timeslot.day),
-            start_time=time_str_2_datetime(year, month, int(timeslot.day), timeslot.start_time),
-            end_time=time_str_2_datetime(year, month, int(timeslot.day), timeslot.end_time),
-            timeslot_number=int(timeslot.timeslot_number),
-            timeslot_type=timeslot.timeslot_type, # type: ignore
-        ) for timeslot in monthly_attendance_model.timeslot_list]
-
-        if monthly_attendance_model.remark == None:
-            monthly_attendance_model.remark = ""
+        # 移行前の項目 (packed がない) は timeslot_list などから読む
+        attendance_data = monthly_attendance_model.attendance_data()
+        timeslot_list = Timeslot.from_packed_list(year, month, attendance_data.timeslot_list)
 
-        return MonthlyAttendance(
+        # DynamoDB に自分で書き込んだ値なので検証しない。リクエストの入力は今までどおり検証する
+        return cls.model_construct(
             year=year,
             month=month,
 
-            daily_lecture_amount=monthly_attendance_model.daily_lecture_amount, # type: ignore
-            daily_officework_amount=monthly_attendance_model.daily_office_amount, # type: ignore
-            daily_latenight_amount=monthly_attendance_model.daily_latenight_amount, # type: ignore
-            daily_over_eight_hour_amount=monthly_attendance_model.daily_over_eight_hour_amount, # type: ignore
-            daily_attendance=monthly_attendance_model.daily_attendance, # type: ignore
+            daily_lecture_amount=attendance_data.daily_lecture_amount,
+            daily_officework_amount=attendance_data.daily_officework_amount,
+            daily_latenight_amount=attendance_data.daily_latenight_amount,
+            daily_over_eight_hour_amount=attendance_data.daily_over_eight_hour_amount,
+            daily_attendance=attendance_data.daily_attendance,
 
             monthly_gross_salary=int(monthly_attendance_model.monthly_gross_salary),
             monthly_tax_amount=int(monthly_attendance_model.monthly_tax_amount),
             monthly_trans_fee=int(monthly_attendance_model.monthly_trans_fee),
             extra_payment=int(monthly_attendance_model.extra_payment),
-            remark=monthly_attendance_model.remark,
+            remark=monthly_attendance_model.remark or "",
 
             teacher=Teacher.from_model_monthly(monthly_attendance_model),
             timeslot_list=timeslot_list,
         )
+
+    @classmethod
+    def from_models(cls, monthly_attendance_models: "Iterable[MonthlyAttendanceModel]") -> list["MonthlyAttendance"]:
+        # クエリの1ページ分をまとめて変換する
+        from_model = cls.from_model
+        return [from_model(monthly_attendance_model) for monthly_attendance_model in monthly_attendance_models]
     
 
+class MonthlyAttendanceSummary(BaseModel):
+    # 給与一覧の概要表示用。月ごとの合計と講師の情報だけを持つ
+    year: int
+    month: int
+    teacher_id: str
+    display_name: str
+    given_name: str
+    family_name: str
+    teacher_type: Literal["teacher", "admin"]
+
+    monthly_gross_salary: int
+    monthly_tax_amount: int
+    monthly_trans_fee: int
+    extra_payment: int = 0
+    remark: str = ""
+
+    @classmethod
+    def from_model(cls, monthly_attendance_model: MonthlyAttendanceModel) -> "MonthlyAttendanceSummary":
+        return cls.model_construct(
+            year=int(monthly_attendance_model.year),
+            month=int(monthly_attendance_model.month),
+            teacher_id=monthly_attendance_model.id,
+            display_name=monthly_attendance_model.display_name,
+            given_name=monthly_attendance_model.given_name,
+            family_name=monthly_attendance_model.family_name,
+            teacher_type=monthly_attendance_model.teacher_type, # type: ignore
+
+            monthly_gross_salary=int(monthly_attendance_model.monthly_gross_salary),
+            monthly_tax_amount=int(monthly_attendance_model.monthly_tax_amount),
+            monthly_trans_fee=int(monthly_attendance_model.monthly_trans_fee),
+            extra_payment=int(monthly_attendance_model.extra_payment),
+            remark=monthly_attendance_model.remark or "",
+        )
+
+    @classmethod
+    def from_models(
+        cls, monthly_attendance_models: "Iterable[MonthlyAttendanceModel]"
+    ) -> list["MonthlyAttendanceSummary"]:
+        from_model = cls.from_model
+        return [from_model(monthly_attendance_model) for monthly_attendance_model in monthly_attendance_models]
+
+
 class Meeting(BaseModel):
     year: int
     month: int
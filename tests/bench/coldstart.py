@@ -0,0 +1,92 @@
+"""コールドスタートの計測
+
+    python -m tests.bench.coldstart --runs 5
+    python -m tests.bench.coldstart --importtime
+
+毎回新しいプロセスで api.main を import し、lambda_handler に最初のリクエストを
+投げるまでの時間を測る。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+
+ROOT = Path(__file__).resolve().parents[2]
+EVENT_PATH = ROOT / "events" / "event.json"
+
+# import してはいけない重いモジュール
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "msoffcrypto", "chardet", "pyarrow", "moto", "pytest"]
+
+# import + 最初のリクエストにかけてよい時間 [秒]
+COLDSTART_BUDGET = 3.0
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from api.main import lambda_handler
+t1 = time.perf_counter()
+event = json.load(open(sys.argv[1]))
+event.update(path=sys.argv[2], resource="/{proxy+}", httpMethod="GET", body=None, queryStringParameters=None)
+res = lambda_handler(event, None)
+t2 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "first_request": t2 - t1,
+    "status": res["statusCode"],
+    "heavy_modules": [m for m in json.loads(sys.argv[3]) if m in sys.modules],
+}))
+"""
+
+
+def measure_coldstart(path: str = "/") -> dict:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(EVENT_PATH), path, json.dumps(HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def importtime(top: int = 20) -> list[tuple[int, str]]:
+    # python -X importtime の累積時間 [us] が大きい順
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    if args.importtime:
+        for cumulative, name in importtime():
+            print(f"{cumulative / 1000:8.1f} ms  {name}")
+        return
+
+    results = [measure_coldstart(args.path) for _ in range(args.runs)]
+    print(json.dumps({
+        "runs": args.runs,
+        "import_median": median(r["import"] for r in results),
+        "first_request_median": median(r["first_request"] for r in results),
+        "heavy_modules": sorted({m for r in results for m in r["heavy_modules"]}),
+        "budget": COLDSTART_BUDGET,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
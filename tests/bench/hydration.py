@@ -0,0 +1,113 @@
+"""DynamoDB の項目から Pydantic のモデルへの変換 (hydration) の計測
+
+    python -m tests.bench.hydration --teachers 80 --months 12
+
+合成した出勤簿 (既定で 12か月 x 80人) を to_model() で項目にし、検証つきで作る
+書き換え前の実装 (validated_from_model) と、今の from_models (出勤簿は model_construct、
+コマは一覧をまとめて TypeAdapter で検証) の所要時間を比べる。packed の項目と、移行前の形式 (timeslot_list と日別の配列) の
+項目の両方で測る。
+"""
+import argparse
+import datetime
+import json
+import time
+from statistics import median
+from typing import Callable
+
+from api.db import MonthlyAttendanceModel
+from api.myutils.attendance_codec import PackedTimeslot
+from api.schemas.person import Teacher
+from api.schemas.timeslot import MonthlyAttendance, Timeslot, slot_datetime
+from tests.bench.item_size import legacy_model
+from tests.bench.response import make_salary_list
+
+
+def validated_from_model(monthly_attendance_model: MonthlyAttendanceModel) -> MonthlyAttendance:
+    # 書き換え前の実装。すべてのモデルを検証しながら作る
+    year = int(monthly_attendance_model.year)
+    month = int(monthly_attendance_model.month)
+    attendance_data = monthly_attendance_model.attendance_data()
+    return MonthlyAttendance(
+        year=year,
+        month=month,
+        daily_lecture_amount=attendance_data.daily_lecture_amount,
+        daily_officework_amount=attendance_data.daily_officework_amount,
+        daily_latenight_amount=attendance_data.daily_latenight_amount,
+        daily_over_eight_hour_amount=attendance_data.daily_over_eight_hour_amount,
+        daily_attendance=attendance_data.daily_attendance,
+        monthly_gross_salary=int(monthly_attendance_model.monthly_gross_salary),
+        monthly_tax_amount=int(monthly_attendance_model.monthly_tax_amount),
+        monthly_trans_fee=int(monthly_attendance_model.monthly_trans_fee),
+        extra_payment=int(monthly_attendance_model.extra_payment),
+        remark=monthly_attendance_model.remark or "",
+        teacher=validated_teacher(monthly_attendance_model),
+        timeslot_list=[validated_timeslot(year, month, timeslot) for timeslot in attendance_data.timeslot_list],
+    )
+
+
+def validated_timeslot(year: int, month: int, timeslot: PackedTimeslot) -> Timeslot:
+    date = datetime.datetime(year, month, timeslot.day)
+    return Timeslot(
+        day=timeslot.day,
+        start_time=date + datetime.timedelta(minutes=timeslot.start_minute),
+        end_time=date + datetime.timedelta(minutes=timeslot.end_minute),
+        timeslot_number=timeslot.timeslot_number,
+        timeslot_type=timeslot.timeslot_type,  # type: ignore
+    )
+
+
+def validated_teacher(monthly_attendance_model: MonthlyAttendanceModel) -> Teacher:
+    return Teacher(
+        id=monthly_attendance_model.id,
+        display_name=monthly_attendance_model.display_name,
+        given_name=monthly_attendance_model.given_name,
+        family_name=monthly_attendance_model.family_name,
+        school_id=monthly_attendance_model.school_id,
+        lecture_hourly_pay=monthly_attendance_model.lecture_hourly_pay,
+        office_hourly_pay=monthly_attendance_model.office_hourly_pay,
+        trans_fee=monthly_attendance_model.trans_fee,
+        fixed_salary=monthly_attendance_model.fixed_salary or 0.0,
+        teacher_type=monthly_attendance_model.teacher_type,  # type: ignore
+        sub=monthly_attendance_model.sub,
+    )
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    elapsed = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - t0)
+    return median(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teachers", type=int, default=80)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    monthly_attendance_list = make_salary_list(args.teachers, args.months)
+    packed = [monthly_attendance.to_model() for monthly_attendance in monthly_attendance_list]
+    legacy = [legacy_model(monthly_attendance) for monthly_attendance in monthly_attendance_list]
+
+    result = {"items": len(monthly_attendance_list)}
+    for name, models in [("packed", packed), ("legacy", legacy)]:
+        assert MonthlyAttendance.from_models(models) == [validated_from_model(model) for model in models]
+        validated = measure(lambda: [validated_from_model(model) for model in models], args.repeat)
+        # 時刻のキャッシュが空の状態 (コンテナの最初のリクエスト) も測る
+        slot_datetime.cache_clear()
+        cold = measure(lambda: MonthlyAttendance.from_models(models), 1)
+        trusted = measure(lambda: MonthlyAttendance.from_models(models), args.repeat)
+        result[name] = {
+            "validated_median": validated,
+            "trusted_cold": cold,
+            "trusted_median": trusted,
+            "speedup": validated / trusted,
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""出勤簿の項目サイズの計測
+
+    python -m tests.bench.item_size --teachers 15
+
+合成した1か月分の時間割から出勤簿を作り、移行前の形式 (timeslot_list と日別の配列)
+と packed の形式で、DynamoDB が数える項目サイズと WCU / RCU を比べる。
+"""
+import argparse
+import datetime
+import json
+import math
+from statistics import median
+
+from api.cruds.batch import WRITE_UNIT_SIZE, item_size
+from api.db import MonthlyAttendanceModel
+from api.myutils.payroll import calc_salary_batch
+from api.routers.timeslot import make_timeslots_from_table
+from api.schemas.timeslot import MonthlyAttendance, MonthlyAttendanceBeforeCalculate, TimeslotJS
+from tests.bench.synthetic import make_teachers, make_timetable
+
+# 強い整合性のない読み込みは 4KB ごとに 0.5RCU
+READ_UNIT_SIZE = 4096
+
+
+def legacy_model(monthly_attendance: MonthlyAttendance) -> MonthlyAttendanceModel:
+    # 移行前の MonthlyAttendance.to_model と同じ形の項目
+    monthly_attendance_model = monthly_attendance.to_model()
+    monthly_attendance_model.packed = None
+    monthly_attendance_model.timeslot_list = [timeslot.to_map() for timeslot in monthly_attendance.timeslot_list]
+    monthly_attendance_model.daily_lecture_amount = monthly_attendance.daily_lecture_amount
+    monthly_attendance_model.daily_office_amount = monthly_attendance.daily_officework_amount
+    monthly_attendance_model.daily_latenight_amount = monthly_attendance.daily_latenight_amount
+    monthly_attendance_model.daily_over_eight_hour_amount = monthly_attendance.daily_over_eight_hour_amount
+    monthly_attendance_model.daily_attendance = monthly_attendance.daily_attendance
+    return monthly_attendance_model
+
+
+def make_months(n_teachers: int) -> dict[str, list[MonthlyAttendance]]:
+    teacher_list = make_teachers(n_teachers)
+    # 1シート5日なので、6シートで1月の30日分
+    content = make_timetable(datetime.date(2023, 1, 1), 6, n_teachers=n_teachers)
+    display_name2timeslot_list = make_timeslots_from_table(teacher_list, content, 2023, 1)
+    timetable = [
+        MonthlyAttendanceBeforeCalculate(
+            year=2023, month=1, teacher=teacher,
+            timeslot_list=display_name2timeslot_list.get(teacher.display_name, []),
+        )
+        for teacher in teacher_list
+    ]
+    # 毎日3コマ担当する講師
+    full = [
+        MonthlyAttendanceBeforeCalculate(
+            year=2023, month=1, teacher=teacher_list[0],
+            timeslot_list=[
+                TimeslotJS(year=2023, month=1, day=day, timeslot_number=number, timeslot_type="lecture").to_timeslot()
+                for day in range(1, 32) for number in range(1, 4)
+            ],
+        )
+    ]
+    return {"timetable": calc_salary_batch(timetable), "full_month": calc_salary_batch(full)}
+
+
+def summarize(models: list[MonthlyAttendanceModel]) -> dict[str, float]:
+    sizes = [item_size(model.serialize()) for model in models]
+    return {
+        "median_bytes": median(sizes),
+        "max_bytes": max(sizes),
+        "wcu_per_item": median(math.ceil(size / WRITE_UNIT_SIZE) for size in sizes),
+        "rcu_per_item": median(0.5 * math.ceil(size / READ_UNIT_SIZE) for size in sizes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teachers", type=int, default=15)
+    args = parser.parse_args()
+
+    result = {}
+    for name, monthly_attendance_list in make_months(args.teachers).items():
+        legacy = summarize([legacy_model(monthly_attendance) for monthly_attendance in monthly_attendance_list])
+        packed = summarize([monthly_attendance.to_model() for monthly_attendance in monthly_attendance_list])
+        result[name] = {
+            "timeslots_median": median(len(m.timeslot_list) for m in monthly_attendance_list),
+            "legacy": legacy,
+            "packed": packed,
+            "ratio": legacy["median_bytes"] / packed["median_bytes"],
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
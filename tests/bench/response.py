@@ -0,0 +1,105 @@
+"""給与一覧のレスポンスの計測
+
+    python -m tests.bench.response --teachers 80 --months 12
+
+合成した時間割から作った出勤簿 (既定で 12か月 x 80人) を、FastAPI の既定の経路
+(response_model での検証 -> dict -> json.dumps) と json_response の経路 (pydantic-core
+で直接 JSON にして gzip) で返すときの CPU 時間とバイト数を比べる。
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from statistics import median
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from api.myutils.payroll import calc_salary_batch
+from api.myutils.response import compress, type_adapter
+from api.routers.timeslot import make_timeslots_from_table
+from api.schemas.timeslot import MonthlyAttendance, MonthlyAttendanceBeforeCalculate
+from tests.bench.synthetic import make_teachers, make_timetable
+
+SALARY_LIST = list[MonthlyAttendance]
+
+
+def make_salary_list(n_teachers: int, n_months: int) -> list[MonthlyAttendance]:
+    teacher_list = make_teachers(n_teachers)
+    monthly_attendance_list = []
+    for month in range(1, n_months + 1):
+        # 1シート5日なので、6シートで1か月の30日分
+        content = make_timetable(datetime.date(2023, month, 1), 6, n_teachers=n_teachers, seed=month)
+        display_name2timeslot_list = make_timeslots_from_table(teacher_list, content, 2023, month)
+        monthly_attendance_list += calc_salary_batch([
+            MonthlyAttendanceBeforeCalculate(
+                year=2023, month=month, teacher=teacher,
+                timeslot_list=display_name2timeslot_list.get(teacher.display_name, []),
+            )
+            for teacher in teacher_list
+        ])
+    return monthly_attendance_list
+
+
+async def default_body(field, monthly_attendance_list: list[MonthlyAttendance]) -> bytes:
+    # FastAPI がエンドポイントの戻り値を処理するのと同じ手順
+    content = await serialize_response(field=field, response_content=monthly_attendance_list)
+    return JSONResponse(content).body
+
+
+def fast_body(monthly_attendance_list: list[MonthlyAttendance], encoding: str | None) -> bytes:
+    body = type_adapter(SALARY_LIST).dump_json(monthly_attendance_list)
+    return body if encoding is None else compress(body, encoding)
+
+
+def cpu_time(f, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.process_time()
+        f()
+        times.append(time.process_time() - t0)
+    return median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teachers", type=int, default=80)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    monthly_attendance_list = make_salary_list(args.teachers, args.months)
+    field = create_response_field(name="response", type_=SALARY_LIST, mode="serialization")
+    loop = asyncio.new_event_loop()
+    fast_body(monthly_attendance_list, None)  # TypeAdapter を作っておく
+
+    default = loop.run_until_complete(default_body(field, monthly_attendance_list))
+    fast = fast_body(monthly_attendance_list, None)
+    assert json.loads(default) == json.loads(fast)
+
+    result = {
+        "items": len(monthly_attendance_list),
+        "default": {
+            "cpu_ms": 1000 * cpu_time(
+                lambda: loop.run_until_complete(default_body(field, monthly_attendance_list)), args.runs
+            ),
+            "bytes": len(default),
+        },
+        "fast": {
+            "cpu_ms": 1000 * cpu_time(lambda: fast_body(monthly_attendance_list, None), args.runs),
+            "bytes": len(fast),
+        },
+        "fast_gzip": {
+            "cpu_ms": 1000 * cpu_time(lambda: fast_body(monthly_attendance_list, "gzip"), args.runs),
+            "bytes": len(fast_body(monthly_attendance_list, "gzip")),
+        },
+    }
+    result["cpu_ratio"] = result["default"]["cpu_ms"] / result["fast"]["cpu_ms"]
+    result["gzip_bytes_ratio"] = result["default"]["bytes"] / result["fast_gzip"]["bytes"]
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""給与計算まわりの CPU ベンチマーク
+
+    python -m tests.bench.suite                  # 計測して baseline.json と比べる
+    python -m tests.bench.suite --save --runs 7  # 7回測った段階ごとの中央値を baseline.json に保存する
+    python -m tests.bench.suite --stage calc_salary --stage gensen_lookup
+
+DynamoDB は使わず、合成データ (講師・時間割・会議) だけで各段階の処理時間を測る。
+マシンの速さの違いを打ち消すため、決まった量の Python の処理 (calibration) に
+かかった時間との比で比べ、baseline より REGRESSION_THRESHOLD 以上遅くなった
+段階があれば終了コード 1 で終わる。
+"""
+import argparse
+import datetime
+import gc
+import json
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from api.myutils.gensen import get_gensen_table
+from api.routers.timeslot import make_timeslots_from_table
+from api.schemas.timeslot import MonthlyAttendance, MonthlyAttendanceBeforeCalculate, TimeslotJS
+from tests.bench.synthetic import make_meetings, make_teachers, make_timetable
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# baseline からこの割合以上遅くなったら失敗にする
+REGRESSION_THRESHOLD = 0.25
+# 1回の計測がこの秒数以上になるように、まとめて呼ぶ回数を決める
+MIN_SAMPLE_TIME = 0.05
+
+
+@dataclass
+class StageResult:
+    seconds: float  # 1回あたりの最短時間
+    relative: float  # calibration との比
+
+
+def calibration() -> None:
+    # 辞書・文字列・整数の演算を混ぜた、決まった量の処理
+    counts: dict[str, int] = {}
+    for i in range(20_000):
+        key = f"{i % 97:02d}:{i % 60:02d}"
+        counts[key] = counts.get(key, 0) + i * i % 7
+    sorted(counts.items(), key=lambda item: item[1])
+
+
+def make_stages(n_teachers: int) -> dict[str, Callable[[], object]]:
+    # 段階の名前 -> 引数なしで呼べる処理。データはここで一度だけ作る
+    teacher_list = make_teachers(n_teachers)
+    # 1シート5日なので、6シートで1か月の30日分
+    content = make_timetable(datetime.date(2023, 1, 1), 6, n_teachers=n_teachers)
+    meetings = make_meetings(teacher_list, 2023, 1)
+    display_name2timeslot_list = make_timeslots_from_table(teacher_list, content, 2023, 1)
+    before_list = [
+        MonthlyAttendanceBeforeCalculate(
+            year=2023, month=1, teacher=teacher,
+            timeslot_list=display_name2timeslot_list.get(teacher.display_name, []),
+        )
+        for teacher in teacher_list
+    ]
+    gensen = get_gensen_table(2023)
+    monthly_attendance_list = [before.calc_salary(gensen) for before in before_list]
+    models = [monthly_attendance.to_model() for monthly_attendance in monthly_attendance_list]
+    rng = random.Random(0)
+    amounts = [rng.uniform(gensen.lower[0], gensen.upper[-1] - 1) for _ in range(1000)]
+    timeslot_js_list = [
+        TimeslotJS(
+            year=2023, month=1, day=rng.randint(1, 31), timeslot_number=rng.randint(1, 5), timeslot_type="lecture"
+        )
+        for _ in range(1000)
+    ]
+
+    return {
+        "make_timeslots_from_table": lambda: make_timeslots_from_table(teacher_list, content, 2023, 1),
+        "meeting_make_timeslots": lambda: [meeting.make_timeslots() for meeting in meetings],
+        "calc_salary": lambda: [before.calc_salary(gensen) for before in before_list],
+        "gensen_lookup": lambda: [gensen.lookup(amount, 0) for amount in amounts],
+        "gensen_lookup_batch": lambda: gensen.lookup_batch(np.array(amounts), 0),
+        "to_model": lambda: [monthly_attendance.to_model() for monthly_attendance in monthly_attendance_list],
+        "from_model": lambda: [MonthlyAttendance.from_model(model) for model in models],
+        "timeslot_js_to_timeslot": lambda: [timeslot_js.to_timeslot() for timeslot_js in timeslot_js_list],
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    # timeit と同じく、GC を止めて何回かまとめて呼び、1回あたりの最短時間をとる
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(func, repeat)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _measure(func: Callable[[], object], repeat: int) -> float:
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= MIN_SAMPLE_TIME:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+def run(stages: dict[str, Callable[[], object]], repeat: int = 5) -> tuple[float, dict[str, StageResult]]:
+    # 計測中にマシンの速さが変わることがあるので、段階ごとに直前の calibration と比べる
+    calibration_list = []
+    results = {}
+    for name, func in stages.items():
+        calibration_seconds = measure(calibration, repeat)
+        seconds = measure(func, repeat)
+        calibration_list.append(calibration_seconds)
+        results[name] = StageResult(seconds=seconds, relative=seconds / calibration_seconds)
+    return min(calibration_list), results
+
+
+def run_median(
+    stages: dict[str, Callable[[], object]], repeat: int = 5, runs: int = 1
+) -> tuple[float, dict[str, StageResult]]:
+    # 速さが揺れるマシンで baseline を作るときは、何回か測って段階ごとに relative の中央値をとる
+    measured = [run(stages, repeat) for _ in range(runs)]
+    results = {}
+    for name in stages:
+        ordered = sorted((result[name] for _, result in measured), key=lambda result: result.relative)
+        results[name] = ordered[len(ordered) // 2]
+    calibration_list = sorted(calibration_seconds for calibration_seconds, _ in measured)
+    return calibration_list[len(calibration_list) // 2], results
+
+
+def find_regressions(
+    results: dict[str, StageResult], baseline: dict, threshold: float = REGRESSION_THRESHOLD
+) -> dict[str, float]:
+    # 段階の名前 -> baseline との比 (1 なら同じ)。baseline にない段階は比べない
+    regressions = {}
+    for name, result in results.items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+        ratio = result.relative / base["relative"]
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teachers", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--stage", action="append", help="計測する段階 (省略するとすべて)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--save", action="store_true", help="結果を baseline に保存する")
+    parser.add_argument("--runs", type=int, default=1, help="全段階を測る回数。段階ごとに中央値をとる")
+    args = parser.parse_args()
+
+    stages = make_stages(args.teachers)
+    if args.stage:
+        stages = {name: stages[name] for name in args.stage}
+    calibration_seconds, results = run_median(stages, args.repeat, args.runs)
+    report = {
+        "teachers": args.teachers,
+        "calibration_seconds": calibration_seconds,
+        "stages": {name: asdict(result) for name, result in results.items()},
+    }
+
+    if args.save:
+        if args.baseline.exists():
+            # 一部の段階だけ測ったときは、他の段階の baseline を残す
+            saved = json.loads(args.baseline.read_text())
+            report["stages"] = {**saved["stages"], **report["stages"]}
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(json.dumps(report, indent=2))
+        return
+
+    if not args.baseline.exists():
+        print(json.dumps(report, indent=2))
+        sys.exit(f"baseline not found: {args.baseline} (run with --save)")
+    baseline = json.loads(args.baseline.read_text())
+    for name, stage in report["stages"].items():
+        base = baseline["stages"].get(name)
+        stage["ratio"] = None if base is None else stage["relative"] / base["relative"]
+    print(json.dumps(report, indent=2))
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        # たまたま遅かっただけのこともあるので、遅くなった段階だけ測り直して速い方をとる
+        _, retry = run({name: stages[name] for name in regressions}, args.repeat)
+        for name, result in retry.items():
+            if result.relative < results[name].relative:
+                results[name] = result
+        regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        sys.exit("regressed: " + ", ".join(f"{name} x{ratio:.2f}" for name, ratio in regressions.items()))
+
+
+if __name__ == "__main__":
+    main()
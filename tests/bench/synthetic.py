@@ -0,0 +1,68 @@
+"""ベンチマーク用の合成データ"""
+import datetime
+import random
+
+from api.myutils.const import NUMBER_TO_LECTURE_TIMES, CellBlock
+from api.schemas.person import Teacher, TeacherBase
+from api.schemas.timeslot import Meeting
+
+TIMESLOT_NUM_CELLS = ["①", "②", "③", "④", "⑤"]
+# 授業・事務・全角の事務・空欄を混ぜる
+LESSON_CELLS = ["中1 数学", "高2 英語", "小6 算数", "事務", "事務30", "事務４５", None, None, None]
+
+
+def make_teachers(n_teachers: int, school_id: str = "school") -> list[Teacher]:
+    return [
+        Teacher.create(TeacherBase(
+            display_name=f"講師{i}", given_name="太郎", family_name=f"講師{i}", school_id=school_id,
+            lecture_hourly_pay=1000, office_hourly_pay=900, trans_fee=300, teacher_type="teacher",
+        ))
+        for i in range(n_teachers)
+    ]
+
+
+def make_timetable(
+    start: datetime.date,
+    n_sheets: int,
+    n_teachers: int = 15,
+    n_block_rows: int = CellBlock.MAX_BLOCKS_ROW,
+    seed: int = 0,
+) -> list[list[list]]:
+    # n_block_rows x n_teachers ブロックのシートを n_sheets 枚つなげた時間割
+    # 1日5コマで、シートをまたいで日付が続くので月をまたぐ
+    rng = random.Random(seed)
+    n_times = len(TIMESLOT_NUM_CELLS)
+    content = []
+    for k in range(n_sheets * n_block_rows):
+        date = start + datetime.timedelta(days=k // n_times)
+        date_cell: datetime.date | int | None = None
+        if k % n_times == 0:
+            # Excel のシリアル値のこともある
+            date_cell = date if rng.random() < 0.5 else (date - datetime.date(1899, 12, 30)).days
+        names = [None, date_cell]
+        cells1 = [None, TIMESLOT_NUM_CELLS[k % n_times]]
+        cells2 = [None, NUMBER_TO_LECTURE_TIMES[k % n_times + 1]]
+        for i in range(n_teachers):
+            # 名簿にない講師や空欄の列もある
+            names.append(rng.choice([f"講師{i}", f"講師{i}", f"講師{i}", "欠員", None]))
+            cells1.append(rng.choice(LESSON_CELLS))
+            cells2.append(rng.choice(LESSON_CELLS))
+        content.append([names, cells1, cells2])
+    return content
+
+
+def make_meetings(
+    teacher_list: list[Teacher], year: int, month: int, n_meetings: int = 20, seed: int = 0
+) -> list[Meeting]:
+    # 講師の一部が出る 30分 - 2時間の会議
+    rng = random.Random(seed)
+    meetings = []
+    for _ in range(n_meetings):
+        start = rng.randrange(9 * 60, 20 * 60, 15)
+        end = start + rng.choice([30, 60, 90, 120])
+        meetings.append(Meeting(
+            year=year, month=month, day=rng.randint(1, 28),
+            start_time=f"{start // 60:02d}:{start % 60:02d}", end_time=f"{end // 60:02d}:{end % 60:02d}",
+            teacher_ids=[teacher.id for teacher in rng.sample(teacher_list, k=max(1, len(teacher_list) // 3))],
+        ))
+    return meetings
@@ -0,0 +1,164 @@
+"""make_timeslots_from_table の計測
+
+    python -m tests.bench.timetable --sheets 12 --repeat 5
+
+合成した 25x15 ブロックのシートを月をまたいで並べ、書き換え前の実装
+(legacy_make_timeslots_from_table) と今の実装の所要時間を比べる。
+書き換え前の実装は対象の月以外のコマも作ってしまうので、1月だけのシート
+(single_month) でも比べる。
+"""
+import argparse
+import datetime
+import json
+import re
+import time
+from statistics import median
+from types import NoneType
+from typing import Any, Callable
+from unicodedata import normalize
+
+from api.myutils.const import LECTURE_TIMES_TO_NUMBER, CellBlock
+from api.myutils.utilfunc import excel_date_to_datetime
+from api.routers.timeslot import make_timeslots_from_table
+from api.schemas.person import Teacher
+from api.schemas.timeslot import Timeslot
+from tests.bench.synthetic import make_teachers, make_timetable
+
+
+def legacy_make_timeslots_from_table(
+    teacher_list: list[Teacher],
+    content: list[list[list[Any]]],
+    year: int,
+    month: int,
+) -> dict[str, list[Timeslot]]:
+    # 書き換え前の実装。月の絞り込みは match 文の誤りで効いていなかったので、
+    # 比べるときは対象の月以外のコマを除く (filter_month)
+    display_name_list = [teacher.display_name for teacher in teacher_list]
+    display_name2timeslot_list: dict[str, list[Timeslot]] = {
+        display_name: [] for display_name in display_name_list
+    }
+
+    date = None
+    for block_row in content:
+        date_cell = block_row[CellBlock.INFO_DATE_IDX][CellBlock.INFO_COL]
+        timeslot_num_cell = block_row[CellBlock.INFO_TIMESLOTNUM_IDX][CellBlock.INFO_COL]
+        time_cell = block_row[CellBlock.INFO_TIME_IDX][CellBlock.INFO_COL]
+
+        if type(date_cell) not in [datetime.date, int, NoneType]:
+            continue
+        if type(timeslot_num_cell) not in [str, int, NoneType]:
+            raise Exception(f"timeslot_num_cell type is {type(timeslot_num_cell)}")
+        if type(time_cell) not in [str, NoneType]:
+            raise Exception(f"time_cell type is {type(time_cell)}")
+        if (timeslot_num_cell == None) | (time_cell == None):
+            continue
+
+        if date_cell != None:
+            date = date_cell if type(date_cell) == datetime.date else excel_date_to_datetime(date_cell)
+        if date is None:
+            continue
+
+        time_cell = normalize("NFKC", time_cell)
+        timeslot_num = LECTURE_TIMES_TO_NUMBER[time_cell]
+        start_time_str, end_time_str = time_cell.split("-")
+        start_time = datetime.datetime.combine(date, datetime.datetime.strptime(start_time_str, "%H:%M").time())
+        end_time = datetime.datetime.combine(date, datetime.datetime.strptime(end_time_str, "%H:%M").time())
+
+        timeslot_lecture = Timeslot(
+            day=date.day,
+            timeslot_number=timeslot_num,
+            timeslot_type="lecture",
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+        for j in range(CellBlock.INFO_COL + 1, len(block_row[0])):
+            display_name = block_row[CellBlock.BLOCK_NAME_IDX][j]
+            cell1 = block_row[CellBlock.BLOCK_CELL1_IDX][j]
+            cell2 = block_row[CellBlock.BLOCK_CELL2_IDX][j]
+            if type(display_name) not in [str, NoneType]:
+                raise Exception(f"display_name type is {type(display_name)}")
+            if type(cell1) not in [str, NoneType]:
+                raise Exception(f"cell1 type is {type(cell1)}")
+            if type(cell2) not in [str, NoneType]:
+                raise Exception(f"cell2 type is {type(cell2)}")
+            if display_name == None:
+                continue
+            if (cell1 == None) and (cell2 == None):
+                continue
+            if display_name not in display_name_list:
+                continue
+
+            officework_end_time = None
+            for cell in [cell1, cell2]:
+                if cell == None:
+                    continue
+                cell = normalize("NFKC", cell)
+                if "事務" in cell:
+                    result = re.findall(r"事務(\d+)", cell)
+                    if len(result) == 0:
+                        officework_end_time = end_time
+                    else:
+                        officework_end_time = start_time + datetime.timedelta(minutes=int(result[0]))
+                    break
+            if officework_end_time != None:
+                display_name2timeslot_list[display_name].append(Timeslot(
+                    day=date.day,
+                    timeslot_number=0,
+                    timeslot_type="office_work",
+                    start_time=start_time,
+                    end_time=officework_end_time,
+                ))
+            else:
+                display_name2timeslot_list[display_name].append(timeslot_lecture)
+    return display_name2timeslot_list
+
+
+def filter_month(
+    display_name2timeslot_list: dict[str, list[Timeslot]], year: int, month: int
+) -> dict[str, list[Timeslot]]:
+    return {
+        display_name: [
+            timeslot for timeslot in timeslot_list
+            if (timeslot.start_time.year, timeslot.start_time.month) == (year, month)
+        ]
+        for display_name, timeslot_list in display_name2timeslot_list.items()
+    }
+
+
+def measure(func: Callable, *args, repeat: int = 5) -> float:
+    elapsed = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        elapsed.append(time.perf_counter() - t0)
+    return median(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sheets", type=int, default=12)
+    parser.add_argument("--teachers", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teacher_list = make_teachers(args.teachers)
+    content = make_timetable(datetime.date(2022, 12, 20), args.sheets, n_teachers=args.teachers)
+    # 1シート5日なので、6シートで1月の30日分
+    single_month = make_timetable(datetime.date(2023, 1, 1), 6, n_teachers=args.teachers)
+
+    result = {}
+    for name, sheet in [("multi_month", content), ("single_month", single_month)]:
+        legacy = measure(legacy_make_timeslots_from_table, teacher_list, sheet, 2023, 1, repeat=args.repeat)
+        current = measure(make_timeslots_from_table, teacher_list, sheet, 2023, 1, repeat=args.repeat)
+        result[name] = {
+            "block_rows": len(sheet),
+            "legacy_median": legacy,
+            "current_median": current,
+            "speedup": legacy / current,
+        }
+    print(json.dumps({"teachers": args.teachers, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import pytest
+from moto import mock_dynamodb
+
+from api import db
+from api.cruds import batch
+from api.myutils.cache import clear_caches
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SESSION_TOKEN", "testing")
+    # test_db は DynamoDB Local を使うので host を戻しておく
+    monkeypatch.setattr(db.DBModelBase.Meta, "host", None)
+    for model in [db.DBModelBase, *db.DBModelBase.__subclasses__()]:
+        monkeypatch.setattr(model, "_connection", None)
+    # moto にはキャパシティの制限がないので、書き込みのスロットリングで待たない
+    monkeypatch.setattr(batch.write_throttle, "max_tokens", float("inf"))
+    monkeypatch.setattr(batch.write_throttle, "_tokens", float("inf"))
+    # テーブルはテストごとに作り直すので、前のテストでキャッシュした項目を残さない
+    clear_caches()
+    with mock_dynamodb():
+        db.DBModelBase.create_table(read_capacity_units=25, write_capacity_units=25, wait=True)
+        yield
+
@@ -0,0 +1,53 @@
+import datetime
+from typing import Callable, Sequence
+
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.schemas.person import Teacher, TeacherBase
+from api.schemas.timeslot import MonthlyAttendanceBeforeCalculate, Timeslot
+
+
+def make_teacher_base(
+    i: int, school_id: str = "school", sub: str | None = None, lecture_hourly_pay: int = 1000
+) -> TeacherBase:
+    # テストで作る講師。表示名は i で区別する
+    return TeacherBase(
+        display_name=f"講師{i}",
+        given_name="太郎",
+        family_name=f"講師{i}",
+        school_id=school_id,
+        lecture_hourly_pay=lecture_hourly_pay,
+        office_hourly_pay=900,
+        trans_fee=300,
+        teacher_type="teacher",
+        sub=sub,
+    )
+
+
+def one_lecture(month: int, i: int) -> list[Timeslot]:
+    # 2023年 month月3日 14:00 からの1コマ
+    start = datetime.datetime(2023, month, 3, 14, 0)
+    return [Timeslot(
+        day=3, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+        timeslot_number=1, timeslot_type="lecture",
+    )]
+
+
+def create_attendance(
+    n_teachers: int,
+    months: Sequence[int] = (7,),
+    make_timeslot_list: Callable[[int, int], list[Timeslot]] = one_lecture,
+    remarks: Sequence[str] = (),
+) -> list[Teacher]:
+    # n_teachers 人の講師と、2023年の months の出勤簿を作る
+    # make_timeslot_list(month, i) は i 番目の講師のコマ、remarks[i] は備考
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i) for i in range(n_teachers)])
+    MonthlyAttendanceRepo.create_list([
+        MonthlyAttendanceBeforeCalculate(
+            year=2023, month=month, teacher=teacher, timeslot_list=make_timeslot_list(month, i),
+            remark=remarks[i] if i < len(remarks) else "",
+        )
+        for month in months
+        for i, teacher in enumerate(teacher_list)
+    ])
+    return teacher_list
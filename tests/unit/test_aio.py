@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from api.cruds import aio
+from api.cruds.meta import AsyncMetaRepo, MetaRepo
+from api.cruds.teacher import AsyncTeacherRepo, TeacherRepo
+from api.main import app
+from api.schemas.meta import Meta
+
+DELAY = 0.2
+
+
+def run(coro):
+    # asyncio.run はメインスレッドのループを未設定にしてしまい、
+    # 後で Mangum が asyncio.get_event_loop() を呼べなくなるので使わない
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def slow_get(id: str) -> Meta:
+    # DynamoDB の遅い呼び出しの代わり
+    time.sleep(DELAY)
+    return Meta(school_id=id, school_name=threading.current_thread().name)
+
+
+def test_independent_calls_run_concurrently(mocker):
+    mocker.patch.object(MetaRepo, "get", side_effect=slow_get)
+    mocker.patch.object(TeacherRepo, "list", side_effect=lambda school_id, consistent_read=False: time.sleep(DELAY) or [])
+
+    async def main():
+        start = time.perf_counter()
+        meta, teachers = await asyncio.gather(AsyncMetaRepo.get("school"), AsyncTeacherRepo.list("school"))
+        return time.perf_counter() - start, meta, teachers
+
+    elapsed, meta, teachers = run(main())
+    assert meta.school_id == "school"
+    assert meta.school_name != threading.current_thread().name
+    assert teachers == []
+    assert elapsed < 2 * DELAY
+
+
+def test_routes_do_not_block_event_loop(mocker):
+    mocker.patch.object(MetaRepo, "get", side_effect=slow_get)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            res_list = await asyncio.gather(*[client.get(f"/metas/school{i}") for i in range(4)])
+            return time.perf_counter() - start, res_list
+
+    elapsed, res_list = run(main())
+    assert [res.json()["school_id"] for res in res_list] == [f"school{i}" for i in range(4)]
+    assert elapsed < 2 * DELAY
+
+
+def test_thread_limit(mocker, monkeypatch):
+    monkeypatch.setattr(aio, "DB_THREAD_LIMIT", 1)
+    mocker.patch.object(MetaRepo, "get", side_effect=slow_get)
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*[AsyncMetaRepo.get(f"school{i}") for i in range(3)])
+        return time.perf_counter() - start
+
+    assert run(main()) >= 3 * DELAY
@@ -0,0 +1,153 @@
+import random
+
+from fastapi.testclient import TestClient
+from pynamodb.transactions import TransactWrite
+
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.db import MonthlyAttendanceModel
+from api.main import app
+from api.schemas.person import TeacherBase
+from api.schemas.timeslot import (
+    MonthlyAttendance,
+    MonthlyAttendanceBeforeCalculate,
+    PatchAttendanceReq,
+    PatchTimeslot,
+    TimeslotJS,
+)
+
+
+def create_attendance(rng: random.Random) -> MonthlyAttendance:
+    teacher = TeacherRepo.create(TeacherBase(
+        display_name="講師", given_name="太郎", family_name="講師", school_id="school",
+        lecture_hourly_pay=1300, office_hourly_pay=1000, trans_fee=420, fixed_salary=5000,
+        teacher_type="teacher",
+    ))
+    timeslot_list = [
+        TimeslotJS(year=2023, month=7, day=day, timeslot_number=number, timeslot_type="lecture").to_timeslot()
+        for day in range(1, 32) for number in range(1, 6) if rng.random() < 0.4
+    ]
+    return MonthlyAttendanceRepo.create(
+        MonthlyAttendanceBeforeCalculate(
+            year=2023, month=7, teacher=teacher, timeslot_list=timeslot_list, extra_payment=3000
+        )
+    )
+
+
+def random_patch(rng: random.Random, monthly_attendance: MonthlyAttendance) -> PatchAttendanceReq:
+    existing = [
+        PatchTimeslot(year=2023, month=7, day=t.day, timeslot_number=t.timeslot_number, timeslot_type="lecture")
+        for t in monthly_attendance.timeslot_list
+    ]
+    remove = rng.sample(existing, rng.randint(0, min(3, len(existing))))
+    add = [
+        PatchTimeslot(year=2023, month=7, day=rng.randint(1, 31), timeslot_number=rng.randint(1, 5), timeslot_type="lecture")
+        for _ in range(rng.randint(0, 3))
+    ]
+    extra_payment = rng.choice([None, 0, 12000])
+    return PatchAttendanceReq(add=add, remove=remove, extra_payment=extra_payment)
+
+
+def test_patch_matches_full_recalculation(dynamodb):
+    rng = random.Random(0)
+    monthly_attendance = create_attendance(rng)
+    for _ in range(20):
+        req = random_patch(rng, monthly_attendance)
+        monthly_attendance = MonthlyAttendanceRepo.patch(monthly_attendance.teacher.id, 2023, 7, req)
+
+        stored = MonthlyAttendanceRepo.get(monthly_attendance.teacher.id, 2023, 7)
+        assert stored == monthly_attendance
+        expected = MonthlyAttendanceBeforeCalculate.from_monthly_attendance(stored).calc_salary()
+        assert monthly_attendance == expected
+
+
+def test_patch_updates_only_attendance_attributes(dynamodb, mocker):
+    monthly_attendance = create_attendance(random.Random(1))
+    # 出勤簿の UpdateItem は集計の更新と同じトランザクションで送られる
+    spy = mocker.spy(TransactWrite, "update")
+    target = monthly_attendance.timeslot_list[0]
+    req = PatchAttendanceReq(
+        remove=[PatchTimeslot(year=2023, month=7, day=target.day, timeslot_number=target.timeslot_number, timeslot_type="lecture")],
+        add=[PatchTimeslot(year=2023, month=7, day=target.day, timeslot_number=target.timeslot_number % 5 + 1, timeslot_type="lecture")],
+    )
+    MonthlyAttendanceRepo.patch(monthly_attendance.teacher.id, 2023, 7, req)
+    actions = next(
+        call.kwargs["actions"] for call in spy.call_args_list
+        if isinstance(call.args[1], MonthlyAttendanceModel)
+    )
+    # packed (コマの一覧と日別の値を丸ごと) + 月の合計など6つ。講師の情報は書き換えない
+    assert len(actions) == 1 + 6
+
+
+def test_patch_office_work(dynamodb):
+    original = create_attendance(random.Random(3))
+    monthly_attendance = original
+    teacher_id = monthly_attendance.teacher.id
+    office_work = dict(year=2023, month=7, day=2, timeslot_number=0, timeslot_type="office_work")
+
+    # 追加、時刻の変更 (remove と add の組)、削除を PATCH だけで行う
+    reqs = [
+        PatchAttendanceReq(add=[
+            PatchTimeslot(**office_work, start_time="13:00", end_time="14:30"),
+            PatchTimeslot(**office_work, start_time="22:00", end_time="23:00"),
+        ]),
+        PatchAttendanceReq(
+            remove=[PatchTimeslot(**office_work, start_time="22:00", end_time="23:00")],
+            add=[PatchTimeslot(**office_work, start_time="21:00", end_time="23:30")],
+        ),
+    ]
+    for req in reqs:
+        monthly_attendance = MonthlyAttendanceRepo.patch(teacher_id, 2023, 7, req)
+        assert MonthlyAttendanceRepo.get(teacher_id, 2023, 7) == monthly_attendance
+        expected = MonthlyAttendanceBeforeCalculate.from_monthly_attendance(monthly_attendance).calc_salary()
+        assert monthly_attendance == expected
+    office_works = [t for t in monthly_attendance.timeslot_list if t.timeslot_type == "office_work"]
+    assert [(t.start_time_str, t.end_time_str) for t in office_works] == [("13:00", "14:30"), ("21:00", "23:30")]
+    assert monthly_attendance.daily_latenight_amount[1] > original.daily_latenight_amount[1]
+
+    monthly_attendance = MonthlyAttendanceRepo.patch(teacher_id, 2023, 7, PatchAttendanceReq(remove=[
+        PatchTimeslot(**office_work, start_time="21:00", end_time="23:30"), PatchTimeslot(**office_work),
+    ]))
+    assert monthly_attendance == original
+
+
+def test_patch_route_errors(dynamodb, mocker):
+    monthly_attendance = create_attendance(random.Random(2))
+    client = TestClient(app)
+    url = f"/salary/{monthly_attendance.teacher.id}"
+    params = {"year": 2023, "month": 7}
+
+    missing = {"year": 2023, "month": 7, "day": 31, "timeslot_number": 1, "timeslot_type": "lecture"}
+    if any(t.day == 31 and t.timeslot_number == 1 for t in monthly_attendance.timeslot_list):
+        missing["day"] = 30
+        missing["timeslot_number"] = 6
+    assert client.patch(url, params=params, json={"remove": [missing]}).status_code == 422
+    bad_month = {"year": 2023, "month": 8, "day": 1, "timeslot_number": 1, "timeslot_type": "lecture"}
+    assert client.patch(url, params=params, json={"add": [bad_month]}).status_code == 422
+    bad_number = {"year": 2023, "month": 7, "day": 1, "timeslot_number": 9, "timeslot_type": "lecture"}
+    assert client.patch(url, params=params, json={"add": [bad_number]}).status_code == 422
+    # 事務は時刻がないと追加できず、授業には時刻を付けられない
+    office_work = {"year": 2023, "month": 7, "day": 1, "timeslot_number": 0, "timeslot_type": "office_work"}
+    for add in [
+        office_work,
+        {**office_work, "start_time": "17:00"},
+        {**office_work, "start_time": "18:00", "end_time": "17:00"},
+        {**office_work, "start_time": "25:00", "end_time": "26:00"},
+        {**office_work, "timeslot_number": 1, "start_time": "17:00", "end_time": "18:00"},
+        {**bad_number, "timeslot_number": 1, "start_time": "17:00", "end_time": "18:00"},
+    ]:
+        assert client.patch(url, params=params, json={"add": [add]}).status_code == 422
+
+    # 読んでから書くまでの間に他の更新が入ったとき
+    patch = MonthlyAttendance.patch
+
+    def concurrent_patch(self, req, gensen=None):
+        if req.remark == "mine":
+            MonthlyAttendanceRepo.patch(monthly_attendance.teacher.id, 2023, 7, PatchAttendanceReq(remark="other"))
+        return patch(self, req, gensen)
+
+    mocker.patch.object(MonthlyAttendance, "patch", concurrent_patch)
+    res = client.patch(url, params=params, json={"remark": "mine"})
+    assert res.status_code == 409
+    mocker.stopall()
+    assert MonthlyAttendanceRepo.get(monthly_attendance.teacher.id, 2023, 7).remark == "other"
@@ -0,0 +1,57 @@
+import datetime
+
+from api import db
+from api.cruds import batch
+from api.cruds.batch import CapacityThrottle, batch_save
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.schemas.timeslot import MonthlyAttendanceBeforeCalculate, Timeslot
+from tests.unit.factories import make_teacher_base
+
+
+def test_create_list_uses_batch_write(dynamodb, mocker):
+    spy = mocker.spy(db.TeacherModel._get_connection(), "batch_write_item")
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i) for i in range(60)])
+    assert spy.call_count == 3
+    assert sorted(teacher.id for teacher in TeacherRepo.list("school")) == sorted(
+        teacher.id for teacher in teacher_list
+    )
+
+
+def test_batch_save_keeps_last_duplicate(dynamodb):
+    teacher_list = TeacherRepo.create_list([make_teacher_base(0), make_teacher_base(0)])
+    updated = teacher_list[1].model_copy(update={"trans_fee": 500.0})
+    assert batch_save([teacher_list[0].to_model(), updated.to_model()]) == 1
+    # batch_save は TeacherRepo のキャッシュを通らないので、テーブルから読む
+    assert db.TeacherModel.get("teacher", updated.id).trans_fee == 500.0
+
+
+def test_attendance_create_and_delete_list(dynamodb):
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i) for i in range(30)])
+    start = datetime.datetime(2023, 7, 3, 14, 0)
+    timeslot = Timeslot(
+        day=3, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+        timeslot_number=1, timeslot_type="lecture",
+    )
+    created = MonthlyAttendanceRepo.create_list([
+        MonthlyAttendanceBeforeCalculate(year=2023, month=7, teacher=teacher, timeslot_list=[timeslot])
+        for teacher in teacher_list
+    ])
+    assert sorted(MonthlyAttendanceRepo.list_monthly("school", 2023, 7), key=lambda a: a.teacher.id) == sorted(
+        created, key=lambda a: a.teacher.id
+    )
+    assert len(MonthlyAttendanceRepo.delete_list("school", 2023, 7)) == 30
+    assert MonthlyAttendanceRepo.list_monthly("school", 2023, 7) == []
+
+
+def test_capacity_throttle_waits_for_tokens(monkeypatch):
+    now = [0.0]
+    slept = []
+    monkeypatch.setattr(batch.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(batch.time, "sleep", lambda s: slept.append(s))
+    throttle = CapacityThrottle(25, burst_seconds=2)
+    assert throttle.acquire(50) == 0
+    assert throttle.acquire(25) == 1.0
+    now[0] = 3.0
+    assert throttle.acquire(25) == 0
+    assert slept == [1.0]
@@ -0,0 +1,20 @@
+from tests.bench.suite import StageResult, find_regressions, make_stages, run
+
+
+def test_stages_run():
+    stages = make_stages(3)
+    calibration_seconds, results = run(stages, repeat=1)
+    assert calibration_seconds > 0
+    assert set(results) == set(stages)
+    assert all(result.relative > 0 for result in results.values())
+
+
+def test_find_regressions():
+    baseline = {"stages": {"fast": {"relative": 1.0}, "slow": {"relative": 1.0}}}
+    results = {
+        "fast": StageResult(seconds=0.01, relative=1.1),
+        "slow": StageResult(seconds=0.02, relative=2.0),
+        "new": StageResult(seconds=0.03, relative=3.0),
+    }
+    assert find_regressions(results, baseline, threshold=0.25) == {"slow": 2.0}
+    assert find_regressions(results, baseline, threshold=1.5) == {}
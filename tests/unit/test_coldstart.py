@@ -0,0 +1,9 @@
+from tests.bench.coldstart import COLDSTART_BUDGET, measure_coldstart
+
+
+def test_coldstart_budget():
+    result = measure_coldstart("/")
+    assert result["status"] == 200
+    # pandas / numpy / openpyxl などは必要な処理の中で読み込む
+    assert result["heavy_modules"] == []
+    assert result["import"] + result["first_request"] < COLDSTART_BUDGET
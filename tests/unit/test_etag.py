@@ -0,0 +1,106 @@
+from fastapi.testclient import TestClient
+
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.main import app
+from api.myutils.etag import is_not_modified, make_validators
+from api.schemas.timeslot import MonthlyAttendance, PatchAttendanceReq
+from tests.unit.factories import create_attendance
+
+
+def test_salary_not_modified(dynamodb, mocker):
+    teacher = create_attendance(1)[0]
+    client = TestClient(app)
+    url = f"/salary/{teacher.id}"
+    params = {"year": 2023, "month": 7}
+
+    res = client.get(url, params=params)
+    assert res.status_code == 200
+    etag = res.headers["etag"]
+    assert etag.startswith('W/"')
+    assert res.headers["last-modified"].endswith("GMT")
+
+    from_model = mocker.spy(MonthlyAttendance, "from_model")
+    res = client.get(url, params=params, headers={"If-None-Match": f'"other", {etag}'})
+    assert res.status_code == 304
+    assert res.content == b""
+    assert res.headers["etag"] == etag
+    assert from_model.call_count == 0
+    last_modified = res.headers["last-modified"]
+    assert client.get(url, params=params, headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    MonthlyAttendanceRepo.patch(teacher.id, 2023, 7, PatchAttendanceReq(remark="changed"))
+    res = client.get(url, params=params, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+    assert res.json()["remark"] == "changed"
+
+
+def test_salary_list_not_modified(dynamodb, mocker):
+    teacher_list = create_attendance(3)
+    client = TestClient(app)
+    url = "/salary/bulk/school"
+    params = {"year": 2023, "month": 7}
+
+    res = client.get(url, params=params)
+    assert len(res.json()) == 3
+    etag = res.headers["etag"]
+    summary_etag = client.get(url, params={**params, "view": "summary"}).headers["etag"]
+    assert summary_etag != etag
+
+    list_page = mocker.spy(MonthlyAttendanceRepo, "list_monthly_page")
+    iter_between_items = mocker.spy(MonthlyAttendanceRepo, "iter_between_items")
+    assert client.get(url, params=params, headers={"If-None-Match": etag}).status_code == 304
+    assert list_page.call_count == 0
+    # 本文と同じインデックス (view=full なら school_id_index) から作る
+    assert iter_between_items.call_args.kwargs["summary"] is False
+
+    # ページごとのリクエストには付けず、期間全体も読まない
+    iter_between_items.reset_mock()
+    res = client.get(url, params={**params, "limit": 2}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert "etag" not in res.headers
+    assert iter_between_items.call_count == 0
+    res = client.get(url, params={**params, "cursor": res.headers["x-next-cursor"]})
+    assert "etag" not in res.headers
+
+    # 削除でも変わる
+    MonthlyAttendanceRepo.delete(teacher_list[0].id, 2023, 7)
+    res = client.get(url, params=params, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert len(res.json()) == 2
+
+    between = {"start_year": 2023, "start_month": 6, "end_year": 2023, "end_month": 7}
+    res = client.get(f"{url}/between", params=between)
+    assert client.get(
+        f"{url}/between", params=between, headers={"If-None-Match": res.headers["etag"]}
+    ).status_code == 304
+
+
+def test_teacher_not_modified(dynamodb):
+    teacher_list = create_attendance(2)
+    client = TestClient(app)
+
+    res = client.get(f"/teachers/{teacher_list[0].id}")
+    assert client.get(
+        f"/teachers/{teacher_list[0].id}", headers={"If-None-Match": res.headers["etag"]}
+    ).status_code == 304
+
+    res = client.get("/teachers/bulk/school")
+    etag = res.headers["etag"]
+    assert client.get("/teachers/bulk/school", headers={"If-None-Match": etag}).status_code == 304
+    TeacherRepo.delete(teacher_list[1].id)
+    res = client.get("/teachers/bulk/school", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert [teacher["id"] for teacher in res.json()] == [teacher_list[0].id]
+
+
+def test_make_validators():
+    versions = [("a", "2023-07-01T10:00:00"), ("b", "2023-07-02T09:00:00")]
+    validators = make_validators(versions)
+    assert make_validators(reversed(versions)) == validators
+    assert make_validators(versions, variant="view=summary") != validators
+    assert make_validators(versions[:1]).etag != validators.etag
+    assert is_not_modified({"if-none-match": "*"}, validators)
+    assert not is_not_modified({"if-modified-since": "not a date"}, validators)
+    assert not is_not_modified({}, validators)
@@ -0,0 +1,110 @@
+import csv
+import datetime
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi.testclient import TestClient
+
+from api.db import MonthlyAttendanceModel
+from api.main import app
+from api.myutils.export import EXPORT_MEDIA_TYPES, MONTHLY_COLUMNS, TIMESLOT_COLUMNS
+from api.schemas.timeslot import Timeslot
+from tests.unit.factories import create_attendance
+
+# 最初の講師の備考。CSV で引用符が付くように "," を入れる
+REMARKS = ["交通費, 別途"]
+PARAMS = {"start_year": 2023, "start_month": 5, "end_year": 2023, "end_month": 6}
+
+
+def lectures_by_teacher(month: int, i: int) -> list[Timeslot]:
+    # i 番目の講師は 1日から i+1 日まで毎日1コマ
+    timeslot_list = []
+    for day in range(1, i + 2):
+        start = datetime.datetime(2023, month, day, 14, 0)
+        timeslot_list.append(Timeslot(
+            day=day, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+            timeslot_number=1, timeslot_type="lecture",
+        ))
+    return timeslot_list
+
+
+def read_table(content: bytes, format: str) -> pa.Table:
+    if format == "parquet":
+        return pq.read_table(pa.BufferReader(content))
+    return pa.ipc.open_stream(content).read_all()
+
+
+def read_csv(content: bytes) -> list[dict[str, str]]:
+    assert content.startswith(b"\xef\xbb\xbf")
+    return list(csv.DictReader(io.StringIO(content.decode("utf-8-sig"))))
+
+
+def test_export_monthly_csv(dynamodb, monkeypatch, mocker):
+    create_attendance(4, [4, 5, 6, 7], lectures_by_teacher, REMARKS)
+    monkeypatch.setattr("api.cruds.timeslot.EXPORT_PAGE_SIZE", 3)
+    from_raw_data = mocker.spy(MonthlyAttendanceModel, "from_raw_data")
+    client = TestClient(app)
+
+    res = client.get("/salary/bulk/school/export", params=PARAMS)
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "text/csv; charset=utf-8"
+    records = read_csv(res.content)
+    # モデルを作らずに書き出す
+    assert from_raw_data.call_count == 0
+
+    expected = client.get("/salary/bulk/school/between", params=PARAMS).json()
+    assert list(records[0]) == [name for name, _ in MONTHLY_COLUMNS]
+    assert [
+        (int(r["month"]), r["teacher_id"], int(r["monthly_gross_salary"]), int(r["monthly_trans_fee"]), r["remark"])
+        for r in records
+    ] == [
+        (m["month"], m["teacher"]["id"], m["monthly_gross_salary"], m["monthly_trans_fee"], m["remark"])
+        for m in expected
+    ]
+
+
+def test_export_timeslot_csv(dynamodb):
+    create_attendance(3, [5, 6], lectures_by_teacher, REMARKS)
+    client = TestClient(app)
+
+    res = client.get("/salary/bulk/school/export", params={**PARAMS, "rows": "timeslot"})
+    assert res.status_code == 200
+    records = read_csv(res.content)
+    assert list(records[0]) == [name for name, _ in TIMESLOT_COLUMNS]
+    # 講師 i は i + 1 コマ
+    assert len(records) == 2 * (1 + 2 + 3)
+    assert records[0]["start_time"] == "14:00"
+    assert records[0]["end_time"] == "15:20"
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_export_arrow_formats(dynamodb, format):
+    create_attendance(3, [5, 6], lectures_by_teacher, REMARKS)
+    client = TestClient(app)
+
+    res = client.get("/salary/bulk/school/export", params={**PARAMS, "format": format})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == EXPORT_MEDIA_TYPES[format]
+    table = read_table(res.content, format)
+    assert table.num_rows == 6
+    assert str(table.schema.field("monthly_gross_salary").type) == "int64"
+    expected = client.get("/salary/bulk/school/between", params=PARAMS).json()
+    assert table.column("monthly_gross_salary").to_pylist() == [m["monthly_gross_salary"] for m in expected]
+
+
+def test_export_timeslot_parquet_row_groups(dynamodb, monkeypatch):
+    create_attendance(3, [5, 6], lectures_by_teacher, REMARKS)
+    monkeypatch.setattr("api.cruds.timeslot.EXPORT_PAGE_SIZE", 1)
+    monkeypatch.setattr("api.myutils.export.EXPORT_ROW_GROUP_SIZE", 4)
+    client = TestClient(app)
+
+    res = client.get("/salary/bulk/school/export", params={**PARAMS, "rows": "timeslot", "format": "parquet"})
+    assert res.status_code == 200
+    parquet_file = pq.ParquetFile(pa.BufferReader(res.content))
+    # 1ページ (講師1人の1か月分) ずつではなく、EXPORT_ROW_GROUP_SIZE 行ごとにまとめて書く
+    assert parquet_file.metadata.num_row_groups < 6
+    table = parquet_file.read()
+    assert table.num_rows == 2 * (1 + 2 + 3)
+    assert table.column("start_time").to_pylist()[0] == "14:00"
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.myutils.const import GENSEN_PATH
+from api.myutils.gensen import GensenTable, get_gensen_table, load_gensen_tables
+
+
+def legacy_lookup(gensen: pd.DataFrame, amount: float, column: str) -> float:
+    idx = (gensen["min"] <= amount) & (amount < gensen["max"])
+    assert np.sum(idx) == 1
+    v: float = gensen[idx][column].values[0]
+    if v < 1:
+        return v * amount
+    return v
+
+
+def test_lookup_matches_dataframe_scan():
+    gensen = pd.read_csv(GENSEN_PATH)
+    table = GensenTable.from_csv(GENSEN_PATH)
+    rng = np.random.default_rng(0)
+    amounts = np.concatenate([
+        rng.uniform(0, gensen["max"].max(), 500),
+        gensen["min"].to_numpy(),
+        gensen["max"].to_numpy()[:-1] - 0.5,
+    ])
+    for dependents in table.dependents:
+        expected = [legacy_lookup(gensen, float(x), str(dependents)) for x in amounts]
+        assert [table.lookup(float(x), dependents) for x in amounts] == expected
+        assert table.lookup_batch(amounts, dependents).tolist() == expected
+
+
+def test_lookup_out_of_range():
+    table = GensenTable.from_csv(GENSEN_PATH)
+    with pytest.raises(ValueError):
+        table.lookup(float(table.upper[-1]))
+    with pytest.raises(ValueError):
+        table.lookup_batch(np.array([1000.0, -1.0]))
+    with pytest.raises(ValueError):
+        table.lookup(1000.0, dependents=8)
+
+
+def test_table_selected_by_year():
+    tables = load_gensen_tables()
+    assert 2023 in tables
+    assert get_gensen_table(2023) is tables[2023]
+    assert get_gensen_table(2030) is tables[max(tables)]
+    assert get_gensen_table(2000) is tables[min(tables)]
@@ -0,0 +1,42 @@
+import warnings
+
+from api.db import TeacherModel
+from api.schemas.meta import Meta
+from api.schemas.person import Teacher
+from api.schemas.timeslot import MonthlyAttendance, MonthlyAttendanceSummary, Timeslot
+from tests.bench.hydration import validated_from_model
+from tests.bench.item_size import legacy_model
+from tests.bench.response import make_salary_list
+
+
+def test_trusted_hydration_matches_validation():
+    monthly_attendance_list = make_salary_list(4, 2)
+    for models in [
+        [monthly_attendance.to_model() for monthly_attendance in monthly_attendance_list],
+        [legacy_model(monthly_attendance) for monthly_attendance in monthly_attendance_list],
+    ]:
+        validated = [validated_from_model(model) for model in models]
+        with warnings.catch_warnings():
+            # 型が違うと pydantic がシリアライズのときに警告を出す
+            warnings.simplefilter("error")
+            trusted = MonthlyAttendance.from_models(models)
+            assert trusted == validated == monthly_attendance_list
+            assert [m.model_dump_json() for m in trusted] == [m.model_dump_json() for m in validated]
+            assert MonthlyAttendanceSummary.from_models(models)[0].model_dump_json()
+
+    # 検証せずに作ったモデルも普通に書き換えられる
+    timeslot = trusted[0].timeslot_list[0]
+    timeslot.timeslot_number = 5
+    assert "timeslot_number" in timeslot.model_fields_set
+    assert timeslot.model_copy(update={"day": 2}).day == 2
+    assert isinstance(timeslot, Timeslot)
+
+
+def test_teacher_and_meta_hydration():
+    teacher = make_salary_list(1, 1)[0].teacher
+    teacher_model = TeacherModel(record_type="teacher", timestamp="2023-07-01T00:00:00", **teacher.model_dump())
+    teacher_model.fixed_salary = None
+    assert Teacher.from_models([teacher_model]) == [teacher.model_copy(update={"fixed_salary": 0.0})]
+    meta = Meta(school_id="school", school_name="塾")
+    assert Meta.from_model(meta.to_model()) == meta
+
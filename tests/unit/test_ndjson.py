@@ -0,0 +1,66 @@
+import json
+
+from fastapi.testclient import TestClient
+from pynamodb.connection.base import Connection
+
+from api.cruds import timeslot as timeslot_crud
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.main import app, lambda_handler
+from api.schemas.timeslot import MonthlyAttendance
+from tests.unit.factories import create_attendance
+
+
+def test_between_ndjson_matches_json(dynamodb):
+    create_attendance(5, [5, 6, 7])
+    client = TestClient(app)
+    params = {"start_year": 2023, "start_month": 5, "end_year": 2023, "end_month": 7}
+
+    res = client.get("/salary/bulk/school/between", params={**params, "format": "ndjson"})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    lines = res.text.splitlines()
+    assert len(lines) == 15
+    streamed = [MonthlyAttendance.model_validate_json(line) for line in lines]
+
+    expected = client.get("/salary/bulk/school/between", params=params).json()
+    assert [json.loads(m.model_dump_json()) for m in streamed] == expected
+
+    res = client.get("/salary/bulk/school", params={"year": 2023, "month": 6, "format": "ndjson"})
+    assert len(res.text.splitlines()) == 5
+
+
+def test_iter_between_reads_page_by_page(dynamodb, monkeypatch, mocker):
+    create_attendance(3, [5, 6])
+    monkeypatch.setattr(timeslot_crud, "EXPORT_PAGE_SIZE", 2)
+    spy = mocker.spy(Connection, "query")
+
+    it = MonthlyAttendanceRepo.iter_between("school", 2023, 5, 2023, 6)
+    next(it)
+    next(it)
+    # 最初のページを返し終わるまで、次のページは読まない
+    assert spy.call_count == 1
+    assert spy.call_args.kwargs["limit"] == 2
+    assert len(list(it)) == 4
+    assert spy.call_count == 3
+
+
+def test_ndjson_through_mangum(dynamodb):
+    create_attendance(2, [5])
+    event = {
+        "resource": "/{proxy+}",
+        "path": "/salary/bulk/school",
+        "httpMethod": "GET",
+        "isBase64Encoded": False,
+        "queryStringParameters": {"year": "2023", "month": "5", "format": "ndjson"},
+        "multiValueQueryStringParameters": None,
+        "headers": {"Host": "example.com"},
+        "multiValueHeaders": None,
+        "pathParameters": None,
+        "stageVariables": None,
+        "body": None,
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "stage": "Prod"},
+    }
+    # Mangum はボディをまとめてから返す
+    res = lambda_handler(event, None)
+    assert res["statusCode"] == 200
+    assert len(res["body"].splitlines()) == 2
@@ -0,0 +1,119 @@
+import datetime
+import random
+
+import pytest
+
+from api.cruds import migrate
+from api.cruds.batch import item_size
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.db import MonthlyAttendanceModel
+from api.myutils import attendance_codec
+from api.myutils.export import timeslot_rows
+from api.myutils.payroll import calc_salary_batch
+from api.schemas.person import TeacherBase
+from api.schemas.rollup import PayrollTotals
+from api.schemas.timeslot import (
+    MonthlyAttendance,
+    MonthlyAttendanceBeforeCalculate,
+    PatchAttendanceReq,
+    PatchTimeslot,
+    Timeslot,
+    TimeslotJS,
+)
+from tests.bench.item_size import legacy_model
+
+
+def make_attendance(n_teachers: int, seed: int = 0) -> list[MonthlyAttendance]:
+    rng = random.Random(seed)
+    teacher_list = TeacherRepo.create_list([
+        TeacherBase(
+            display_name=f"講師{i}", given_name="太郎", family_name=f"講師{i}", school_id="school",
+            lecture_hourly_pay=1000, office_hourly_pay=900, trans_fee=300, teacher_type="teacher",
+        )
+        for i in range(n_teachers)
+    ])
+    before_list = []
+    for teacher in teacher_list:
+        timeslot_list = [
+            TimeslotJS(year=2023, month=7, day=day, timeslot_number=number, timeslot_type="lecture").to_timeslot()
+            for day in range(1, 32) for number in range(1, 6) if rng.random() < 0.3
+        ]
+        start = datetime.datetime(2023, 7, 31, 21, 30)
+        timeslot_list.append(Timeslot(
+            day=31, start_time=start, end_time=start + datetime.timedelta(minutes=45),
+            timeslot_number=0, timeslot_type="office_work",
+        ))
+        before_list.append(MonthlyAttendanceBeforeCalculate(
+            year=2023, month=7, teacher=teacher, timeslot_list=timeslot_list,
+        ))
+    return calc_salary_batch(before_list)
+
+
+def save_legacy(monthly_attendance_list: list[MonthlyAttendance]) -> None:
+    for monthly_attendance in monthly_attendance_list:
+        legacy_model(monthly_attendance).save()
+
+
+def test_codec_round_trip(dynamodb):
+    monthly_attendance = make_attendance(1)[0]
+    data = monthly_attendance.attendance_data()
+    packed = attendance_codec.pack(data)
+    assert attendance_codec.unpack(packed) == data
+    assert len(packed) == 3 + 31 * 4 * 2 + 4 + 7 * len(data.timeslot_list)
+
+    with pytest.raises(ValueError):
+        attendance_codec.unpack(b"\x09" + packed[1:])
+    data.daily_lecture_amount[0] = -1
+    with pytest.raises(ValueError):
+        attendance_codec.pack(data)
+
+
+def test_packed_is_smaller_and_reads_the_same(dynamodb):
+    for monthly_attendance in make_attendance(3):
+        legacy = legacy_model(monthly_attendance)
+        packed = monthly_attendance.to_model()
+        assert item_size(packed.serialize()) * 3 < item_size(legacy.serialize())
+        assert MonthlyAttendance.from_model(legacy) == monthly_attendance
+        assert MonthlyAttendance.from_model(packed) == monthly_attendance
+        assert PayrollTotals.from_attendance_model(legacy) == PayrollTotals.from_attendance_model(packed)
+        # 書き出しは生の項目から読む
+        assert timeslot_rows([legacy.serialize()]) == timeslot_rows([packed.serialize()])
+
+
+def test_patch_rewrites_legacy_item(dynamodb):
+    monthly_attendance = make_attendance(1)[0]
+    save_legacy([monthly_attendance])
+    target = monthly_attendance.timeslot_list[0]
+    req = PatchAttendanceReq(remove=[PatchTimeslot(
+        year=2023, month=7, day=target.day, timeslot_number=target.timeslot_number, timeslot_type="lecture",
+    )])
+    patched = MonthlyAttendanceRepo.patch(monthly_attendance.teacher.id, 2023, 7, req)
+
+    model = MonthlyAttendanceModel.get("attendance#2023-07", monthly_attendance.teacher.id)
+    assert model.packed is not None
+    assert model.timeslot_list is None and model.daily_attendance is None
+    assert MonthlyAttendance.from_model(model) == patched
+
+
+def test_migrate(dynamodb):
+    monthly_attendance_list = make_attendance(5)
+    save_legacy(monthly_attendance_list[:4])
+    MonthlyAttendanceRepo.create(MonthlyAttendanceBeforeCalculate.from_monthly_attendance(monthly_attendance_list[4]))
+
+    assert migrate.migrate("school", dry_run=True) == migrate.MigrationResult(migrated=4)
+    legacy_models = list(migrate.iter_legacy_attendance())
+    assert len(legacy_models) == 4
+
+    # 読んでから書くまでに他の更新が入ったものは飛ばす
+    concurrent = legacy_model(monthly_attendance_list[0])
+    concurrent.remark = "other"
+    concurrent.save()
+    assert [migrate.migrate_attendance(model) for model in legacy_models].count(False) == 1
+    assert migrate.migrate() == migrate.MigrationResult(migrated=1)
+    assert list(migrate.iter_legacy_attendance()) == []
+
+    for monthly_attendance in monthly_attendance_list:
+        model = MonthlyAttendanceModel.get("attendance#2023-07", monthly_attendance.teacher.id)
+        assert model.timeslot_list is None
+        assert MonthlyAttendance.from_model(model).timeslot_list == monthly_attendance.timeslot_list
@@ -0,0 +1,112 @@
+import datetime
+
+from fastapi.testclient import TestClient
+
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.main import app
+from api.myutils.const import NEXT_CURSOR_HEADER
+from api.myutils.cursor import decode_cursor, encode_cursor
+from api.schemas.timeslot import MonthlyAttendanceBeforeCalculate, Timeslot
+from tests.unit.factories import make_teacher_base
+
+
+def fetch_all(client: TestClient, url: str, params: dict) -> list[list[dict]]:
+    pages = []
+    cursor = None
+    while True:
+        res = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert res.status_code == 200
+        pages.append(res.json())
+        cursor = res.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_roundtrip():
+    key = {"record_type": {"S": "teacher"}, "id": {"S": "abc"}, "school_id": {"S": "school"}}
+    cursor = encode_cursor("school", key)
+    assert cursor is not None
+    assert decode_cursor("school", cursor) == key
+    assert encode_cursor("school", None) is None
+    assert decode_cursor("school", encode_cursor("school", key, "index"), "index") == key
+    for bad_school, bad_cursor, mode in [
+        ("other", cursor, ""), ("school", "not-a-cursor", ""), ("school", cursor, "index"),
+    ]:
+        try:
+            decode_cursor(bad_school, bad_cursor, mode)
+        except ValueError:
+            continue
+        assert False
+
+
+def test_teacher_pages(dynamodb):
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i) for i in range(12)])
+    TeacherRepo.create_list([make_teacher_base(i, "other") for i in range(3)])
+    client = TestClient(app)
+
+    pages = fetch_all(client, "/teachers/bulk/school", {"limit": 5})
+    assert [len(page) for page in pages] == [5, 5, 2]
+    ids = [teacher["id"] for page in pages for teacher in page]
+    assert sorted(ids) == sorted(teacher.id for teacher in teacher_list)
+
+    pages = fetch_all(client, "/teachers/bulk/school", {"limit": 5, "consistent_read": True})
+    assert sorted(teacher["id"] for page in pages for teacher in page) == sorted(ids)
+
+    # limit を付けなければ従来どおり全件返る
+    res = client.get("/teachers/bulk/school")
+    assert len(res.json()) == 12
+    assert NEXT_CURSOR_HEADER not in res.headers
+
+
+def test_cursor_from_other_school_is_rejected(dynamodb):
+    TeacherRepo.create_list([make_teacher_base(i, "other") for i in range(3)])
+    client = TestClient(app)
+    res = client.get("/teachers/bulk/other", params={"limit": 1})
+    cursor = res.headers[NEXT_CURSOR_HEADER]
+    assert client.get("/teachers/bulk/school", params={"cursor": cursor}).status_code == 400
+    assert client.get("/teachers/bulk/school", params={"limit": 0}).status_code == 422
+
+
+def test_cursor_from_other_read_mode_is_rejected(dynamodb):
+    TeacherRepo.create_list([make_teacher_base(i) for i in range(3)])
+    client = TestClient(app)
+    for consistent_read in [False, True]:
+        res = client.get("/teachers/bulk/school", params={"limit": 1, "consistent_read": consistent_read})
+        cursor = res.headers[NEXT_CURSOR_HEADER]
+        params = {"cursor": cursor, "consistent_read": not consistent_read}
+        res = client.get("/teachers/bulk/school", params=params)
+        assert res.status_code == 400
+        assert res.json()["detail"] == "cursor was issued for a different read mode"
+        res = client.get("/teachers/bulk/school", params={**params, "consistent_read": consistent_read})
+        assert res.status_code == 200
+
+
+def test_salary_between_pages_are_ordered(dynamodb):
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i) for i in range(4)])
+    before_list = []
+    for month in [5, 6, 7]:
+        start = datetime.datetime(2023, month, 3, 14, 0)
+        timeslot = Timeslot(
+            day=3, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+            timeslot_number=1, timeslot_type="lecture",
+        )
+        before_list += [
+            MonthlyAttendanceBeforeCalculate(year=2023, month=month, teacher=teacher, timeslot_list=[timeslot])
+            for teacher in teacher_list
+        ]
+    MonthlyAttendanceRepo.create_list(before_list)
+    client = TestClient(app)
+
+    pages = fetch_all(
+        client,
+        "/salary/bulk/school/between",
+        {"start_year": 2023, "start_month": 5, "end_year": 2023, "end_month": 7, "limit": 5},
+    )
+    items = [item for page in pages for item in page]
+    assert len(items) == 12
+    assert [item["month"] for item in items] == sorted(item["month"] for item in items)
+    assert len({(item["month"], item["teacher"]["id"]) for item in items}) == 12
+
+    pages = fetch_all(client, "/salary/bulk/school", {"year": 2023, "month": 6, "limit": 3})
+    assert [len(page) for page in pages] in ([3, 1], [3, 1, 0])
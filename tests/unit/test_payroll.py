@@ -0,0 +1,86 @@
+import calendar
+import datetime
+import random
+
+import pytest
+
+from api.myutils.const import NUMBER_TO_LECTURE_TIMES
+from api.myutils.payroll import calc_salary_batch
+from api.schemas.person import Teacher
+from api.schemas.timeslot import MonthlyAttendanceBeforeCalculate, Timeslot, TimeslotJS
+
+
+def make_teacher(rng: random.Random, i: int) -> Teacher:
+    return Teacher(
+        id=f"teacher{i}",
+        display_name=f"講師{i}",
+        given_name="太郎",
+        family_name=f"講師{i}",
+        school_id="school",
+        lecture_hourly_pay=rng.choice([1000.0, 1100.0, 1250.5, 1333.3]),
+        office_hourly_pay=rng.choice([909.0, 950.0, 1013.7]),
+        trans_fee=rng.choice([0.0, 300.0, 472.5]),
+        fixed_salary=rng.choice([0.0, 0.0, 12345.6]),
+        teacher_type="teacher",
+    )
+
+
+def make_timeslots(rng: random.Random, year: int, month: int) -> list[Timeslot]:
+    n_days = calendar.monthrange(year, month)[1]
+    timeslot_list = []
+    for day in rng.sample(range(1, n_days + 1), rng.randint(0, 12)):
+        for timeslot_number in rng.sample(sorted(NUMBER_TO_LECTURE_TIMES), rng.randint(0, 5)):
+            timeslot_list.append(
+                TimeslotJS(
+                    year=year, month=month, day=day,
+                    timeslot_number=timeslot_number, timeslot_type="lecture",
+                ).to_timeslot()
+            )
+        for _ in range(rng.randint(0, 2)):
+            start = datetime.datetime(year, month, day, rng.randint(0, 23), rng.choice([0, 15, 30, 45]))
+            # 日付をまたぐ事務も含める
+            end = start + datetime.timedelta(minutes=rng.randint(10, 600))
+            timeslot_list.append(
+                Timeslot(day=day, start_time=start, end_time=end, timeslot_number=0, timeslot_type="office_work")
+            )
+    rng.shuffle(timeslot_list)
+    return timeslot_list
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_calc_salary_batch_matches_calc_salary(seed: int):
+    rng = random.Random(seed)
+    before_list = []
+    for i in range(40):
+        year, month = rng.choice([(2023, 2), (2023, 7), (2024, 2), (2024, 12)])
+        before_list.append(
+            MonthlyAttendanceBeforeCalculate(
+                year=year,
+                month=month,
+                teacher=make_teacher(rng, i),
+                timeslot_list=make_timeslots(rng, year, month),
+                extra_payment=rng.choice([0, 0, 5000]),
+                remark=f"remark{i}",
+            )
+        )
+
+    expected = [before.calc_salary() for before in before_list]
+    assert calc_salary_batch(before_list) == expected
+
+
+def test_calc_salary_batch_rejects_other_timeslot():
+    rng = random.Random(0)
+    start = datetime.datetime(2023, 7, 1, 13, 0)
+    before = MonthlyAttendanceBeforeCalculate(
+        year=2023,
+        month=7,
+        teacher=make_teacher(rng, 0),
+        timeslot_list=[
+            Timeslot(
+                day=1, start_time=start, end_time=start + datetime.timedelta(hours=1),
+                timeslot_number=0, timeslot_type="other",
+            )
+        ],
+    )
+    with pytest.raises(ValueError):
+        calc_salary_batch([before])
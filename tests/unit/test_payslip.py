@@ -0,0 +1,130 @@
+import datetime
+import io
+import threading
+import zipfile
+
+import openpyxl
+from fastapi.testclient import TestClient
+
+from api.cruds.meta import MetaRepo
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.main import app
+from api.myutils.const import Payslip
+from api.myutils.payslip import _get_executor, render_payslips, zip_stream
+from api.schemas.meta import Meta, MetaBase
+from api.schemas.person import TeacherBase
+from api.schemas.timeslot import MonthlyAttendanceBeforeCalculate, Timeslot
+
+
+def make_before_list(school_id: str, n_teachers: int) -> list[MonthlyAttendanceBeforeCalculate]:
+    teacher_list = TeacherRepo.create_list([
+        TeacherBase(
+            display_name=f"講師{i}", given_name="太郎", family_name=f"講師{i}", school_id=school_id,
+            lecture_hourly_pay=1000, office_hourly_pay=900, trans_fee=300, teacher_type="teacher",
+        )
+        for i in range(n_teachers)
+    ])
+    before_list = []
+    for i, teacher in enumerate(teacher_list):
+        timeslot_list = []
+        for day in range(1, i + 2):
+            start = datetime.datetime(2023, 1, day, 15, 30)
+            timeslot_list.append(Timeslot(
+                day=day, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+                timeslot_number=2, timeslot_type="lecture",
+            ))
+        # 最後の講師は夜の事務もある (深夜・8時間超過の分が出る)
+        if i == n_teachers - 1:
+            timeslot_list.append(Timeslot(
+                day=1, start_time=datetime.datetime(2023, 1, 1, 17, 0), end_time=datetime.datetime(2023, 1, 1, 23, 30),
+                timeslot_number=0, timeslot_type="office_work",
+            ))
+        before_list.append(MonthlyAttendanceBeforeCalculate(
+            year=2023, month=1, teacher=teacher, timeslot_list=timeslot_list, extra_payment=100 * i,
+        ))
+    return before_list
+
+
+def test_payslips_route(dynamodb):
+    meta = MetaRepo.create(MetaBase(school_name="向島教室"))
+    monthly_attendance_list = MonthlyAttendanceRepo.create_list(make_before_list(meta.school_id, 3))
+    client = TestClient(app)
+
+    res = client.get(f"/salary/bulk/{meta.school_id}/payslips", params={"year": 2023, "month": 1})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(res.content)) as zf:
+        assert sorted(zf.namelist()) == [f"2023-01_講師{i}.xlsx" for i in range(3)]
+        for i in range(3):
+            ws = openpyxl.load_workbook(io.BytesIO(zf.read(f"2023-01_講師{i}.xlsx"))).active
+            assert (ws["F2"].value, ws["H2"].value) == (2023, 1)
+            assert ws["E5"].value == "向島教室"
+            assert ws["H5"].value == f"講師{i} 太郎"
+            assert ws["M6"].value == 100 * i
+            # 授業は E 列 (2コマ目) の 10 + 日 - 1 行目。他の講師の分やテンプレートの見本は残らない
+            lectures = {
+                cell.coordinate: cell.value
+                for row in ws.iter_rows(min_row=10, max_row=40, min_col=4, max_col=10)
+                for cell in row if cell.value is not None
+            }
+            assert lectures == {f"E{9 + day}": 80 for day in range(1, i + 2)}
+
+            # 金額と日ごとの分数は、テンプレートの式ではなく保存した計算結果
+            monthly_attendance = monthly_attendance_list[i]
+            assert ws["M2"].value == monthly_attendance.monthly_gross_salary + 100 * i
+            assert ws["P2"].value == monthly_attendance.monthly_tax_amount
+            assert ws["K41"].value == 1000 * 80 * (i + 1) // 60
+            assert ws["L41"].value == 900 * sum(monthly_attendance.daily_officework_amount) // 60
+            for col, daily_amount in [
+                ("K", monthly_attendance.daily_lecture_amount),
+                ("L", monthly_attendance.daily_officework_amount),
+                ("M", monthly_attendance.daily_latenight_amount),
+                ("N", monthly_attendance.daily_over_eight_hour_amount),
+            ]:
+                assert [ws[f"{col}{9 + day}"].value or 0 for day in range(1, 32)] == daily_amount
+        assert sum(monthly_attendance_list[2].daily_latenight_amount) > 0
+        assert sum(monthly_attendance_list[2].daily_over_eight_hour_amount) > 0
+
+
+def test_process_pool_matches_in_process(dynamodb):
+    monthly_attendance_list = MonthlyAttendanceRepo.create_list(make_before_list("school", 4))
+
+    def read(files):
+        return [
+            (filename, [row for row in openpyxl.load_workbook(io.BytesIO(data)).active.iter_rows(values_only=True)])
+            for filename, data in files
+        ]
+
+    in_process = read(render_payslips("school", monthly_attendance_list, workers=1))
+    pooled = read(render_payslips("school", monthly_attendance_list, workers=2))
+    assert pooled == in_process
+    # プロセスプールはリクエストごとに作らずに使い回す
+    executor = _get_executor(2, Payslip.TEMPLATE_PATH)
+    assert read(render_payslips("school", monthly_attendance_list, workers=2)) == in_process
+    assert _get_executor(2, Payslip.TEMPLATE_PATH) is executor
+
+    archive = b"".join(zip_stream(render_payslips("school", monthly_attendance_list, workers=1)))
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert len(zf.namelist()) == 4
+
+
+def test_payslips_route_reads_meta_and_attendance_concurrently(dynamodb, mocker):
+    # 2つの読み込みが同時に走っていなければ、片方が Barrier で待ち続けてタイムアウトする
+    barrier = threading.Barrier(2, timeout=5)
+
+    def get_meta(school_id):
+        barrier.wait()
+        return Meta(school_id=school_id, school_name="向島教室")
+
+    def list_monthly(school_id, year, month):
+        barrier.wait()
+        return []
+
+    mocker.patch.object(MetaRepo, "get", side_effect=get_meta)
+    mocker.patch.object(MonthlyAttendanceRepo, "list_monthly", side_effect=list_monthly)
+    client = TestClient(app)
+    res = client.get("/salary/bulk/school/payslips", params={"year": 2023, "month": 1})
+    assert res.status_code == 200
@@ -0,0 +1,76 @@
+import pytest
+from fastapi.testclient import TestClient
+from pynamodb.connection.base import Connection
+
+from api.cruds.meta import MetaRepo, meta_cache
+from api.cruds.teacher import TeacherRepo, roster_cache, teacher_cache
+from api.db import MetaModel, TeacherModel
+from api.main import app
+from api.myutils.cache import TTLCache
+from api.schemas.meta import MetaBase
+from tests.unit.factories import make_teacher_base
+
+
+def test_meta_is_cached_and_written_through(dynamodb, mocker):
+    meta = MetaRepo.create(MetaBase(school_name="塾"))
+    meta_cache.clear()
+    spy = mocker.spy(MetaModel, "get")
+
+    assert MetaRepo.get(meta.school_id) == meta
+    assert MetaRepo.get(meta.school_id) == meta
+    assert spy.call_count == 1
+
+    updated = MetaRepo.update(meta.school_id, MetaBase(school_name="新しい塾"))
+    assert MetaRepo.get(meta.school_id) == updated
+    assert spy.call_count == 1
+
+    MetaRepo.delete(meta.school_id)
+    with pytest.raises(MetaModel.DoesNotExist):
+        MetaRepo.get(meta.school_id)
+
+
+def test_teacher_and_roster_are_cached(dynamodb, mocker):
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i) for i in range(3)])
+    get = mocker.spy(TeacherModel, "get")
+    query = mocker.spy(Connection, "query")
+
+    assert TeacherRepo.get(teacher_list[0].id) == teacher_list[0]
+    assert get.call_count == 0
+    assert TeacherRepo.list("school") == TeacherRepo.list("school")
+    assert query.call_count == 1
+
+    # 講師を書き込むと、その塾の一覧だけ読み直す
+    TeacherRepo.create(make_teacher_base(3))
+    TeacherRepo.list("other")
+    assert len(TeacherRepo.list("school")) == 4
+    assert query.call_count == 3
+
+    moved = TeacherRepo.update(teacher_list[0].id, make_teacher_base(0, school_id="other"))
+    assert TeacherRepo.get(moved.id).school_id == "other"
+    assert moved.id not in {t.id for t in TeacherRepo.list("school")}
+    assert moved.id in {t.id for t in TeacherRepo.list("other")}
+
+    TeacherRepo.delete(moved.id)
+    with pytest.raises(TeacherModel.DoesNotExist):
+        TeacherRepo.get(moved.id)
+    assert TeacherRepo.list("other") == []
+
+    stats = TestClient(app).get("/cache/stats").json()
+    assert stats["roster"]["hits"] == roster_cache.hits > 0
+    assert stats["teacher"]["size"] == len(teacher_cache)
+
+
+def test_cache_keeps_newer_version():
+    cache: TTLCache[str, str] = TTLCache(maxsize=4, ttl=60)
+    assert cache.set("a", "new", version="2023-07-02T00:00:00")
+    assert not cache.set("a", "old", version="2023-07-01T00:00:00")
+    assert cache.get("a") == "new"
+
+    # 読んでいる間に invalidate されたら、読んだ値はキャッシュに入れない
+    def load():
+        cache.invalidate("b")
+        return "stale", "2023-07-01T00:00:00"
+
+    assert cache.get_or_load("b", load) == "stale"
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 2)
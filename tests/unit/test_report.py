@@ -0,0 +1,81 @@
+from fastapi.testclient import TestClient
+
+from api.cruds.meta import MetaRepo
+from api.cruds.report import ReportRepo
+from api.cruds.rollup import school_month_key
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.db import RollupModel
+from api.main import app
+from api.schemas.meta import Meta, MetaBase
+from api.schemas.rollup import PayrollTotals
+from api.schemas.timeslot import MonthlyAttendanceBeforeCalculate, TimeslotJS
+from tests.bench.item_size import legacy_model
+from tests.unit.factories import make_teacher_base
+
+
+def create_school(school_name: str, n_teachers: int) -> Meta:
+    meta = MetaRepo.create(MetaBase(school_name=school_name))
+    teacher_list = TeacherRepo.create_list([
+        make_teacher_base(i, meta.school_id, lecture_hourly_pay=1000 + i) for i in range(n_teachers)
+    ])
+    MonthlyAttendanceRepo.create_list([
+        MonthlyAttendanceBeforeCalculate(
+            year=2023, month=7, teacher=teacher, extra_payment=100,
+            timeslot_list=[
+                TimeslotJS(year=2023, month=7, day=day, timeslot_number=1, timeslot_type="lecture").to_timeslot()
+                for day in range(1, 6)
+            ],
+        )
+        for teacher in teacher_list
+    ])
+    return meta
+
+
+def test_payroll_report(dynamodb, mocker):
+    metas = [create_school("塾A", 3), create_school("塾B", 2), create_school("塾C", 0)]
+    batch_get = mocker.spy(RollupModel, "batch_get")
+    school_month_totals = mocker.spy(ReportRepo, "school_month_totals")
+    res = TestClient(app).get("/reports/payroll", params={"year": 2023, "month": 7})
+    assert res.status_code == 200
+    body = res.json()
+    assert [school["school_id"] for school in body["schools"]] == sorted(meta.school_id for meta in metas)
+    # 塾ごとの月の集計を1回の BatchGetItem で読む。出勤簿を数えるのは、集計の項目がない講師0人の塾だけ
+    assert batch_get.call_count == 1
+    assert [call.args[0] for call in school_month_totals.call_args_list] == [metas[2].school_id]
+
+    for school in body["schools"]:
+        monthly_attendance_list = MonthlyAttendanceRepo.list_monthly(school["school_id"], 2023, 7)
+        expected = sum(
+            (PayrollTotals.from_attendance_model(m.to_model()) for m in monthly_attendance_list), PayrollTotals()
+        )
+        assert PayrollTotals.model_validate(school) == expected
+        assert school["extra_payment"] == 100 * len(monthly_attendance_list)
+    assert body["total"]["headcount"] == 5
+    assert body["total"]["gross_salary"] == sum(school["gross_salary"] for school in body["schools"]) > 0
+    # 講師 i は 5コマ x 80分
+    assert body["total"]["lecture_amount"] == 5 * 5 * 80
+    assert set(body["total"]) == set(PayrollTotals.model_fields)
+
+
+def test_payroll_report_counts_schools_without_rollup(dynamodb, mocker):
+    # 集計を入れる前に書いたきりの塾 (移行前の形式の出勤簿で、集計の項目がない) も 0 にしない
+    metas = [create_school("塾A", 2), create_school("塾B", 3)]
+    legacy_school_id = metas[1].school_id
+    monthly_attendance_list = MonthlyAttendanceRepo.list_monthly(legacy_school_id, 2023, 7)
+    expected = sum(
+        (PayrollTotals.from_attendance_model(m.to_model()) for m in monthly_attendance_list), PayrollTotals()
+    )
+    for monthly_attendance in monthly_attendance_list:
+        legacy_model(monthly_attendance).save()
+    RollupModel.get(*school_month_key(2023, 7, legacy_school_id)).delete()
+
+    school_month_totals = mocker.spy(ReportRepo, "school_month_totals")
+    res = TestClient(app).get("/reports/payroll", params={"year": 2023, "month": 7})
+    assert res.status_code == 200
+    schools = {school["school_id"]: school for school in res.json()["schools"]}
+    assert school_month_totals.call_count == 1
+    assert school_month_totals.call_args.args == (legacy_school_id, 2023, 7)
+    assert PayrollTotals.model_validate(schools[legacy_school_id]) == expected
+    assert expected.headcount == 3 and expected.lecture_amount == 3 * 5 * 80
+    assert res.json()["total"]["headcount"] == 5
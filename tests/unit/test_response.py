@@ -0,0 +1,60 @@
+import asyncio
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.testclient import TestClient
+from fastapi.utils import create_response_field
+
+from api.main import app
+from api.myutils.const import JSON_COMPRESS_MIN_SIZE
+from api.myutils.response import negotiate_encoding, type_adapter
+from api.schemas.timeslot import MonthlyAttendance
+from tests.unit.factories import create_attendance
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("*, gzip;q=0") is None
+
+
+def test_salary_list_is_compressed(dynamodb):
+    create_attendance(5)
+    client = TestClient(app)
+    url = "/salary/bulk/school"
+    params = {"year": 2023, "month": 7, "limit": 3}
+
+    plain = client.get(url, params=params, headers={"Accept-Encoding": "identity"})
+    assert len(plain.content) >= JSON_COMPRESS_MIN_SIZE
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    # カーソルのヘッダも残る。ページごとのリクエストには ETag を付けない
+    assert plain.headers["x-next-cursor"]
+    assert "etag" not in plain.headers
+
+    raw = client.get(url, params=params, headers={"Accept-Encoding": "gzip"})
+    assert raw.headers["content-encoding"] == "gzip"
+    assert int(raw.headers["content-length"]) < len(plain.content)
+    assert raw.json() == plain.json()
+
+    # 小さいものは圧縮しない
+    small = client.get("/teachers/bulk/school", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    # ETag のヘッダも残る
+    full = client.get(url, params={"year": 2023, "month": 7}, headers={"Accept-Encoding": "gzip"})
+    assert full.headers["content-encoding"] == "gzip"
+    assert full.headers["etag"].startswith('W/"')
+
+
+def test_same_bytes_as_default(dynamodb):
+    create_attendance(2)
+    monthly_attendance_list = TestClient(app).get("/salary/bulk/school", params={"year": 2023, "month": 7}).json()
+    monthly_attendance_list = [MonthlyAttendance.model_validate(m) for m in monthly_attendance_list]
+
+    field = create_response_field(name="response", type_=list[MonthlyAttendance], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=monthly_attendance_list))
+    assert type_adapter(list[MonthlyAttendance]).dump_json(monthly_attendance_list) == JSONResponse(content).body
@@ -0,0 +1,196 @@
+import datetime
+import random
+
+from fastapi.testclient import TestClient
+from pynamodb.exceptions import CancellationReason, TransactWriteError, VerboseClientError
+from pynamodb.transactions import TransactWrite
+
+from api.cruds import rollup
+from api.cruds.rollup import RollupRepo, is_write_conflict
+from api.cruds.teacher import TeacherRepo
+from api.cruds.timeslot import MonthlyAttendanceRepo
+from api.main import app
+from api.schemas.person import Teacher, TeacherBase
+from api.schemas.rollup import PayrollTotals
+from api.schemas.timeslot import (
+    MonthlyAttendance,
+    MonthlyAttendanceBeforeCalculate,
+    PatchAttendanceReq,
+    PatchTimeslot,
+    Timeslot,
+    UpdateAttendanceReq,
+)
+
+
+def create_teachers(n_teachers: int) -> list[Teacher]:
+    return TeacherRepo.create_list([
+        TeacherBase(
+            display_name=f"講師{i}", given_name="太郎", family_name=f"講師{i}", school_id="school",
+            lecture_hourly_pay=1000 + 10 * i, office_hourly_pay=900, trans_fee=300, teacher_type="teacher",
+        )
+        for i in range(n_teachers)
+    ])
+
+
+def make_before(rng: random.Random, teacher: Teacher, month: int) -> MonthlyAttendanceBeforeCalculate:
+    timeslot_list = []
+    for day in rng.sample(range(1, 29), rng.randint(1, 8)):
+        start = datetime.datetime(2023, month, day, 14, 0)
+        timeslot_list.append(Timeslot(
+            day=day, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+            timeslot_number=1, timeslot_type="lecture",
+        ))
+    return MonthlyAttendanceBeforeCalculate(
+        year=2023, month=month, teacher=teacher, timeslot_list=timeslot_list, extra_payment=rng.choice([0, 1000]),
+    )
+
+
+def cancelled(*codes: str) -> TransactWriteError:
+    # TransactWriteItems が取り消されたときの例外
+    cause = VerboseClientError(
+        {"Error": {"Code": "TransactionCanceledException", "Message": "cancelled"}},
+        "TransactWriteItems",
+        cancellation_reasons=[None if code is None else CancellationReason(code=code, message=None) for code in codes],
+    )
+    return TransactWriteError("Failed to write transaction items", cause=cause)
+
+
+def totals(monthly_attendance_list: list[MonthlyAttendance]) -> PayrollTotals:
+    return sum(
+        (
+            PayrollTotals.from_attendance_model(monthly_attendance.to_model())
+            for monthly_attendance in monthly_attendance_list
+        ),
+        PayrollTotals(),
+    )
+
+
+def assert_rollups_match(year: int) -> None:
+    # 書き込みのたびに足し引きした集計が、出勤簿から計算し直したものと一致する
+    monthly_attendance_list = MonthlyAttendanceRepo.list_monthly("school", year)
+    school_months = {rollup.month: rollup for rollup in RollupRepo.list_school_months("school", year)}
+    for month in {m.month for m in monthly_attendance_list} | set(school_months):
+        expected = totals([m for m in monthly_attendance_list if m.month == month])
+        assert PayrollTotals(**school_months[month].model_dump(include=set(PayrollTotals.model_fields))) == expected
+    teacher_years = {rollup.teacher_id: rollup for rollup in RollupRepo.list_teacher_years("school", year)}
+    for teacher_id in {m.teacher.id for m in monthly_attendance_list} | set(teacher_years):
+        expected = totals([m for m in monthly_attendance_list if m.teacher.id == teacher_id])
+        assert PayrollTotals(**teacher_years[teacher_id].model_dump(include=set(PayrollTotals.model_fields))) == expected
+
+
+def test_rollups_follow_every_write(dynamodb):
+    rng = random.Random(0)
+    teacher_list = create_teachers(5)
+    MonthlyAttendanceRepo.create_list([make_before(rng, teacher, month) for month in [6, 7] for teacher in teacher_list])
+    assert_rollups_match(2023)
+
+    # 同じ月を作り直すと上書きした分が差し引かれる
+    MonthlyAttendanceRepo.create_list([make_before(rng, teacher, 7) for teacher in teacher_list[:2]])
+    MonthlyAttendanceRepo.create(make_before(rng, teacher_list[2], 8))
+    assert_rollups_match(2023)
+
+    monthly_attendance = MonthlyAttendanceRepo.get(teacher_list[3].id, 2023, 6)
+    MonthlyAttendanceRepo.update(teacher_list[3].id, 2023, 6, UpdateAttendanceReq(
+        timeslot_js_list=[], teacher=monthly_attendance.teacher, extra_payment=5000, remark="",
+    ))
+    MonthlyAttendanceRepo.patch(teacher_list[4].id, 2023, 7, PatchAttendanceReq(
+        add=[PatchTimeslot(year=2023, month=7, day=30, timeslot_number=2, timeslot_type="lecture")],
+    ))
+    assert_rollups_match(2023)
+
+    MonthlyAttendanceRepo.delete(teacher_list[0].id, 2023, 6)
+    MonthlyAttendanceRepo.delete_list("school", 2023, 7)
+    assert_rollups_match(2023)
+    school_months = {rollup.month: rollup for rollup in RollupRepo.list_school_months("school", 2023)}
+    assert school_months[7].headcount == 0
+    assert school_months[6].headcount == 4
+
+    maintained = RollupRepo.list_school_months("school", 2023)
+    RollupRepo.rebuild("school", 2023)
+    rebuilt = {
+        school_month.month: school_month for school_month in RollupRepo.list_school_months("school", 2023)
+    }
+    for school_month in maintained:
+        if school_month.headcount > 0:
+            assert rebuilt[school_month.month].gross_salary == school_month.gross_salary
+
+
+def test_large_create_list_is_split_into_transactions(dynamodb, mocker):
+    rng = random.Random(1)
+    teacher_list = create_teachers(120)
+    spy = mocker.spy(TransactWrite, "_commit")
+    MonthlyAttendanceRepo.create_list([make_before(rng, teacher, 5) for teacher in teacher_list])
+    # 1トランザクションは出勤簿49件 + 講師の年間49件 + 塾の月1件まで
+    assert spy.call_count == 3
+    assert_rollups_match(2023)
+
+
+def test_list_monthly_without_month_returns_the_year(dynamodb):
+    rng = random.Random(2)
+    teacher = create_teachers(1)[0]
+    MonthlyAttendanceRepo.create_list([make_before(rng, teacher, month) for month in [1, 5, 12]])
+    assert [m.month for m in MonthlyAttendanceRepo.list_monthly("school", 2023)] == [1, 5, 12]
+
+
+def test_rollup_routes(dynamodb):
+    rng = random.Random(3)
+    teacher_list = create_teachers(2)
+    created = MonthlyAttendanceRepo.create_list([make_before(rng, teacher, m) for m in [4, 5] for teacher in teacher_list])
+    client = TestClient(app)
+
+    res = client.get(f"/rollup/teacher/{teacher_list[0].id}", params={"year": 2023})
+    assert res.status_code == 200
+    assert res.json()["gross_salary"] == sum(
+        m.monthly_gross_salary for m in created if m.teacher.id == teacher_list[0].id
+    )
+    assert res.json()["headcount"] == 2
+    assert client.get(f"/rollup/teacher/{teacher_list[0].id}", params={"year": 2022}).status_code == 404
+
+    res = client.get("/rollup/school/school", params={"year": 2023})
+    assert [(r["month"], r["headcount"]) for r in res.json()] == [(4, 2), (5, 2)]
+    res = client.get("/rollup/school/school/teachers", params={"year": 2023})
+    assert sorted(r["teacher_id"] for r in res.json()) == sorted(t.id for t in teacher_list)
+
+
+def test_transaction_conflict_is_retried(dynamodb, mocker):
+    rng = random.Random(4)
+    teacher_list = create_teachers(2)
+    sleep = mocker.patch("api.cruds.rollup.time.sleep")
+    commit = TransactWrite._commit
+    errors = [cancelled(None, "TransactionConflict"), cancelled("TransactionConflict", None)]
+
+    def conflicting_commit(self):
+        if len(errors) > 0:
+            raise errors.pop(0)
+        return commit(self)
+
+    mocker.patch.object(TransactWrite, "_commit", conflicting_commit)
+    MonthlyAttendanceRepo.create_list([make_before(rng, teacher, 5) for teacher in teacher_list])
+    assert sleep.call_count == 2
+    assert_rollups_match(2023)
+
+
+def test_write_conflicts_are_409(dynamodb, mocker):
+    rng = random.Random(5)
+    teacher = create_teachers(1)[0]
+    MonthlyAttendanceRepo.create(make_before(rng, teacher, 5))
+    mocker.patch("api.cruds.rollup.time.sleep")
+    transact_write = mocker.patch("api.cruds.rollup._transact_write", side_effect=cancelled("ConditionalCheckFailed", None))
+    client = TestClient(app)
+
+    req = UpdateAttendanceReq(timeslot_js_list=[], extra_payment=0, remark="更新", teacher=teacher)
+    res = client.put(f"/salary/{teacher.id}", params={"year": 2023, "month": 5}, content=req.model_dump_json())
+    assert res.status_code == 409
+    # 条件を満たさなかったときは送り直さない
+    assert transact_write.call_count == 1
+
+    transact_write.reset_mock()
+    transact_write.side_effect = cancelled(None, "TransactionConflict")
+    res = client.post(
+        "/salary/bulk/school", params={"year": 2023, "month": 6}, json={"content": [], "meetings": []}
+    )
+    assert res.status_code == 409
+    assert transact_write.call_count == rollup.TRANSACT_CONFLICT_RETRIES + 1
+
+    assert is_write_conflict(cancelled(None, "ConditionalCheckFailed"))
+    assert not is_write_conflict(cancelled("ValidationError"))
@@ -0,0 +1,97 @@
+import datetime
+import json
+
+from fastapi.testclient import TestClient
+from pynamodb.connection.base import Connection
+
+from api.cruds.batch import item_size
+from api.main import app
+from api.schemas.timeslot import Timeslot
+from tests.unit.factories import create_attendance
+
+
+def lectures_every_day(month: int, i: int) -> list[Timeslot]:
+    # 1日から28日まで毎日3コマ
+    timeslot_list = []
+    for day in range(1, 29):
+        for number in range(1, 4):
+            start = datetime.datetime(2023, month, day, 13 + number * 2, 0)
+            timeslot_list.append(Timeslot(
+                day=day, start_time=start, end_time=start + datetime.timedelta(minutes=80),
+                timeslot_number=number, timeslot_type="lecture",
+            ))
+    return timeslot_list
+
+
+def record_query_bytes(mocker) -> list[dict]:
+    calls = []
+    query = Connection.query
+
+    def spy(self, *args, **kwargs):
+        data = query(self, *args, **kwargs)
+        size = sum(item_size(item) for item in data["Items"])
+        calls.append({"index_name": kwargs.get("index_name"), "bytes": size})
+        return data
+
+    mocker.patch.object(Connection, "query", spy)
+    return calls
+
+
+def test_summary_matches_full_totals(dynamodb, mocker):
+    create_attendance(4, [5, 6], lectures_every_day)
+    client = TestClient(app)
+    params = {"start_year": 2023, "start_month": 5, "end_year": 2023, "end_month": 6}
+    calls = record_query_bytes(mocker)
+
+    full = client.get("/salary/bulk/school/between", params=params).json()
+    full_bytes = sum(call["bytes"] for call in calls)
+    calls.clear()
+    summary = client.get("/salary/bulk/school/between", params={**params, "view": "summary"}).json()
+    summary_bytes = sum(call["bytes"] for call in calls)
+
+    assert calls[0]["index_name"] == "school_summary_index"
+    # 日別の配列とコマの一覧 (packed) を読まないので、読み込む量が小さくなる
+    assert summary_bytes * 3 < full_bytes
+
+    assert len(summary) == len(full) == 8
+    assert "timeslot_list" not in summary[0]
+    key = lambda item: (item["month"], item["teacher_id"])
+    expected = sorted(
+        (
+            {
+                "year": item["year"],
+                "month": item["month"],
+                "teacher_id": item["teacher"]["id"],
+                "display_name": item["teacher"]["display_name"],
+                "given_name": item["teacher"]["given_name"],
+                "family_name": item["teacher"]["family_name"],
+                "teacher_type": item["teacher"]["teacher_type"],
+                "monthly_gross_salary": item["monthly_gross_salary"],
+                "monthly_tax_amount": item["monthly_tax_amount"],
+                "monthly_trans_fee": item["monthly_trans_fee"],
+                "extra_payment": item["extra_payment"],
+                "remark": item["remark"],
+            }
+            for item in full
+        ),
+        key=key,
+    )
+    assert sorted(summary, key=key) == expected
+
+
+def test_summary_pages_and_ndjson(dynamodb):
+    create_attendance(5, [7], lectures_every_day)
+    client = TestClient(app)
+
+    res = client.get("/salary/bulk/school", params={"year": 2023, "month": 7, "view": "summary", "limit": 3})
+    assert len(res.json()) == 3
+    cursor = res.headers["X-Next-Cursor"]
+    res = client.get(
+        "/salary/bulk/school", params={"year": 2023, "month": 7, "view": "summary", "limit": 3, "cursor": cursor}
+    )
+    assert len(res.json()) == 2
+
+    res = client.get("/salary/bulk/school", params={"year": 2023, "month": 7, "view": "summary", "format": "ndjson"})
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert len(lines) == 5
+    assert all("timeslot_list" not in line for line in lines)
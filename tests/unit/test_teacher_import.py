@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+from api.cruds.teacher import TeacherRepo
+from api.main import app
+from api.myutils.csvstream import detect_encoding
+
+HEADER = "display_name,given_name,family_name,lecture_hourly_pay,office_hourly_pay,trans_fee,fixed_salary,teacher_type,sub\n"
+
+
+def test_detect_encoding():
+    text = "講師名,姓,名\n山田,山田,太郎\n" * 10
+    assert detect_encoding(text.encode("utf-8")) == "utf-8"
+    assert detect_encoding(b"\xef\xbb\xbf" + text.encode("utf-8")) == "utf-8-sig"
+    assert detect_encoding(text.encode("cp932")) == "cp932"
+
+
+def test_import_reports_rejected_rows(dynamodb):
+    rows = [f"講師{i},太郎,講師{i},1000,900,300,,teacher,\n" for i in range(30)]
+    rows.insert(3, "講師X,太郎,講師X,abc,900,300,,teacher,\n")
+    rows.insert(10, "講師5,太郎,講師5,1000,900,300,,teacher,\n")
+    rows.insert(20, "講師Y,太郎,講師Y,1000,900,300,,guest,\n")
+    body = (HEADER + "".join(rows)).encode("cp932")
+
+    client = TestClient(app)
+    res = client.post("/teachers/bulk/school", files={"file": ("teachers.csv", body, "text/csv")})
+    assert res.status_code == 200
+    report = res.json()
+
+    assert len(report["accepted"]) == 30
+    assert [(row["line"], row["display_name"]) for row in report["rejected"]] == [
+        (5, "講師X"), (12, "講師5"), (22, "講師Y"),
+    ]
+    assert report["rejected"][0]["errors"][0].startswith("lecture_hourly_pay")
+    assert report["rejected"][1]["errors"] == ["duplicate display_name"]
+
+    teacher_list = TeacherRepo.list("school")
+    assert len(teacher_list) == 30
+    assert all(teacher.fixed_salary == 0.0 and teacher.sub is None for teacher in teacher_list)
@@ -0,0 +1,58 @@
+import json
+import math
+
+from pynamodb.connection.base import Connection
+
+from api.cruds.teacher import TeacherRepo, roster_cache
+from tests.unit.factories import make_teacher_base
+
+# 結果整合性のある読み込みは 4KB ごとに 0.5RCU
+READ_UNIT_SIZE = 4 * 1024
+
+
+def record_queries(mocker) -> list[dict]:
+    # moto の ConsumedCapacity は常に1なので、読んだ項目のサイズから RCU を見積もる
+    calls = []
+    query = Connection.query
+
+    def spy(self, *args, **kwargs):
+        data = query(self, *args, **kwargs)
+        size = sum(len(json.dumps(item, ensure_ascii=False).encode("utf-8")) for item in data["Items"])
+        units = math.ceil(size / READ_UNIT_SIZE) * (1.0 if kwargs.get("consistent_read") else 0.5)
+        calls.append({"kwargs": kwargs, "count": data["Count"], "units": units})
+        return data
+
+    mocker.patch.object(Connection, "query", spy)
+    return calls
+
+
+def test_list_reads_only_the_school(dynamodb, mocker):
+    teacher_list = TeacherRepo.create_list([make_teacher_base(i, "small") for i in range(5)])
+
+    calls = record_queries(mocker)
+    assert sorted(t.id for t in TeacherRepo.list("small")) == sorted(t.id for t in teacher_list)
+    small_units = sum(call["units"] for call in calls)
+    assert calls[0]["kwargs"]["index_name"] == "school_id_index"
+
+    TeacherRepo.create_list([make_teacher_base(i, "large") for i in range(150)])
+    # 一覧はキャッシュされるので、テーブルから読み直させる
+    roster_cache.clear()
+    calls.clear()
+    assert len(TeacherRepo.list("small")) == 5
+    # 他の塾の講師が増えても、読み込む量は変わらない
+    assert sum(call["count"] for call in calls) == 5
+    assert sum(call["units"] for call in calls) == small_units
+
+    calls.clear()
+    assert len(TeacherRepo.list("large")) == 150
+    assert sum(call["units"] for call in calls) > small_units
+
+
+def test_list_consistent_read_uses_table(dynamodb, mocker):
+    TeacherRepo.create_list([make_teacher_base(i, "small") for i in range(5)])
+    TeacherRepo.create_list([make_teacher_base(i, "large") for i in range(10)])
+
+    calls = record_queries(mocker)
+    assert len(TeacherRepo.list("small", consistent_read=True)) == 5
+    assert calls[0]["kwargs"]["index_name"] is None
+    assert calls[0]["kwargs"]["consistent_read"] is True
@@ -0,0 +1,86 @@
+import pytest
+
+from api import db
+from api.cruds import teacher as teacher_crud
+from api.cruds.teacher import TeacherRepo
+from api.db import TeacherModel
+from api.myutils.cache import TTLCache
+from tests.unit.factories import make_teacher_base
+
+
+@pytest.fixture(autouse=True)
+def clear_sub_cache():
+    teacher_crud.sub_cache.clear()
+    yield
+    teacher_crud.sub_cache.clear()
+
+
+def test_get_from_sub_uses_index_and_cache(dynamodb, mocker):
+    teacher_list = TeacherRepo.create_list(
+        [make_teacher_base(i, sub=f"sub-{i}") for i in range(30)]
+    )
+    # インデックスは DBModelBase に定義されているので、そちらの接続で問い合わせる
+    spy = mocker.spy(db.DBModelBase._get_connection(), "query")
+
+    teacher = TeacherRepo.get_from_sub("sub-7")
+    assert teacher == teacher_list[7]
+    assert spy.call_count == 1
+    assert spy.call_args.kwargs["index_name"] == "sub_index"
+
+    assert TeacherRepo.get_from_sub("sub-7") == teacher_list[7]
+    assert spy.call_count == 1
+
+
+def test_get_from_sub_guest_is_not_cached(dynamodb):
+    guest = TeacherRepo.get_from_sub("unknown")
+    assert guest.display_name == "Guest"
+    assert guest.id == ""
+
+    teacher = TeacherRepo.create(make_teacher_base(0, sub="unknown"))
+    assert TeacherRepo.get_from_sub("unknown") == teacher
+
+
+def test_update_invalidates_sub(dynamodb):
+    teacher = TeacherRepo.create(make_teacher_base(0, sub="old"))
+    assert TeacherRepo.get_from_sub("old") == teacher
+
+    updated = TeacherRepo.update(teacher.id, make_teacher_base(1, sub="new"))
+    assert TeacherRepo.get_from_sub("new") == updated
+    assert TeacherRepo.get_from_sub("old").display_name == "Guest"
+
+    TeacherRepo.delete(teacher.id)
+    assert TeacherRepo.get_from_sub("new").display_name == "Guest"
+
+
+def test_update_during_lookup_is_not_cached(dynamodb, mocker):
+    teacher = TeacherRepo.create(make_teacher_base(0, sub="sub"))
+    query = TeacherModel.sub_index.query
+
+    def query_then_update(*args, **kwargs):
+        # 古い講師を読んだあと、返す前に別のリクエストが更新する
+        result = list(query(*args, **kwargs))
+        TeacherRepo.update(teacher.id, make_teacher_base(1, sub="sub"))
+        return iter(result)
+
+    mocker.patch.object(TeacherModel.sub_index, "query", side_effect=query_then_update)
+    assert TeacherRepo.get_from_sub("sub") == teacher
+    assert teacher_crud.sub_cache.get("sub") is None
+
+    mocker.stopall()
+    assert TeacherRepo.get_from_sub("sub").display_name == "講師1"
+
+
+def test_ttl_cache_expires_and_evicts(mocker):
+    now = [0.0]
+    mocker.patch("api.myutils.cache.time.monotonic", side_effect=lambda: now[0])
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert len(cache) == 1
@@ -0,0 +1,65 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.myutils.telemetry import RequestMetrics, consumed_capacity, server_timing
+from tests.unit.factories import create_attendance
+
+
+def read_records(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_request_is_recorded(dynamodb, capsys):
+    teacher = create_attendance(1)[0]
+    client = TestClient(app)
+    capsys.readouterr()
+
+    res = client.get(f"/salary/{teacher.id}", params={"year": 2023, "month": 7})
+    assert res.status_code == 200
+    timing = res.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "serialize;dur=" in timing
+
+    [record] = read_records(capsys)
+    assert record["route"] == "GET /salary/{id}"
+    assert record["path"] == f"/salary/{teacher.id}"
+    assert record["status"] == 200
+    assert record["operations"] == {"GetItem": 1}
+    assert (record["read_capacity"], record["write_capacity"]) == (0.5, 0)
+    names = {m["Name"] for m in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert {"latency", "db_calls", "read_capacity", "write_capacity"} <= names
+    assert all(name in record for name in names)
+
+    # 例外で終わったリクエストも 500 として記録する
+    res = TestClient(app, raise_server_exceptions=False).get("/salary/unknown", params={"year": 2023, "month": 7})
+    assert res.status_code == 500
+    assert read_records(capsys)[0]["status"] == 500
+    assert client.get("/no/such/path").status_code == 404
+    assert read_records(capsys)[0]["route"] == "GET unmatched"
+
+
+def test_write_is_recorded(dynamodb, capsys):
+    teacher = create_attendance(1)[0]
+    capsys.readouterr()
+    res = TestClient(app).patch(f"/salary/{teacher.id}", params={"year": 2023, "month": 7}, json={"remark": "x"})
+    assert res.status_code == 200
+    [record] = read_records(capsys)
+    assert record["route"] == "PATCH /salary/{id}"
+    # moto は TransactWriteItems の消費キャパシティを返さないので、回数だけ見る
+    assert record["operations"] == {"GetItem": 1, "TransactWriteItems": 1}
+
+
+def test_consumed_capacity():
+    assert consumed_capacity(None) == 0
+    assert consumed_capacity({"ConsumedCapacity": {"TableName": "t", "CapacityUnits": 0.5}}) == 0.5
+    batch = {"ConsumedCapacity": [{"TableName": "a", "CapacityUnits": 2.0}, {"TableName": "b", "CapacityUnits": 1.0}]}
+    assert consumed_capacity(batch) == 3.0
+
+    metrics = RequestMetrics()
+    metrics.add_db_call("Query", 0.01, 1.5)
+    metrics.add_db_call("PutItem", 0.02, 2.0)
+    metrics.add_stage("calc", 0.005)
+    assert (metrics.read_capacity, metrics.write_capacity) == (1.5, 2.0)
+    assert server_timing(metrics, 0.1) == 'db;dur=30.0;desc="2 calls", calc;dur=5.0, total;dur=100.0'
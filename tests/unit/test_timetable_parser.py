@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from api.myutils.const import CellBlock
+from api.routers.timeslot import make_timeslots_from_table
+from tests.bench.synthetic import make_teachers, make_timetable
+from tests.bench.timetable import filter_month, legacy_make_timeslots_from_table
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_legacy_output(seed):
+    teacher_list = make_teachers(15)
+    # 12月20日から60日分なので、12月・1月・2月にまたがる
+    content = make_timetable(datetime.date(2022, 12, 20), 12, seed=seed)
+    for year, month in [(2022, 12), (2023, 1), (2023, 2)]:
+        expected = filter_month(legacy_make_timeslots_from_table(teacher_list, content, year, month), year, month)
+        assert make_timeslots_from_table(teacher_list, content, year, month) == expected
+
+
+def test_skips_other_months():
+    teacher_list = make_teachers(3)
+    content = make_timetable(datetime.date(2023, 1, 29), 1, n_teachers=3, seed=1)
+    display_name2timeslot_list = make_timeslots_from_table(teacher_list, content, 2023, 2)
+    days = {timeslot.day for timeslot_list in display_name2timeslot_list.values() for timeslot in timeslot_list}
+    assert days <= {1, 2}
+    assert len(days) > 0
+
+
+def test_raises_on_unexpected_cell_type():
+    teacher_list = make_teachers(2)
+    content = make_timetable(datetime.date(2023, 1, 1), 1, n_teachers=2)
+    content[0][1][2] = 1.5
+    with pytest.raises(ValueError, match="block 1: cell1 type"):
+        make_timeslots_from_table(teacher_list, content, 2023, 1)
+
+
+def test_raises_on_unknown_time_cell():
+    teacher_list = make_teachers(2)
+    content = make_timetable(datetime.date(2023, 1, 1), 1, n_teachers=2)
+    content[1][CellBlock.INFO_TIME_IDX][CellBlock.INFO_COL] = "1:00-2:20"
+    with pytest.raises(ValueError, match=r"block 2 \(2023-01-01\): time cell .* '1:00-2:20'"):
+        make_timeslots_from_table(teacher_list, content, 2023, 1)
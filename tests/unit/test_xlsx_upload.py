@@ -0,0 +1,192 @@
+import asyncio
+import datetime
+import io
+import json
+import threading
+
+import openpyxl
+from fastapi.testclient import TestClient
+
+from api.cruds.teacher import TeacherRepo
+from api.main import app
+from api.routers import timeslot as timeslot_router
+from api.myutils.workbook import iter_block_rows, open_workbook
+from api.routers.timeslot import make_timeslots_from_table
+from api.schemas.person import TeacherBase
+from api.schemas.timeslot import Meeting
+
+TIMES = ["2:00-3:20", "3:30-4:50", "5:00-6:20"]
+
+
+def make_timetable(n_teachers: int, days: list[int]) -> list[list[list]]:
+    # 1日ぶんのコマを BLOCK_SIZE 行のブロックとして縦に並べる
+    content = []
+    for day in days:
+        for k, time in enumerate(TIMES):
+            names, cells1, cells2 = [None, None], [None, k + 1], [None, time]
+            names[1] = datetime.date(2023, 1, day) if k == 0 else None
+            for i in range(n_teachers):
+                names.append(f"講師{i}")
+                if (day + k + i) % 3 == 0:
+                    cells1.append(None)
+                    cells2.append(None)
+                elif (day + k + i) % 3 == 1:
+                    cells1.append("中1 数学")
+                    cells2.append(None)
+                else:
+                    cells1.append(None)
+                    cells2.append("事務30")
+            content.append([names, cells1, cells2])
+    return content
+
+
+def make_workbook(content: list[list[list]]) -> bytes:
+    wb = openpyxl.Workbook()
+    wb.active.title = "12月"
+    wb.active.append(["前の月のシートは読まない"])
+    ws = wb.create_sheet("1月分")
+    for block_row in content:
+        for row in block_row:
+            ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def create_teachers(n_teachers: int):
+    return TeacherRepo.create_list([
+        TeacherBase(
+            display_name=f"講師{i}", given_name="太郎", family_name=f"講師{i}", school_id="school",
+            lecture_hourly_pay=1000, office_hourly_pay=900, trans_fee=300, teacher_type="teacher",
+        )
+        for i in range(n_teachers)
+    ])
+
+
+def test_iter_block_rows_reads_blocks():
+    content = make_timetable(2, [5])
+    wb = open_workbook(io.BytesIO(make_workbook(content)))
+    block_rows = list(iter_block_rows(wb["1月分"]))
+    assert len(block_rows) == len(content)
+    # 日付は date で返す
+    assert block_rows[0][0][1] == datetime.date(2023, 1, 5)
+    assert block_rows[1][2] == tuple(content[1][2])
+
+
+def test_upload_xlsx_matches_table(dynamodb):
+    teacher_list = create_teachers(4)
+    content = make_timetable(4, [5, 6, 10])
+    client = TestClient(app)
+
+    meetings = [{
+        "year": 2023, "month": 1, "day": 7, "start_time": "10:00", "end_time": "11:00",
+        "teacher_ids": [teacher_list[0].id],
+    }]
+    res = client.post(
+        "/salary/bulk/school/xlsx",
+        params={"year": 2023, "month": 1},
+        files={"file": ("timetable.xlsx", make_workbook(content))},
+        data={"meetings": json.dumps(meetings)},
+    )
+    assert res.status_code == 200
+
+    expected = make_timeslots_from_table(teacher_list, content, 2023, 1)
+    expected[teacher_list[0].display_name] += [timeslot for _, timeslot in Meeting(**meetings[0]).make_timeslots()]
+    got = {m["teacher"]["display_name"]: m for m in res.json()}
+    assert set(got) == set(expected)
+    for display_name, timeslot_list in expected.items():
+        assert got[display_name]["timeslot_list"] == [json.loads(t.model_dump_json()) for t in timeslot_list]
+
+    saved = client.get("/salary/bulk/school", params={"year": 2023, "month": 1}).json()
+    assert len(saved) == 4
+
+
+def test_upload_xlsx_errors(dynamodb):
+    create_teachers(1)
+    client = TestClient(app)
+    params = {"year": 2023, "month": 1}
+
+    res = client.post("/salary/bulk/school/xlsx", params=params, files={"file": ("a.xlsx", b"not a workbook")})
+    assert res.status_code == 422
+
+    workbook = make_workbook(make_timetable(1, [5]))
+    res = client.post(
+        "/salary/bulk/school/xlsx", params={"year": 2023, "month": 2}, files={"file": ("a.xlsx", workbook)}
+    )
+    assert res.status_code == 422
+
+    res = client.post(
+        "/salary/bulk/school/xlsx", params=params, files={"file": ("a.xlsx", workbook)},
+        data={"sheet_name": "2月"},
+    )
+    assert res.status_code == 422
+
+    res = client.post(
+        "/salary/bulk/school/xlsx", params=params, files={"file": ("a.xlsx", workbook)},
+        data={"meetings": "[{}]"},
+    )
+    assert res.status_code == 422
+
+    # 時間割にない時刻と、数値でないコマ番号
+    for idx, value in [(2, "1:00-2:20"), (1, 1.5)]:
+        content = make_timetable(1, [5])
+        content[0][idx][1] = value
+        res = client.post(
+            "/salary/bulk/school/xlsx", params=params, files={"file": ("a.xlsx", make_workbook(content))}
+        )
+        assert res.status_code == 422
+        assert res.json()["detail"].startswith("block 1")
+        # JSON で送るときの日付は Excel のシリアル値
+        content[0][0][1] = (datetime.date(2023, 1, 5) - datetime.date(1899, 12, 30)).days
+        res = client.post("/salary/bulk/school", params=params, json={"content": content, "meetings": []})
+        assert res.status_code == 422
+        assert res.json()["detail"].startswith("block 1")
+
+
+def test_upload_xlsx_reads_teachers_while_opening_workbook(dynamodb, mocker):
+    # 2つが同時に走っていなければ、片方が Barrier で待ち続けてタイムアウトする
+    create_teachers(2)
+    barrier = threading.Barrier(2, timeout=5)
+    list_teachers = TeacherRepo.list
+
+    def list_with_barrier(school_id, consistent_read=False):
+        barrier.wait()
+        return list_teachers(school_id, consistent_read=consistent_read)
+
+    def open_with_barrier(file, password=None):
+        barrier.wait()
+        return open_workbook(file, password)
+
+    mocker.patch.object(TeacherRepo, "list", side_effect=list_with_barrier)
+    mocker.patch.object(timeslot_router, "open_workbook", side_effect=open_with_barrier)
+    client = TestClient(app)
+    res = client.post(
+        "/salary/bulk/school/xlsx",
+        params={"year": 2023, "month": 1},
+        files={"file": ("timetable.xlsx", make_workbook(make_timetable(2, [5])))},
+    )
+    assert res.status_code == 200
+    assert len(res.json()) == 2
+
+
+def test_post_table_parses_off_event_loop(dynamodb, mocker):
+    create_teachers(2)
+    in_event_loop = []
+
+    def make_timeslots(*args):
+        try:
+            asyncio.get_running_loop()
+            in_event_loop.append(True)
+        except RuntimeError:
+            in_event_loop.append(False)
+        return make_timeslots_from_table(*args)
+
+    mocker.patch.object(timeslot_router, "make_timeslots_from_table", side_effect=make_timeslots)
+    content = make_timetable(2, [5])
+    content[0][0][1] = (datetime.date(2023, 1, 5) - datetime.date(1899, 12, 30)).days
+    client = TestClient(app)
+    res = client.post(
+        "/salary/bulk/school", params={"year": 2023, "month": 1}, json={"content": content, "meetings": []}
+    )
+    assert res.status_code == 200
+    assert in_event_loop == [False]